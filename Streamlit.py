@@ -1,40 +1,64 @@
-import pymysql
+import io
+import os
+import time
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-# Create MySQL connection using pymysql
-def create_connection():
+import columnar
+import db
+import instrumentation
+import log_browser
+import partitions
+import predictor
+import report
+import rollups
+import sketches
+import vehicle_search
+import watchlist
+from queries import query_map, query_map_1
+
+# Fetch data through the shared connection pool and result cache
+def fetch_data(query, params=None, label=None):
     try:
-        connection = pymysql.connect(
-            host='127.0.0.1',
-            user="root",
-            password='',
-            database="policeledger",
-            cursorclass=pymysql.cursors.DictCursor  # To get column names
-        )
-        return connection
+        return db.fetch_data(query, params, label=label)
     except Exception as exp:
-        st.error("Database Connection error: {exp}")
-        return None
-
-# Fetch data from the database using function
-def fetch_data(query):
-    connection = create_connection()
-    if connection:
-        try:
-            with connection.cursor() as cur:
-                cur.execute(query)
-                result = cur.fetchall()
-                df = pd.DataFrame(result)
-                return df
-        finally:
-            connection.close()
-    else:
+        st.error(f"Database Connection error: {exp}")
         return pd.DataFrame()
     
+# Answer a canned question from the configured analytics backend; a stop date
+# range is always answered in SQL, where it prunes the yearly partitions
+def run_analysis(question, query, date_range=(), approximate=False):
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else None
+    # Sketches cover every stop, so a date range always gets the exact answer
+    if approximate and question in sketches.ANALYSES and not (date_from or date_to):
+        try:
+            return sketches.answer(question)
+        except Exception as exp:
+            st.error(f"Sketch error: {exp}")
+            return pd.DataFrame()
+    if columnar.BACKEND == "columnar" and not (date_from or date_to):
+        try:
+            return columnar.answer(question)
+        except Exception as exp:
+            st.error(f"Snapshot error: {exp}")
+            return pd.DataFrame()
+    try:
+        query = partitions.scope(query, date_from, date_to)
+    except Exception as exp:
+        st.error(f"Database Connection error: {exp}")
+        return pd.DataFrame()
+    return fetch_data(query, label=question)
+
 #Streamlit code
 
+page_started = time.perf_counter()
+
+# Performance page is only listed for ?admin=<SECURECHECK_ADMIN_TOKEN>
+ADMIN_TOKEN = os.environ.get("SECURECHECK_ADMIN_TOKEN")
+
 st.set_page_config(page_title="Police Ledger Dashboard", layout= "wide" )
 
 #Background image
@@ -54,7 +78,23 @@ st.markdown(
 st.title("SecureCheck: Police Post Log Ledger") 
 
 # Sidebar Menu
-menu = st.sidebar.selectbox("Explore🔍", ["Home🏛️","Police Logs Overview🗂️","Metrics📊","Medium level analysis📉","Complex level analysis🧩","Predict Outcome🎯"])
+pages = ["Home🏛️","Police Logs Overview🗂️","Metrics📊","Medium level analysis📉","Complex level analysis🧩","Full Report📑","Vehicle Search🚘","Predict Outcome🎯"]
+if ADMIN_TOKEN and st.query_params.get("admin") == ADMIN_TOKEN:
+    pages.append("Performance⚙️")
+menu = st.sidebar.selectbox("Explore🔍", pages)
+
+# Query cache effectiveness
+stats = db.cache_stats()
+st.sidebar.caption(f"Query cache: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%})")
+
+# Latest watchlist alerts, raised by ingestion and the Predict Outcome form
+try:
+    alerts = watchlist.recent_alerts()
+except Exception:
+    alerts = pd.DataFrame()
+if not alerts.empty:
+    with st.sidebar.expander(f"🚨 Watchlist alerts ({len(alerts)} latest)"):
+        st.dataframe(alerts, use_container_width=True, hide_index=True)
 
 # Home
 if menu == "Home🏛️":
@@ -62,42 +102,102 @@ if menu == "Home🏛️":
 
 elif menu == "Police Logs Overview🗂️":
     st.header("_Digital Ledger for Police Post Logs_") 
-    query = "SELECT * FROM police_post_logs"
-    data = fetch_data(query)
+
+    # Filters, applied in SQL so only one page of rows is fetched
+    option_columns = ("country_name", "violation", "stop_outcome")
+    try:
+        options = {column: log_browser.filter_options(column) for column in option_columns}
+    except Exception as exp:
+        st.error(f"Database Connection error: {exp}")
+        options = {column: [] for column in option_columns}
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        date_range = st.date_input("Stop date range", value=())
+        vehicle_number = st.text_input("Vehicle number starts with").strip()
+    with col2:
+        country_name = st.selectbox("Country", [""] + options["country_name"])
+        violation = st.selectbox("Violation", [""] + options["violation"])
+    with col3:
+        stop_outcome = st.selectbox("Stop outcome", [""] + options["stop_outcome"])
+        page_size = st.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+
+    filters = {
+        "date_from": date_range[0] if len(date_range) > 0 else None,
+        "date_to": date_range[1] if len(date_range) > 1 else None,
+        "country_name": country_name,
+        "violation": violation,
+        "stop_outcome": stop_outcome,
+        "vehicle_number": vehicle_number,
+    }
+
+    # Keyset cursors: the last id of every page already visited
+    signature = (tuple(sorted((k, str(v)) for k, v in filters.items())), page_size)
+    if st.session_state.get("log_signature") != signature:
+        st.session_state["log_signature"] = signature
+        st.session_state["log_cursors"] = [0]
+    cursors = st.session_state["log_cursors"]
+
+    try:
+        data = log_browser.fetch_page(filters, cursors[-1], page_size)
+        total = log_browser.estimate_count(filters)
+    except Exception as exp:
+        st.error(f"Database Connection error: {exp}")
+        data, total = pd.DataFrame(), 0
+
+    st.caption(f"Page {len(cursors)} · about {total:,} matching stops")
     st.dataframe(data, use_container_width=True)
+
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        if st.button("◀ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with next_col:
+        if st.button("Next ▶", disabled=len(data) < page_size):
+            cursors.append(int(data["id"].iloc[-1]))
+            st.rerun()
     st.markdown("**The table above showcases daily police log records, including incident types, dates, and locations.**")
 
 # Metrics
 elif menu == "Metrics📊": 
-    # Fetch data
-    query = "SELECT * FROM police_post_logs"
-    data = fetch_data(query)
+    # Fetch pre-aggregated totals per stop outcome
+    outcome_totals = fetch_data(rollups.OUTCOME_TOTALS_SQL, label="rollups.outcome_totals")
+    kpis = rollups.metrics(outcome_totals)
 
     # Quick Metrics
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Total Police Stops", data.shape[0])
+        st.metric("Total Police Stops", kpis["stops"])
 
     with col2:
-        arrests = data[data["stop_outcome"].str.contains("arrest", case=False, na=False)].shape[0]
-        st.metric("Total Arrests", arrests)
+        st.metric("Total Arrests", kpis["arrests"])
 
     with col3:
-        warnings = data[data["stop_outcome"].str.contains("warning", case=False, na=False)].shape[0]
-        st.metric("Total Warnings", warnings)
+        st.metric("Total Warnings", kpis["warnings"])
 
     with col4:
-        drug_stop = data[data["drugs_related_stop"] == 1].shape[0]
-        st.metric("Drug Related Stops", drug_stop)
+        st.metric("Drug Related Stops", kpis["drug_stops"])
+
+    # Distinct vehicles from the HyperLogLog sketch kept during ingestion
+    try:
+        approx = sketches.summary()
+        if approx["stops"]:
+            st.caption(f"Distinct vehicles: about {approx['distinct_vehicles']:,} "
+                       f"(± {approx['distinct_vehicles_error']:,}, 95%)")
+    except Exception:
+        pass
 
 # Plotting 
 
 # Stop Outcome Distribution
-    outcome_counts = data["stop_outcome"].value_counts().reset_index()
-    outcome_counts.columns = ["Stop Outcome", "Count"]
-    fig1 = px.pie(outcome_counts, names="Stop Outcome", values="Count",title="Stop Outcome Distribution")
-    st.plotly_chart(fig1, use_container_width=True)
+    if not outcome_totals.empty:
+        outcome_counts = outcome_totals[outcome_totals["stop_outcome"] != rollups.UNKNOWN]
+        outcome_counts = outcome_counts[["stop_outcome", "stops"]].sort_values("stops", ascending=False)
+        outcome_counts.columns = ["Stop Outcome", "Count"]
+        fig1 = px.pie(outcome_counts, names="Stop Outcome", values="Count",title="Stop Outcome Distribution")
+        st.plotly_chart(fig1, use_container_width=True)
 
 
 # Medium level analysis
@@ -121,114 +221,17 @@ elif menu == "Medium level analysis📉":
             "Country has the most stops with search conducted" ,
         ]
     )
-    query_map = {
-        "Top 10 vehicle number involed in drug related stops" : """SELECT vehicle_number, COUNT(*) AS drugs_related_stop
-                                                        FROM police_post_logs WHERE drugs_related_stop = TRUE 
-                                                        GROUP BY vehicle_number
-                                                        ORDER BY drugs_related_stop DESC LIMIT 10""",
-        
-        "Vehicles were most frequently searched" : """SELECT vehicle_number, COUNT(*) AS search_count 
-                                                    FROM police_post_logs WHERE search_conducted = TRUE 
-                                                    GROUP BY vehicle_number, search_conducted 
-                                                    ORDER BY search_count DESC LIMIT 15 """,
-        
-        "Driver age group with highest arrest rate" :"""SELECT CASE
-                                                    WHEN driver_age BETWEEN 18 AND 25 THEN '18-25'
-                                                    WHEN driver_age BETWEEN 26 AND 35 THEN '26-35'
-                                                    WHEN driver_age BETWEEN 36 AND 45 THEN '36-45'
-                                                    WHEN driver_age BETWEEN 46 AND 60 THEN '46-60'
-                                                    ELSE '60+'
-                                                    END AS age_group,
-                                                    COUNT(*) AS total_driver,
-                                                    SUM(is_arrested) AS total_arrests,
-                                                    ROUND(SUM(is_arrested)*100.0/COUNT(*), 2) AS arrest_rate_percent
-                                                    FROM police_post_logs
-                                                    GROUP BY age_group
-                                                    ORDER BY arrest_rate_percent DESC
-                                                    LIMIT 1""",
- 
-        "Gender distribution of drivers stopped in each country" :"""SELECT country_name, driver_gender, COUNT(*) AS total_gender,
-                                                               ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY country_name), 2) AS gender_percent
-                                                                FROM police_post_logs
-                                                                GROUP BY country_name, driver_gender
-                                                                ORDER BY country_name, driver_gender""",     
-
-        "Race and gender combination with highest search rate" :"""SELECT driver_race, driver_gender, COUNT(*) AS total_stops,
-                                                            SUM(CASE WHEN search_conducted  = 1 THEN 1 ELSE 0 END) AS total_searches,
-                                                            ROUND(SUM(CASE WHEN search_conducted  = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS search_percent_rate
-                                                            FROM police_post_logs
-                                                            WHERE driver_race IS NOT NULL AND driver_gender IS NOT NULL
-                                                            GROUP BY driver_race, driver_gender
-                                                            ORDER BY search_percent_rate DESC LIMIT 1""",
-
-                                                
-        "Time of day with most traffic stops" :"""SELECT HOUR(STR_TO_DATE(stop_time,'%H:%i:%s')) AS stop_hour, COUNT(*) AS total_stops
-                                                FROM police_post_logs
-                                                WHERE stop_time IS NOT NULL
-                                                GROUP BY stop_hour 
-                                                ORDER BY total_stops DESC LIMIT 1""",
-
-        "Average Stop Duration for different Violations" : """SELECT violation,
-                                                            AVG(stop_duration) AS average_stop_duration
-                                                            FROM police_post_logs
-                                                            WHERE stop_duration IS NOT NULL 
-                                                            GROUP BY violation ORDER BY Average_stop_duration DESC""",
-
-        "Night Stops More Likely to Lead to Arrests" : """SELECT CASE
-                                                    WHEN HOUR(stop_time) BETWEEN 20 AND 23 OR HOUR(stop_time) BETWEEN 0 AND 5 THEN 'Night'
-                                                    ELSE 'Day' END AS time_of_day,COUNT(*) AS total_stops,
-                                                    SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests,
-                                                    ROUND(SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS arrest_rate_percent
-                                                    FROM police_post_logs
-                                                    WHERE stop_time IS NOT NULL
-                                                    GROUP BY time_of_day
-                                                    ORDER BY arrest_rate_percent DESC""",
-
-        "Violations which most associated with searches or arrests" :"""SELECT violation,COUNT(*) AS total_stops,
-                                                                 SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests, 
-                                                                 SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) AS total_searches, 
-                                                                 SUM(CASE WHEN is_arrested = 1 OR search_conducted = TRUE THEN 1 ELSE 0 END) AS search_or_arrest_total
-                                                                 FROM police_post_logs
-                                                                 GROUP BY violation
-                                                                 ORDER BY search_or_arrest_total DESC LIMIT 10""",                                                    
-
-        "Most common violations for young drivers < 25" :"""SELECT violation,COUNT(*) AS total_stops
-                                                        FROM police_post_logs
-                                                        WHERE driver_age < 25
-                                                        GROUP BY violation
-                                                        ORDER BY total_stops DESC LIMIT 10""",
-
-        "Violation that rarely resulting in search or arrest" :"""SELECT violation,COUNT(*) AS total_stops,
-                                                            SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests
-                                                            FROM police_post_logs
-                                                            GROUP BY violation
-                                                            ORDER BY total_arrests ASC LIMIT 1""",
-
-        "Countries that report with highest drug-related stop rates" :"""SELECT country_name,COUNT(*) AS total_stops,
-                                                                   SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END) AS drug_related_stops,
-                                                                   ROUND(SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS drug_stop_rate_percent
-                                                                   FROM police_post_logs
-                                                                   GROUP BY country_name
-                                                                   ORDER BY drug_stop_rate_percent DESC""",
-
-        "Arrest rate by country and violation" :"""SELECT country_name,COUNT(*) AS total_stops,violation,
-                                               SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests,
-                                               ROUND(100.0 * SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) / COUNT(*), 2) AS total_arrest_percent
-                                               FROM police_post_logs
-                                               GROUP BY country_name, violation
-                                               ORDER BY country_name""",
- 
-        "Country has the most stops with search conducted" :"""select country_name, count(*) as search_count
-                                                              FROM police_post_logs WHERE search_conducted = TRUE 
-                                                              GROUP BY  country_name
-                                                              ORDER BY search_count
-                                                              DESC LIMIT 1"""
-}
-    
+    date_range = st.date_input("Stop date range (optional)", value=())
+    approximate = medium_queries in sketches.ANALYSES and st.radio(
+        "Answer", ["Exact", "Approximate"], horizontal=True,
+        help="Approximate answers come from sketches kept during ingestion; *_error columns are their bounds.",
+    ) == "Approximate"
 
     if st.button("Run"):
-        result = fetch_data(query_map[medium_queries])
+        result = run_analysis(medium_queries, query_map[medium_queries], date_range, approximate)
         if result is not None and not result.empty:
+            if approximate and not date_range:
+                st.caption("Approximate: top lists may overcount by up to *_error; other *_error columns are 95% half-widths.")
             st.write(result)
         else:
             st.warning("No result was found")
@@ -248,69 +251,98 @@ elif menu == "Complex level analysis🧩":
             "Top 5 violations with highest arrest rates"
         ]
     )
-    query_map_1 = {
-        "Yearly breakdown of stops and arrests by country" : """SELECT country_name, 
-                                                                EXTRACT(YEAR FROM Stop_date) AS stop_year, COUNT(*) AS total_stops, 
-                                                                SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS total_arrests, 
-                                                                ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Arrest_rate_percent, 
-                                                                RANK() OVER (PARTITION BY Stop_date ORDER BY SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) DESC) AS Arrest_rank 
-                                                                FROM police_post_logs 
-                                                                GROUP BY Country_name, Stop_date 
-                                                                ORDER BY Stop_date, Arrest_rank""",
-
-        "Driver violation trends by age and race" : """WITH Age_race_summary AS (SELECT Driver_age, Driver_race, Violation, COUNT(*) AS Violation_count 
-                                                        FROM police_post_logs GROUP BY driver_age, driver_race, violation)
-                                                        SELECT ars.driver_age, ars.driver_race, ars.violation, ars.violation_count 
-                                                        FROM Age_race_summary ars 
-                                                        JOIN (SELECT driver_age, driver_race, MAX(violation_count) AS Max_count 
-                                                        FROM age_race_summary GROUP BY driver_age, driver_race)
-                                                        top_violations ON ars.driver_age = top_violations.driver_age 
-                                                        AND ars.driver_race = top_violations.driver_race 
-                                                        AND ars.violation_count = top_violations.max_count 
-                                                        ORDER BY ars.driver_race, ars.driver_age""",
-    
-        "Time period analysis of stops, no of stops by yr, month, hr of the day" : """SELECT EXTRACT(YEAR FROM stop_date) AS Year, 
-                                                                                    EXTRACT(MONTH FROM stop_date) AS Month, 
-                                                                                    EXTRACT(HOUR FROM stop_time) AS Hour, COUNT(*) AS stop_count 
-                                                                                    FROM police_post_logs 
-                                                                                    GROUP BY Year, Month, Hour ORDER BY Year, Month, Hour""",
-      
-        "Violations with high search & arrest rates" : """SELECT violation, COUNT(*) AS Total_stops, 
-                                                            SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) AS Total_searches, 
-                                                            SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS Total_arrests, 
-                                                            ROUND(SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Search_rate, 
-                                                            ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS arrest_rate, 
-                                                            RANK() OVER (ORDER BY SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) DESC) AS Arrest_rank
-                                                            FROM police_post_logs
-                                                            GROUP BY violation 
-                                                            ORDER BY Arrest_rank LIMIT 10""",
-    
-        "Driver demographics by country (Age, Gender and Race)" : """SELECT country_name, AVG(driver_age) AS Avg_age, Driver_gender, Driver_race, COUNT(*) AS Stop_count
-                                                                        FROM police_post_logs 
-                                                                        GROUP BY Country_name, Driver_gender, Driver_race 
-                                                                        ORDER BY Country_name, Stop_count DESC""",
-    
-        "Top 5 violations with highest arrest rates" : """SELECT violation, COUNT(*) AS Total_stops, 
-                                                            SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS Total_arrests, 
-                                                            ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Arrest_rate_percent 
-                                                            FROM police_post_logs 
-                                                            GROUP BY Violation 
-                                                            ORDER BY Arrest_rate_percent DESC LIMIT 5"""
-
-}
+    date_range = st.date_input("Stop date range (optional)", value=())
+    approximate = complex_queries in sketches.ANALYSES and st.radio(
+        "Answer", ["Exact", "Approximate"], horizontal=True,
+        help="Approximate answers come from sketches kept during ingestion; *_error columns are their bounds.",
+    ) == "Approximate"
 
     if st.button("Run"):
-        result = fetch_data(query_map_1[complex_queries])
+        result = run_analysis(complex_queries, query_map_1[complex_queries], date_range, approximate)
         if result is not None and not result.empty:
+            if approximate and not date_range:
+                st.caption("Approximate: top lists may overcount by up to *_error; other *_error columns are 95% half-widths.")
             st.write(result)
         else:
             st.warning("No result was found")
 
+# Full report: every canned question at once, run concurrently
+
+elif menu == "Full Report📑":
+    st.header("_Full analysis report_")
+    st.markdown("Runs every Medium and Complex level question in parallel and exports one report.")
+    report_format = st.radio("Report format", ["HTML", "Excel"], horizontal=True)
+
+    if st.button("Run full report"):
+        total = len(report.catalog())
+        progress = st.progress(0.0, text="Starting")
+        finished = []
+
+        def show_progress(question, seconds, rows, error):
+            finished.append(question)
+            progress.progress(len(finished) / total, text=f"{len(finished)}/{total} {question}")
+
+        buffer = io.StringIO() if report_format == "HTML" else io.BytesIO()
+        try:
+            writer = report.HtmlReport(buffer) if report_format == "HTML" else report.ExcelReport(buffer)
+            timings = report.run_report(writer, workers=report.default_workers(), on_result=show_progress)
+        except Exception as exp:
+            st.error(f"Report error: {exp}")
+        else:
+            st.dataframe(timings, use_container_width=True)
+            data = buffer.getvalue()
+            st.download_button(
+                "Download report",
+                data=data.encode("utf-8") if isinstance(data, str) else data,
+                file_name="securecheck_report.html" if report_format == "HTML" else "securecheck_report.xlsx",
+            )
+
+# Vehicle Search: partial or mistyped plates, then one plate's stop history
+elif menu == "Vehicle Search🚘":
+    st.header("_Vehicle Search_")
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        plate_query = st.text_input("Vehicle number (partial or mistyped)").strip()
+    with col2:
+        mode = st.radio("Match", vehicle_search.MODES, horizontal=True,
+                        format_func={"prefix": "Starts with", "contains": "Contains", "fuzzy": "Similar"}.get)
+
+    if plate_query:
+        try:
+            matches, total = vehicle_search.search(plate_query, mode)
+        except Exception as exp:
+            st.error(f"Database Connection error: {exp}")
+            matches, total = pd.DataFrame(), 0
+
+        if matches.empty:
+            st.info("No matching vehicles.")
+        else:
+            st.caption(f"{total:,} matching vehicles, showing {len(matches)}")
+            st.dataframe(matches, use_container_width=True, hide_index=True)
+
+            plate = st.selectbox("Stop history for", matches["vehicle_number"])
+            include_archive = st.checkbox("Include archived years")
+            try:
+                found = watchlist.get_watchlist().check(plate)
+                history = vehicle_search.stop_history(plate, include_archive=include_archive)
+            except Exception as exp:
+                st.error(f"Database Connection error: {exp}")
+                found, history = [], pd.DataFrame()
+            if found:
+                st.warning(f"🚨 On the watchlist: {'; '.join(found)}")
+            st.caption(f"{len(history):,} stops, most recent first")
+            st.dataframe(history, use_container_width=True, hide_index=True)
+
 # Predict Outcome
 elif menu=="Predict Outcome🎯": 
 
-    query="select * from police_post_logs"
-    data=fetch_data(query)
+    # Prediction index, built once per data version instead of loading the table
+    try:
+        index = predictor.get_index()
+    except Exception as exp:
+        st.error(f"Database Connection error: {exp}")
+        index = predictor.PredictionIndex([{} for _ in predictor.LEVELS], [])
 
     st.markdown("Fill the fields below to log a stop and predict the outcome and violation.")
 
@@ -325,31 +357,34 @@ elif menu=="Predict Outcome🎯":
         driver_age=st.number_input("Driver Age", min_value=16, max_value=100, value=20)
         driver_race=st.selectbox("Driver Race", ["Asian", "Black", "White", "Hispanic", "Other"])
         search_type=st.selectbox("Search Type", ["Vehicle Search", "Frisk", "None"])
-        stop_duration=st.selectbox("Stop Duration",data["stop_duration"].dropna().unique())
+        stop_duration=st.selectbox("Stop Duration",index.durations)
         driver_gender=st.radio("Driver Gender",["Male","Female"])
         st.write(driver_gender)
         drugs_related_stop = st.selectbox("Is the stop is drug related?",["YES", "NO"])
         search_conducted = st.selectbox("Is the search is conducted?", ["YES", "NO"])
         submitted=st.form_submit_button("Predict Stop Outcome & Violation")
 
-    filtered_data = pd.DataFrame()     
-    if submitted:
-        filtered_data= data[
-                            (data["driver_gender"]== driver_gender)&
-                            (data["driver_age"]== driver_age)&
-                            (data["search_conducted"]==(search_conducted))&
-                            (data["stop_duration"]==stop_duration)&
-                            (data["drugs_related_stop"]==drugs_related_stop)
-            ]
-
     #Predict Stop Outcome and Violation
 
-    if not filtered_data.empty:
-        predicted_outcome = filtered_data["Stop Outcome"].mode()[0]
-        predicted_violation = filtered_data["Violation"].mode()[0]
-    else:
-        predicted_outcome = "Warning"
-        predicted_violation = "Speeding"
+    predicted_outcome, predicted_violation = predictor.DEFAULT_PREDICTION
+    if submitted:
+        predicted_outcome, predicted_violation, matched_level = index.predict(
+            driver_gender, driver_age, search_conducted, stop_duration, drugs_related_stop
+        )
+        if matched_level != "exact":
+            st.caption(f"No exact match for these details, predicted from similar stops ({matched_level}).")
+
+        # Watchlist check for the logged vehicle
+        if vehicle_number.strip():
+            try:
+                found = watchlist.get_watchlist().check(vehicle_number)
+                if found:
+                    watchlist.record_alert(vehicle_number, stop_date, stop_time, country_name, found)
+            except Exception as exp:
+                st.error(f"Watchlist error: {exp}")
+                found = []
+            if found:
+                st.warning(f"🚨 Watchlist alert for {watchlist.normalize(vehicle_number)}: {'; '.join(found)}")
 
     #Prediction summary
 
@@ -366,13 +401,54 @@ elif menu=="Predict Outcome🎯":
 
     A **{driver_age}**-year-old **{driver_gender}** driver in **{country_name}** was stopped for **{predicted_violation}** at {stop_time.strftime('%I:%M %p')} on {stop_date}.
         **{search_text}**, received a **{predicted_outcome}** and **{drug_text}**.                   
-    """) 
-    
-
-
+    """)
 
+# Performance: recent query and page timings from this server process
 
+elif menu == "Performance⚙️":
+    st.header("_Performance_")
+    st.caption(f"Last {instrumentation.RING_SIZE} records of this process; full history in {instrumentation.LOG_FILE}")
 
+    stats = db.cache_stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Cache hit rate", f"{stats['hit_rate']:.0%}")
+    col2.metric("Cache hits / misses", f"{stats['hits']} / {stats['misses']}")
+    col3.metric("Cached results", stats["size"])
 
+    queries = pd.DataFrame(instrumentation.records("query"))
+    if queries.empty:
+        st.info("No queries recorded yet")
+    else:
+        st.subheader("Slowest queries")
+        phases = [c for c in ["connect_ms", "execute_ms", "fetch_ms", "frame_ms", "load_ms", "compute_ms"] if c in queries]
+        slowest = queries[queries["cache"] != "hit"] if "cache" in queries else queries
+        st.dataframe(
+            slowest.sort_values("total_ms", ascending=False).head(25)[
+                ["query", "total_ms"] + phases + [c for c in ["rows", "result_bytes", "cache", "error"] if c in slowest]
+            ],
+            use_container_width=True,
+        )
 
+        st.subheader("Cache effectiveness by query")
+        if "cache" in queries:
+            by_query = queries.groupby("query")["cache"].value_counts().unstack(fill_value=0)
+            for column in ("hit", "miss"):
+                if column not in by_query:
+                    by_query[column] = 0
+            by_query["hit_rate"] = (by_query["hit"] / (by_query["hit"] + by_query["miss"])).fillna(0).round(2)
+            st.dataframe(by_query.sort_values("miss", ascending=False), use_container_width=True)
+
+    page_times = pd.DataFrame(instrumentation.records("page"))
+    if not page_times.empty:
+        st.subheader("Page render times")
+        st.plotly_chart(
+            px.histogram(page_times, x="render_ms", color="page", nbins=40, barmode="overlay"),
+            use_container_width=True,
+        )
+        st.dataframe(
+            page_times.groupby("page")["render_ms"].describe(percentiles=[0.5, 0.95])[["count", "50%", "95%", "max"]],
+            use_container_width=True,
+        )
 
+# Page render time (reruns triggered mid-page are not recorded)
+instrumentation.record_page(menu, page_started)
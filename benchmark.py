@@ -0,0 +1,223 @@
+"""Benchmark suite for the dashboard against a local SQLite ledger.
+
+Generates synthetic stops with ``synth.py``, loads them with ``ingest.py``
+and times every dashboard data path:
+
+* ingestion throughput (rows/sec)
+* every canned query in ``query_map`` and ``query_map_1``
+* the Metrics page KPIs and the first page of the Police Logs Overview
+* building the Predict Outcome index and single predictions
+* loading the vehicle watchlist and single plate checks
+* building the vehicle search index, plate searches and one plate's stop history
+* approximate answers from the ingest sketches
+* peak heap of ``SELECT *`` with buffered vs streamed ``fetch_data``
+
+Each timed path is run ``--repeat`` times with the query cache disabled and
+reported as p50/p95 milliseconds, together with the process' peak RSS.
+Results are written as JSON so runs can be compared::
+
+    python benchmark.py --rows 1000000 --output bench_1m.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import db
+import ingest
+import log_browser
+import predictor
+import rollups
+import sketches
+import synth
+import vehicle_search
+import watchlist
+from queries import query_map, query_map_1
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+# Run ``func`` ``repeat`` times and summarise the latencies in milliseconds
+def time_call(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    rows = len(result) if hasattr(result, "shape") else None
+    return {
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "max_ms": round(max(samples), 3),
+        "rows": rows,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# Peak Python heap (MB) and final frame size (MB) while materializing ``query``
+def materialize(query, stream):
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        frame = db.fetch_data(query, use_cache=False, stream=stream)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_heap_mb": round(peak / (1024 * 1024), 1),
+        "frame_mb": round(frame.memory_usage(deep=True).sum() / (1024 * 1024), 1),
+        "rows": len(frame),
+    }
+
+
+def uncached(query, params=None):
+    return lambda: db.fetch_data(query, params, use_cache=False)
+
+
+def run(rows, repeat, workdir, batch_size=ingest.BATCH_SIZE, log=print):
+    db_path = os.path.join(workdir, "ledger.db")
+    csv_path = os.path.join(workdir, "stops.csv")
+    db.DATA_VERSION_FILE = os.path.join(workdir, "ledger_version")
+    sketches.SKETCH_FILE = os.path.join(workdir, "sketches.json")
+    db.use_sqlite(db_path)
+
+    results = {
+        "rows": rows,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+    log(f"Generating {rows} rows")
+    started = time.perf_counter()
+    synth.write_csv(csv_path, rows)
+    results["generate_seconds"] = round(time.perf_counter() - started, 3)
+
+    log("Ingesting")
+    connection = db.connect_sqlite(db_path)
+    try:
+        summary = ingest.ingest_csv(csv_path, connection, batch_size=batch_size, log=lambda msg: None)
+    finally:
+        connection.close()
+    results["ingest"] = {
+        "rows_per_sec": round(summary["rows_per_sec"], 1),
+        "seconds": round(summary["seconds"], 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    log("Timing canned queries")
+    results["queries"] = {}
+    for question, query in {**query_map, **query_map_1}.items():
+        results["queries"][question] = time_call(uncached(query), repeat)
+
+    log("Measuring SELECT * materialization")
+    select_all = "SELECT * FROM police_post_logs"
+    results["materialize"] = {
+        "buffered": materialize(select_all, stream=False),
+        "streamed": materialize(select_all, stream=True),
+    }
+
+    log("Timing dashboard pages")
+    results["pages"] = {
+        "Police Logs Overview": time_call(
+            lambda: log_browser.fetch_page({}, 0, log_browser.PAGE_SIZE, prefetch=False), repeat
+        ),
+        "Police Logs Overview (filtered)": time_call(
+            lambda: log_browser.fetch_page(
+                {"country_name": "India", "violation": "DUI"}, 0, log_browser.PAGE_SIZE, prefetch=False
+            ),
+            repeat,
+        ),
+        "Metrics": time_call(
+            lambda: rollups.metrics(db.fetch_data(rollups.OUTCOME_TOTALS_SQL, use_cache=False)), repeat
+        ),
+    }
+
+    log("Timing Predict Outcome")
+    index_path = os.path.join(workdir, "predict_index.json")
+    results["predict"] = {
+        "build_index": time_call(lambda: predictor.build_index(lambda q: db.fetch_data(q, use_cache=False)), repeat),
+    }
+    index = predictor.build_index()
+    index.save(index_path)
+    results["predict"]["load_index"] = time_call(lambda: predictor.PredictionIndex.load(index_path), repeat)
+    results["predict"]["predict"] = time_call(
+        lambda: index.predict("Male", 30, "YES", "0-15 Min", "NO"), max(repeat, 100)
+    )
+
+    log("Timing watchlist")
+    listed = watchlist.Watchlist()
+    listed.load()
+    results["watchlist"] = {
+        "load": time_call(lambda: watchlist.Watchlist().load(), repeat),
+        "check": time_call(lambda: listed.check("KA01AB1234"), max(repeat, 100)),
+        "plates": len(listed),
+    }
+
+    log("Timing vehicle search")
+    plates = vehicle_search.PlateIndex()
+    plates.load()
+    results["vehicle_search"] = {
+        "load": time_call(lambda: vehicle_search.PlateIndex().load(), repeat),
+        "prefix": time_call(lambda: plates.prefix("KA01"), max(repeat, 100)),
+        "contains": time_call(lambda: plates.contains("AB12"), max(repeat, 100)),
+        "fuzzy": time_call(lambda: plates.fuzzy("KA0lAB1234"), max(repeat, 100)),
+        "history": time_call(lambda: vehicle_search.stop_history("KA01AB1234"), repeat),
+        "plates": len(plates),
+    }
+
+    log("Timing approximate answers")
+    state = sketches.Sketches.load()
+    results["sketches"] = {question: time_call(lambda q=question: sketches.answer(q, state), repeat)
+                           for question in sketches.ANALYSES}
+
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SecureCheck dashboard data paths")
+    parser.add_argument("--rows", type=int, default=100000, help="synthetic stops to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path")
+    parser.add_argument("--batch-size", type=int, default=ingest.BATCH_SIZE)
+    parser.add_argument("--workdir", help="keep the generated CSV and SQLite file here")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    args = parser.parse_args(argv)
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run(args.rows, args.repeat, args.workdir, args.batch_size)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run(args.rows, args.repeat, workdir, args.batch_size)
+
+    with open(args.output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Ingest: {results['ingest']['rows_per_sec']:,.0f} rows/sec, peak RSS {results['peak_rss_mb']} MB")
+    buffered, streamed = results["materialize"]["buffered"], results["materialize"]["streamed"]
+    print(f"SELECT * peak heap: {buffered['peak_heap_mb']} MB buffered, {streamed['peak_heap_mb']} MB streamed")
+    for question, stats in results["queries"].items():
+        print(f"{stats['p50_ms']:>10.1f} ms p50 {stats['p95_ms']:>10.1f} ms p95  {question}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""Columnar snapshot backend for the Medium and Complex level analyses.
+
+``export`` copies police_post_logs into a directory of memory-mapped NumPy
+arrays, one file per column. String columns are dictionary encoded (int32
+codes plus a value list in ``meta.json``), flags are int8 and missing values
+are stored as -1. ``answer`` then computes each canned question with
+vectorized group-bys over the codes, so heavy aggregate reads never reach
+MySQL and an analyst only needs the snapshot directory.
+
+Results follow the SQL in ``queries.py`` row for row: NULL groups are kept,
+NULLs sort first ascending and last descending, percentages are rounded
+like MySQL's DECIMAL arithmetic, and ties are broken by group key.
+
+Usage::
+
+    python columnar.py export snapshot/            # from MySQL (or --sqlite ledger.db)
+    python columnar.py verify snapshot/ --sqlite ledger.db
+
+Set ``SECURECHECK_ANALYTICS=columnar`` and ``SECURECHECK_SNAPSHOT=snapshot/``
+to make the dashboard answer analysis questions from the snapshot.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import db
+import instrumentation
+import partitions
+from queries import query_map, query_map_1
+
+# "sql" sends analyses to the database, "columnar" answers them from the snapshot
+BACKEND = os.environ.get("SECURECHECK_ANALYTICS", "sql")
+SNAPSHOT_DIR = os.environ.get("SECURECHECK_SNAPSHOT", "snapshot")
+
+EXPORT_CHUNK = 100000
+
+STRING_COLUMNS = [
+    "country_name", "driver_gender", "driver_race", "violation",
+    "stop_outcome", "stop_duration", "search_type", "vehicle_number",
+]
+NUMERIC_COLUMNS = {
+    "id": "int64",
+    "driver_age": "int16",
+    "search_conducted": "int8",
+    "is_arrested": "int8",
+    "drugs_related_stop": "int8",
+    "stop_year": "int16",
+    "stop_month": "int8",
+    "stop_hour": "int8",
+}
+
+# {table} is police_post_logs, or the history view once years are archived
+EXPORT_SQL = "SELECT {} FROM {{table}} WHERE id > %s ORDER BY id LIMIT %s".format(
+    ", ".join(list(NUMERIC_COLUMNS) + STRING_COLUMNS)
+)
+
+
+def _column_path(path, name):
+    return os.path.join(path, name + ".bin")
+
+
+def _numeric(values, dtype):
+    array = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    return array.fillna(-1).to_numpy().astype(dtype)
+
+
+def export(connection, path, chunk_size=EXPORT_CHUNK, log=print):
+    """Write a snapshot of police_post_logs, archived years included, to directory ``path``.
+
+    Rows are read in id order with keyset pagination and appended to the
+    column files chunk by chunk, so memory stays bounded by ``chunk_size``.
+    """
+    os.makedirs(path, exist_ok=True)
+    query = EXPORT_SQL.format(table=partitions.source(connection=connection))
+    dictionaries = {name: [] for name in STRING_COLUMNS}
+    lookups = {name: {} for name in STRING_COLUMNS}
+    files = {name: open(_column_path(path, name), "wb") for name in list(NUMERIC_COLUMNS) + STRING_COLUMNS}
+    rows = 0
+    last_id = 0
+    try:
+        while True:
+            with connection.cursor() as cur:
+                cur.execute(query, (last_id, chunk_size))
+                chunk = cur.fetchall()
+            if not chunk:
+                break
+            frame = pd.DataFrame(chunk, columns=list(NUMERIC_COLUMNS) + STRING_COLUMNS)
+            for name, dtype in NUMERIC_COLUMNS.items():
+                files[name].write(_numeric(frame[name], dtype).tobytes())
+            for name in STRING_COLUMNS:
+                lookup = lookups[name]
+                values = [None if pd.isna(v) else v for v in frame[name].tolist()]
+                for value in dict.fromkeys(values):
+                    if value is not None and value not in lookup:
+                        lookup[value] = len(dictionaries[name])
+                        dictionaries[name].append(value)
+                codes = np.fromiter((lookup.get(v, -1) if v is not None else -1 for v in values), dtype="int32", count=len(values))
+                files[name].write(codes.tobytes())
+            rows += len(frame)
+            last_id = int(frame["id"].iloc[-1])
+            log(f"{rows} rows exported")
+    finally:
+        for fh in files.values():
+            fh.close()
+
+    meta = {
+        "rows": rows,
+        "version": db.data_version(),
+        "numeric": NUMERIC_COLUMNS,
+        "strings": {name: dictionaries[name] for name in STRING_COLUMNS},
+    }
+    with open(os.path.join(path, "meta.json"), "w") as fh:
+        json.dump(meta, fh)
+    return rows
+
+
+class Snapshot:
+    """Read-only view of an exported snapshot; columns are memory-mapped on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as fh:
+            self.meta = json.load(fh)
+        self.rows = self.meta["rows"]
+        self.dictionaries = {name: np.asarray(values, dtype=object) for name, values in self.meta["strings"].items()}
+        self._columns = {}
+
+    def column(self, name):
+        if name not in self._columns:
+            dtype = self.meta["numeric"].get(name, "int32")
+            if self.rows == 0:
+                self._columns[name] = np.zeros(0, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(_column_path(self.path, name), dtype=dtype, mode="r", shape=(self.rows,))
+        return self._columns[name]
+
+    # Decode dictionary codes back to strings (None for NULL)
+    def labels(self, name, codes):
+        codes = np.asarray(codes)
+        values = np.empty(len(codes), dtype=object)
+        present = codes >= 0
+        values[present] = self.dictionaries[name][codes[present]]
+        return values
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def load_snapshot(path=None):
+    """Snapshot at ``path`` (default SNAPSHOT_DIR), reloaded when it is re-exported."""
+    global _snapshot
+    path = path or SNAPSHOT_DIR
+    stamp = os.path.getmtime(os.path.join(path, "meta.json"))
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot[0] != (path, stamp):
+            _snapshot = ((path, stamp), Snapshot(path))
+        return _snapshot[1]
+
+
+# Helpers mirroring SQL semantics
+
+def _pct(num, den):
+    """ROUND(num * 100.0 / den, 2) with MySQL DECIMAL rounding (scale 5, then 2, half up)."""
+    num = np.asarray(num, dtype="int64")
+    den = np.asarray(den, dtype="int64")
+    scaled = (num * 20000000 + den) // (2 * den)
+    return ((scaled * 2 + 1000) // 2000) / 100
+
+
+def _avg4(total, count):
+    """AVG() of an integer column, which MySQL returns as DECIMAL with scale 4."""
+    total = np.asarray(total, dtype="float64")
+    count = np.asarray(count, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, np.floor(total / count * 10000 + 0.5) / 10000, np.nan)
+
+
+def _order(frame, by, ascending):
+    """ORDER BY with SQL NULL placement: NULLs first ascending, last descending."""
+    if isinstance(ascending, bool):
+        ascending = [ascending] * len(by)
+    for column, asc in reversed(list(zip(by, ascending))):
+        frame = frame.sort_values(column, ascending=asc, na_position="first" if asc else "last", kind="stable")
+    return frame.reset_index(drop=True)
+
+
+def _group(snapshot, keys, mask=None, **aggregates):
+    """GROUP BY ``keys`` over the rows in ``mask``.
+
+    ``aggregates`` maps output names to ("count", None), ("sum", array) or
+    ("mean_valid", (values, valid)). String keys come back decoded and the
+    result is ordered by the group keys, NULL first.
+    """
+    data = {}
+    for key in keys:
+        values = np.asarray(snapshot.column(key))
+        data[key] = values[mask] if mask is not None else values
+    for name, (kind, values) in aggregates.items():
+        if kind == "sum":
+            values = np.asarray(values, dtype="int64")
+            data[name] = values[mask] if mask is not None else values
+        elif kind == "mean_valid":
+            values, valid = values
+            values = np.where(valid, values, 0).astype("float64")
+            valid = np.asarray(valid, dtype="int64")
+            data[name + "__sum"] = values[mask] if mask is not None else values
+            data[name + "__n"] = valid[mask] if mask is not None else valid
+    frame = pd.DataFrame(data)
+    grouped = frame.groupby(keys, sort=False)
+    result = grouped.size().rename("__count").to_frame()
+    for name, (kind, _) in aggregates.items():
+        if kind == "count":
+            result[name] = result["__count"]
+        elif kind == "sum":
+            result[name] = grouped[name].sum()
+        elif kind == "mean_valid":
+            result[name] = _avg4(grouped[name + "__sum"].sum(), grouped[name + "__n"].sum())
+    result = result.reset_index()
+
+    for key in keys:
+        if key in snapshot.dictionaries:
+            result[key] = snapshot.labels(key, result[key].to_numpy())
+        else:
+            result[key] = [int(v) if v >= 0 else None for v in result[key]]
+    return _order(result, keys, True)
+
+
+def _flag(snapshot, name):
+    return np.asarray(snapshot.column(name)) == 1
+
+
+def _duration_values(snapshot):
+    # AVG(stop_duration) converts strings by their numeric prefix ("16-30 Min" -> 16)
+    prefixes = [re.match(r"\s*[-+]?\d*\.?\d*", value).group(0).strip() for value in snapshot.dictionaries["stop_duration"]]
+    numbers = np.asarray([float(p) if p not in ("", "+", "-", ".") else 0.0 for p in prefixes] + [0.0])
+    codes = np.asarray(snapshot.column("stop_duration"))
+    return numbers[codes], codes >= 0
+
+
+# Analyses, one per canned question
+
+def top_drug_vehicles(s):
+    r = _group(s, ["vehicle_number"], _flag(s, "drugs_related_stop"), drugs_related_stop=("count", None))
+    return _order(r, ["drugs_related_stop"], False).head(10)[["vehicle_number", "drugs_related_stop"]]
+
+
+def most_searched_vehicles(s):
+    r = _group(s, ["vehicle_number"], _flag(s, "search_conducted"), search_count=("count", None))
+    return _order(r, ["search_count"], False).head(15)[["vehicle_number", "search_count"]]
+
+
+def age_group_arrest_rate(s):
+    age = np.asarray(s.column("driver_age"))
+    bands = np.select(
+        [(age >= 18) & (age <= 25), (age >= 26) & (age <= 35), (age >= 36) & (age <= 45), (age >= 46) & (age <= 60)],
+        ["18-25", "26-35", "36-45", "46-60"],
+        "60+",
+    )
+    frame = pd.DataFrame({"age_group": bands, "arrested": _flag(s, "is_arrested").astype("int64")})
+    r = frame.groupby("age_group", sort=True).agg(total_driver=("arrested", "size"), total_arrests=("arrested", "sum")).reset_index()
+    r["arrest_rate_percent"] = _pct(r["total_arrests"], r["total_driver"])
+    return _order(r, ["arrest_rate_percent"], False).head(1)
+
+
+def gender_by_country(s):
+    r = _group(s, ["country_name", "driver_gender"], total_gender=("count", None))
+    country_totals = r.groupby("country_name", dropna=False)["total_gender"].transform("sum")
+    r["gender_percent"] = _pct(r["total_gender"], country_totals)
+    return r[["country_name", "driver_gender", "total_gender", "gender_percent"]]
+
+
+def race_gender_search_rate(s):
+    mask = (np.asarray(s.column("driver_race")) >= 0) & (np.asarray(s.column("driver_gender")) >= 0)
+    r = _group(s, ["driver_race", "driver_gender"], mask, total_stops=("count", None),
+               total_searches=("sum", _flag(s, "search_conducted")))
+    r["search_percent_rate"] = _pct(r["total_searches"], r["total_stops"])
+    return _order(r, ["search_percent_rate"], False).head(1)[
+        ["driver_race", "driver_gender", "total_stops", "total_searches", "search_percent_rate"]]
+
+
+def busiest_hour(s):
+    hour = np.asarray(s.column("stop_hour"))
+    r = _group(s, ["stop_hour"], (hour >= 0) & (hour <= 23), total_stops=("count", None))
+    return _order(r, ["total_stops"], False).head(1)[["stop_hour", "total_stops"]]
+
+
+def average_duration_by_violation(s):
+    durations, valid = _duration_values(s)
+    r = _group(s, ["violation"], valid, average_stop_duration=("mean_valid", (durations, valid)))
+    r["average_stop_duration"] = r["average_stop_duration"].astype("float64")
+    return _order(r, ["average_stop_duration"], False)[["violation", "average_stop_duration"]]
+
+
+def night_vs_day_arrests(s):
+    hour = np.asarray(s.column("stop_hour"))
+    mask = (hour >= 0) & (hour <= 23)
+    night = ((hour >= 20) & (hour <= 23)) | ((hour >= 0) & (hour <= 5))
+    frame = pd.DataFrame({
+        "time_of_day": np.where(night, "Night", "Day")[mask],
+        "arrested": _flag(s, "is_arrested")[mask].astype("int64"),
+    })
+    r = frame.groupby("time_of_day", sort=True).agg(total_stops=("arrested", "size"), total_arrests=("arrested", "sum")).reset_index()
+    r["arrest_rate_percent"] = _pct(r["total_arrests"], r["total_stops"])
+    return _order(r, ["arrest_rate_percent"], False)
+
+
+def violations_with_search_or_arrest(s):
+    arrested, searched = _flag(s, "is_arrested"), _flag(s, "search_conducted")
+    r = _group(s, ["violation"], total_stops=("count", None), total_arrests=("sum", arrested),
+               total_searches=("sum", searched), search_or_arrest_total=("sum", arrested | searched))
+    return _order(r, ["search_or_arrest_total"], False).head(10)[
+        ["violation", "total_stops", "total_arrests", "total_searches", "search_or_arrest_total"]]
+
+
+def young_driver_violations(s):
+    age = np.asarray(s.column("driver_age"))
+    r = _group(s, ["violation"], (age >= 0) & (age < 25), total_stops=("count", None))
+    return _order(r, ["total_stops"], False).head(10)[["violation", "total_stops"]]
+
+
+def rarely_arrested_violation(s):
+    r = _group(s, ["violation"], total_stops=("count", None), total_arrests=("sum", _flag(s, "is_arrested")))
+    return _order(r, ["total_arrests"], True).head(1)[["violation", "total_stops", "total_arrests"]]
+
+
+def drug_stop_rate_by_country(s):
+    r = _group(s, ["country_name"], total_stops=("count", None), drug_related_stops=("sum", _flag(s, "drugs_related_stop")))
+    r["drug_stop_rate_percent"] = _pct(r["drug_related_stops"], r["total_stops"])
+    return _order(r, ["drug_stop_rate_percent"], False)[
+        ["country_name", "total_stops", "drug_related_stops", "drug_stop_rate_percent"]]
+
+
+def arrest_rate_by_country_violation(s):
+    r = _group(s, ["country_name", "violation"], total_stops=("count", None), total_arrests=("sum", _flag(s, "is_arrested")))
+    r["total_arrest_percent"] = _pct(r["total_arrests"], r["total_stops"])
+    return _order(r, ["country_name"], True)[
+        ["country_name", "total_stops", "violation", "total_arrests", "total_arrest_percent"]]
+
+
+def most_searched_country(s):
+    r = _group(s, ["country_name"], _flag(s, "search_conducted"), search_count=("count", None))
+    return _order(r, ["search_count"], False).head(1)[["country_name", "search_count"]]
+
+
+def yearly_breakdown(s):
+    r = _group(s, ["country_name", "stop_year"], total_stops=("count", None), total_arrests=("sum", _flag(s, "is_arrested")))
+    r["Arrest_rate_percent"] = _pct(r["total_arrests"], r["total_stops"])
+    r["Arrest_rank"] = r.groupby("stop_year", dropna=False)["total_arrests"].rank(method="min", ascending=False).astype("int64")
+    return _order(r, ["stop_year", "Arrest_rank"], True)[
+        ["country_name", "stop_year", "total_stops", "total_arrests", "Arrest_rate_percent", "Arrest_rank"]]
+
+
+def violation_trends_by_age_race(s):
+    r = _group(s, ["driver_age", "driver_race", "violation"], violation_count=("count", None))
+    # The SQL joins on driver_age / driver_race equality, which drops NULL groups
+    r = r[r["driver_age"].notna() & r["driver_race"].notna()]
+    top = r.groupby(["driver_age", "driver_race"])["violation_count"].transform("max")
+    r = r[r["violation_count"] == top]
+    return _order(r, ["driver_race", "driver_age"], True)[["driver_age", "driver_race", "violation", "violation_count"]]
+
+
+def time_period_analysis(s):
+    r = _group(s, ["stop_year", "stop_month", "stop_hour"], stop_count=("count", None))
+    return r.rename(columns={"stop_year": "Year", "stop_month": "Month", "stop_hour": "Hour"})[
+        ["Year", "Month", "Hour", "stop_count"]]
+
+
+def violations_search_arrest_rates(s):
+    r = _group(s, ["violation"], Total_stops=("count", None), Total_searches=("sum", _flag(s, "search_conducted")),
+               Total_arrests=("sum", _flag(s, "is_arrested")))
+    r["Search_rate"] = _pct(r["Total_searches"], r["Total_stops"])
+    r["arrest_rate"] = _pct(r["Total_arrests"], r["Total_stops"])
+    r["Arrest_rank"] = r["Total_arrests"].rank(method="min", ascending=False).astype("int64")
+    return _order(r, ["Arrest_rank"], True).head(10)[
+        ["violation", "Total_stops", "Total_searches", "Total_arrests", "Search_rate", "arrest_rate", "Arrest_rank"]]
+
+
+def demographics_by_country(s):
+    age = np.asarray(s.column("driver_age"))
+    r = _group(s, ["country_name", "driver_gender", "driver_race"], Stop_count=("count", None),
+               Avg_age=("mean_valid", (age, age >= 0)))
+    r = r.rename(columns={"driver_gender": "Driver_gender", "driver_race": "Driver_race"})
+    return _order(r, ["country_name", "Stop_count"], [True, False])[
+        ["country_name", "Avg_age", "Driver_gender", "Driver_race", "Stop_count"]]
+
+
+def top_arrest_rate_violations(s):
+    r = _group(s, ["violation"], Total_stops=("count", None), Total_arrests=("sum", _flag(s, "is_arrested")))
+    r["Arrest_rate_percent"] = _pct(r["Total_arrests"], r["Total_stops"])
+    return _order(r, ["Arrest_rate_percent"], False).head(5)[
+        ["violation", "Total_stops", "Total_arrests", "Arrest_rate_percent"]]
+
+
+ANALYSES = dict(zip(list(query_map) + list(query_map_1), [
+    top_drug_vehicles,
+    most_searched_vehicles,
+    age_group_arrest_rate,
+    gender_by_country,
+    race_gender_search_rate,
+    busiest_hour,
+    average_duration_by_violation,
+    night_vs_day_arrests,
+    violations_with_search_or_arrest,
+    young_driver_violations,
+    rarely_arrested_violation,
+    drug_stop_rate_by_country,
+    arrest_rate_by_country_violation,
+    most_searched_country,
+    yearly_breakdown,
+    violation_trends_by_age_race,
+    time_period_analysis,
+    violations_search_arrest_rates,
+    demographics_by_country,
+    top_arrest_rate_violations,
+]))
+
+
+def answer(question, snapshot=None):
+    """Result of a canned question computed from the snapshot."""
+    timer = instrumentation.Timer()
+    snapshot = snapshot or load_snapshot()
+    timer.mark("load")
+    frame = ANALYSES[question](snapshot).reset_index(drop=True)
+    timer.mark("compute")
+    instrumentation.record("query", query=question, backend="columnar", total_ms=timer.total_ms(),
+                           rows=len(frame), result_bytes=db.result_bytes(frame), **timer.phases)
+    return frame
+
+
+def _same(sql_frame, snap_frame):
+    # Column name case differs between MySQL and SQLite for plain column references
+    names = [str(c).lower() for c in sql_frame.columns]
+    if names != [str(c).lower() for c in snap_frame.columns] or len(sql_frame) != len(snap_frame):
+        return False
+    for i in range(len(names)):
+        left, right = sql_frame.iloc[:, i].tolist(), snap_frame.iloc[:, i].tolist()
+        for a, b in zip(left, right):
+            if a is None or b is None or (isinstance(a, float) and a != a) or (isinstance(b, float) and b != b):
+                if not ((a is None or a != a) and (b is None or b != b)):
+                    return False
+            elif isinstance(a, str) or isinstance(b, str):
+                if str(a) != str(b):
+                    return False
+            # SQLite rounds doubles where MySQL rounds DECIMALs, so allow one unit in the 2nd decimal
+            elif abs(float(a) - float(b)) > 0.011:
+                return False
+    return True
+
+
+def _sort_key(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return (0, 0.0, "")
+    if isinstance(value, str):
+        return (2, 0.0, value)
+    return (1, float(value), "")
+
+
+def _canonical(frame):
+    rows = frame.values.tolist()
+    order = sorted(range(len(rows)), key=lambda i: [_sort_key(v) for v in rows[i]])
+    return frame.iloc[order].reset_index(drop=True)
+
+
+# Compare every analysis against its SQL; returns the questions that differ
+def verify(connection, snapshot, log=print):
+    mismatched = []
+    for question, query in {**query_map, **query_map_1}.items():
+        with connection.cursor() as cur:
+            # Same rows as the snapshot: the history view once years are archived
+            cur.execute(partitions.scope(query, connection=connection))
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+        sql_frame = pd.DataFrame(rows, columns=columns) if rows else pd.DataFrame(columns=columns)
+        snap_frame = answer(question, snapshot)
+        ok = _same(sql_frame, snap_frame)
+        if not ok and len(sql_frame) == len(snap_frame):
+            # SQL leaves the order of rows tied on the ORDER BY keys undefined
+            ok = _same(_canonical(sql_frame), _canonical(snap_frame))
+        log(("ok        " if ok else "MISMATCH  ") + question)
+        if not ok:
+            mismatched.append(question)
+    return mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar snapshot of police_post_logs")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("snapshot", help="snapshot directory")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        if args.command == "export":
+            rows = export(connection, args.snapshot)
+            print(f"Exported {rows} rows to {args.snapshot}")
+        else:
+            mismatched = verify(connection, Snapshot(args.snapshot))
+            if mismatched:
+                print(f"{len(mismatched)} analyses differ from SQL")
+                sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
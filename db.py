@@ -0,0 +1,591 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pymysql
+from pandas.api.types import union_categoricals
+from pymysql.constants import FIELD_TYPE
+
+import instrumentation
+
+# MySQL settings for the police ledger database
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "user": "root",
+    "password": "",
+    "database": "policeledger",
+}
+
+POOL_SIZE = 5            # connections shared by every dashboard session
+CACHE_TTL = 300          # seconds a cached query result stays fresh
+CACHE_SIZE = 128         # max cached results before LRU eviction
+STREAM_CHUNK = 50000     # rows per chunk when streaming a result set
+
+# Point this at a SQLite file to run against the local stand-in instead of MySQL
+SQLITE_PATH = os.environ.get("SECURECHECK_SQLITE")
+
+# Columns of police_post_logs, in insert order
+LOG_COLUMNS = [
+    "stop_date", "stop_time", "country_name", "driver_gender", "driver_age_raw",
+    "driver_age", "driver_race", "violation_raw", "violation",
+    "search_conducted", "search_type", "stop_outcome", "is_arrested",
+    "stop_duration", "drugs_related_stop", "vehicle_number",
+]
+
+CREATE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS {table}(
+{id_column},
+stop_date DATE,
+stop_time TIME,
+country_name VARCHAR(50),
+driver_gender VARCHAR(10),
+driver_age_raw INT,
+driver_age INT,
+driver_race VARCHAR(50),
+violation_raw VARCHAR(100),
+violation VARCHAR(100),
+search_conducted BOOLEAN,
+search_type VARCHAR(100),
+stop_outcome VARCHAR(100),
+is_arrested BOOLEAN,
+stop_duration VARCHAR(50),
+drugs_related_stop BOOLEAN,
+vehicle_number VARCHAR(50))"""
+
+# Stored as pandas categoricals when a result set is streamed
+LOW_CARDINALITY_COLUMNS = [
+    "country_name", "driver_gender", "driver_race", "violation_raw", "violation",
+    "search_type", "stop_outcome", "stop_duration",
+]
+BOOL_COLUMNS = ["search_conducted", "is_arrested", "drugs_related_stop"]
+# Declared numeric in the schema; other text columns keep their strings (and leading zeros)
+NUMERIC_COLUMNS = ["id", "driver_age_raw", "driver_age"]
+# MySQL result types that are numbers (DECIMAL results such as SUM() arrive as objects)
+NUMERIC_FIELD_TYPES = {
+    FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24, FIELD_TYPE.LONGLONG,
+    FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.YEAR,
+}
+
+ID_COLUMN = {
+    "mysql": "id INT AUTO_INCREMENT PRIMARY KEY",
+    "sqlite": "id INTEGER PRIMARY KEY AUTOINCREMENT",
+}
+
+# Ingestion writes a new token here; caches compare it to drop stale results
+DATA_VERSION_FILE = os.environ.get(
+    "SECURECHECK_DATA_VERSION",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ledger_version"),
+)
+
+
+# Open a new ledger connection (used by the pool)
+def create_connection():
+    if SQLITE_PATH:
+        return connect_sqlite(SQLITE_PATH)
+    return pymysql.connect(
+        cursorclass=pymysql.cursors.DictCursor,  # To get column names
+        autocommit=True,  # pooled readers must not hold a stale snapshot
+        **DB_CONFIG,
+    )
+
+
+class SQLiteCursor:
+    """Cursor for the SQLite stand-in that accepts pymysql's ``%s`` paramstyle."""
+
+    dialect = "sqlite"
+
+    def __init__(self, cursor, dict_rows):
+        self._cursor = cursor
+        self._dict_rows = dict_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=None):
+        if params:
+            self._cursor.execute(_qmark(query), tuple(params))
+        else:
+            self._cursor.execute(query)
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(_qmark(query), seq_of_params)
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchmany(self, size):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+    def _row(self, row):
+        if not self._dict_rows:
+            return row
+        return dict(zip([d[0] for d in self._cursor.description], row))
+
+
+class SQLiteConnection:
+    """Local SQLite stand-in with the subset of the pymysql API the app uses.
+
+    Runs in autocommit mode like the pooled MySQL readers; writers call
+    ``begin()`` / ``commit()`` explicitly.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path, dict_rows=True):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._dict_rows = dict_rows
+        self._conn.create_function("HOUR", 1, _sql_hour, deterministic=True)
+        self._conn.create_function("YEAR", 1, _sql_year, deterministic=True)
+        self._conn.create_function("MONTH", 1, _sql_month, deterministic=True)
+        self._conn.create_function("STR_TO_DATE", 2, lambda value, fmt: value, deterministic=True)
+
+    def cursor(self, dict_rows=None):
+        return SQLiteCursor(self._conn.cursor(), self._dict_rows if dict_rows is None else dict_rows)
+
+    def begin(self):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def connect_sqlite(path, dict_rows=True):
+    return SQLiteConnection(path, dict_rows=dict_rows)
+
+
+# "mysql" or "sqlite" for a connection or cursor, for the few statements that differ
+def dialect(connection):
+    return getattr(connection, "dialect", "mysql")
+
+
+# Create police_post_logs if it does not exist yet
+def create_schema(connection):
+    with connection.cursor() as cur:
+        cur.execute(CREATE_TABLE_SQL.format(table="police_post_logs", id_column=ID_COLUMN[dialect(connection)]))
+
+
+# Physical tables holding police_post_logs rows: the per-year tables when the
+# SQLite stand-in emulates partitions (see partitions.py), else the table itself
+def log_tables(connection):
+    if dialect(connection) != "sqlite":
+        return ["police_post_logs"]
+    with connection.cursor(dict_rows=False) as cur:
+        cur.execute("SELECT type FROM sqlite_master WHERE name = 'police_post_logs'")
+        row = cur.fetchone()
+        if row is None or row[0] == "table":
+            return ["police_post_logs"]
+        cur.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'police_post_logs_p*' ORDER BY name"
+        )
+        return [name for (name,) in cur.fetchall()]
+
+
+# Highest police_post_logs id: the high-water mark for incremental in-memory indexes
+def last_log_id():
+    top = fetch_data("SELECT id FROM police_post_logs ORDER BY id DESC LIMIT 1", use_cache=False, label="db.last_log_id")
+    return int(top["id"].iloc[0]) if not top.empty else 0
+
+
+def _qmark(query):
+    return re.sub(r"%(s|%)", lambda m: "?" if m.group(1) == "s" else "%", query)
+
+
+def _sql_hour(value):
+    return int(str(value)[:2]) if value is not None else None
+
+
+def _sql_year(value):
+    return int(str(value)[:4]) if value is not None else None
+
+
+def _sql_month(value):
+    return int(str(value)[5:7]) if value is not None else None
+
+
+# Version token stored in ``path`` ("" before the first bump)
+def read_version(path):
+    try:
+        with open(path) as fh:
+            return fh.read().strip()
+    except OSError:
+        return ""
+
+
+# Write a new version token to ``path``, atomically
+def write_version(path):
+    token = str(time.time_ns())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        fh.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+# Current data version token, changes every time new rows are ingested
+def data_version():
+    return read_version(DATA_VERSION_FILE)
+
+
+# Mark the ledger as changed so cached results are dropped everywhere
+def bump_data_version():
+    token = write_version(DATA_VERSION_FILE)
+    _cache.invalidate()
+    return token
+
+
+class ConnectionPool:
+    """Fixed-size pool of reusable connections.
+
+    At most ``size`` connections are open at once; callers block until a
+    slot is free. Idle connections are pinged before reuse and connections
+    that raised are closed instead of being returned to the pool.
+    """
+
+    def __init__(self, connect=create_connection, size=POOL_SIZE):
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._slots = threading.BoundedSemaphore(size)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except Exception:
+                self._discard(conn)
+                raise
+            self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+        ping = getattr(conn, "ping", None)
+        if ping is not None:
+            try:
+                ping(reconnect=True)
+            except Exception:
+                self._discard(conn)
+                return self._connect()
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+class QueryCache:
+    """Thread-safe result cache with TTL and LRU eviction.
+
+    Entries are keyed by ``(query, params)``. The whole cache is cleared
+    when the ledger data version changes, so rows ingested by another
+    process are never hidden behind a stale result.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, maxsize=CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = data_version()
+
+    def get(self, key):
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = data_version()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _check_version(self):
+        version = data_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+
+_cache = QueryCache()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Shared connection pool, created on first use
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(size=POOL_SIZE)
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
+
+# Send every later query to a SQLite file (benchmarks and local runs)
+def use_sqlite(path):
+    global SQLITE_PATH
+    SQLITE_PATH = path
+    _reset_pool()
+    _cache.invalidate()
+
+
+# Resize the shared pool; the next query opens a pool of the new size
+def set_pool_size(size):
+    global POOL_SIZE
+    POOL_SIZE = size
+    _reset_pool()
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+# Fetch data from the database, served from the result cache when possible.
+# Cached DataFrames are shared between sessions, so callers must not modify them.
+def fetch_data(query, params=None, use_cache=True, stream=False, label=None):
+    """Run ``query`` and return the result as a DataFrame.
+
+    With ``stream=True`` rows are read through an unbuffered server-side
+    cursor and the frame is built chunk by chunk from tuples, with
+    low-cardinality text columns as categoricals and integer and boolean
+    columns downcast (see ``compact_frame``). Use it for large result sets.
+
+    Every call is recorded by ``instrumentation`` under ``label`` (a catalog
+    key such as the question text) or the query text: pool checkout,
+    execute, fetch and DataFrame build times, row count and result bytes.
+    """
+    key = (query, tuple(params) if params else (), stream)
+    name = instrumentation.query_label(query, label)
+    timer = instrumentation.Timer()
+    if use_cache:
+        cached = _cache.get(key)
+        if cached is not None:
+            instrumentation.record("query", query=name, cache="hit", total_ms=timer.total_ms(), rows=len(cached))
+            return cached
+
+    try:
+        with get_pool().connection() as connection:
+            timer.mark("connect")
+            if stream:
+                df = _fetch_streaming(connection, query, params, timer=timer)
+            else:
+                with connection.cursor() as cur:
+                    cur.execute(query, params)
+                    timer.mark("execute")
+                    result = cur.fetchall()
+                    timer.mark("fetch")
+                df = pd.DataFrame(result)
+                timer.mark("frame")
+    except Exception as exp:
+        instrumentation.record("query", query=name, cache="error", total_ms=timer.total_ms(),
+                               error=str(exp), **timer.phases)
+        raise
+
+    instrumentation.record(
+        "query", query=name, cache="miss" if use_cache else "off", stream=stream,
+        total_ms=timer.total_ms(), rows=len(df), result_bytes=result_bytes(df), **timer.phases,
+    )
+    if use_cache:
+        _cache.put(key, df)
+    return df
+
+
+# Deep (string-aware) frame size for normal results; shallow beyond this many rows
+DEEP_SIZE_ROWS = 50000
+
+
+def result_bytes(df):
+    return int(df.memory_usage(index=True, deep=len(df) <= DEEP_SIZE_ROWS).sum())
+
+
+def _stream_cursor(connection):
+    if dialect(connection) == "sqlite":
+        return connection.cursor(dict_rows=False)
+    return connection.cursor(pymysql.cursors.SSCursor)
+
+
+def _smallest_int(low, high, nullable):
+    for name in ("int8", "int16", "int32"):
+        info = np.iinfo(name)
+        if info.min <= low and high <= info.max:
+            return name.capitalize() if nullable else name
+    return "Int64" if nullable else "int64"
+
+
+# Downcast a numeric column; text and object columns are only parsed when ``declared`` numeric
+def _compact_numeric(series, declared=False):
+    if series.dtype == bool or isinstance(series.dtype, pd.BooleanDtype):
+        return series
+    parsed = not pd.api.types.is_numeric_dtype(series)
+    if parsed and not declared:
+        return series
+    numeric = pd.to_numeric(series, errors="coerce") if parsed else series
+    if not pd.api.types.is_numeric_dtype(numeric) or numeric.isna().all():
+        return series
+    if parsed and numeric.isna().sum() != series.isna().sum():
+        return series  # not a numeric column after all
+    valid = numeric.dropna()
+    if pd.api.types.is_float_dtype(valid) and not (valid == valid.round()).all():
+        return numeric.astype("float32") if parsed else series
+    nullable = bool(numeric.isna().any())
+    return numeric.astype(_smallest_int(int(valid.min()), int(valid.max()), nullable))
+
+
+def compact_column(name, series, numeric=False):
+    """Smaller dtype for one result column: categorical, downcast int or boolean.
+
+    Object values are parsed as numbers only for NUMERIC_COLUMNS or when
+    ``numeric`` says the database typed the column as a number.
+    """
+    if name in LOW_CARDINALITY_COLUMNS:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        return series.astype("category")
+    if name in BOOL_COLUMNS:
+        if series.isna().any():
+            return pd.to_numeric(series, errors="coerce").astype("boolean")
+        return series.astype(bool)
+    return _compact_numeric(series, numeric or name in NUMERIC_COLUMNS)
+
+
+def compact_frame(frame, numeric=()):
+    """Copy of ``frame`` with every column passed through ``compact_column``."""
+    return pd.DataFrame({
+        column: compact_column(column, frame[column], column in numeric) for column in frame.columns
+    })
+
+
+# Result columns the cursor reports as numbers (SQLite reports no types)
+def _numeric_columns(description):
+    return {d[0] for d in description if d[1] in NUMERIC_FIELD_TYPES}
+
+
+def _concat_chunks(chunks, columns, numeric=()):
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    if len(chunks) == 1:
+        return chunks[0]
+    data = {}
+    for column in columns:
+        parts = [chunk.pop(column) for chunk in chunks]  # release chunk columns as we go
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[column] = pd.Categorical(union_categoricals(parts, ignore_order=True))
+        else:
+            data[column] = pd.concat(parts, ignore_index=True)
+    return compact_frame(pd.DataFrame(data), numeric)
+
+
+def _fetch_streaming(connection, query, params, chunk_size=None, timer=None):
+    chunk_size = chunk_size or STREAM_CHUNK
+    chunks = []
+    with _stream_cursor(connection) as cur:
+        cur.execute(query, params)
+        if timer:
+            timer.mark("execute")
+        columns = [d[0] for d in cur.description]
+        numeric = _numeric_columns(cur.description)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Build each column straight from the row tuples so no object block is kept
+            chunks.append(pd.DataFrame({
+                name: compact_column(name, pd.Series(values), name in numeric)
+                for name, values in zip(columns, zip(*rows))
+            }))
+    # Streamed rows are converted as they arrive, so "fetch" includes chunk building
+    if timer:
+        timer.mark("fetch")
+    df = _concat_chunks(chunks, columns, numeric)
+    if timer:
+        timer.mark("frame")
+    return df
@@ -0,0 +1,240 @@
+"""Indexes and generated columns for the analysis query catalog.
+
+Every index below is chosen from a query in ``queries.py`` and, where
+possible, covers all the columns that query reads so it can be answered
+from the index alone. ``stop_year``, ``stop_month`` and ``stop_hour`` are
+generated from stop_date / stop_time so the time-based questions can be
+grouped and filtered without wrapping a column in a function, and
+``plate_norm`` (the trimmed, upper-cased vehicle_number) so every spelling
+of a plate is found with one index lookup.
+
+Usage::
+
+    python index_advisor.py --migrate     # add the columns and indexes
+    python index_advisor.py               # EXPLAIN every catalog query, flag full scans
+"""
+import argparse
+import re
+import sys
+
+import db
+from queries import query_map, query_map_1
+
+GENERATED_COLUMNS = {
+    "mysql": {
+        "stop_year": "SMALLINT AS (YEAR(stop_date)) VIRTUAL",
+        "stop_month": "TINYINT AS (MONTH(stop_date)) VIRTUAL",
+        "stop_hour": "TINYINT AS (HOUR(stop_time)) VIRTUAL",
+        "plate_norm": "VARCHAR(50) AS (UPPER(TRIM(vehicle_number))) VIRTUAL",
+    },
+    "sqlite": {
+        "stop_year": "INTEGER GENERATED ALWAYS AS (CAST(substr(stop_date, 1, 4) AS INTEGER)) VIRTUAL",
+        "stop_month": "INTEGER GENERATED ALWAYS AS (CAST(substr(stop_date, 6, 2) AS INTEGER)) VIRTUAL",
+        "stop_hour": "INTEGER GENERATED ALWAYS AS (CAST(substr(stop_time, 1, 2) AS INTEGER)) VIRTUAL",
+        "plate_norm": "TEXT GENERATED ALWAYS AS (UPPER(TRIM(vehicle_number))) VIRTUAL",
+    },
+}
+
+# index name -> (columns, catalog questions it serves)
+INDEXES = {
+    "idx_drug_vehicle": (
+        ["drugs_related_stop", "vehicle_number"],
+        ["Top 10 vehicle number involed in drug related stops"],
+    ),
+    "idx_search_vehicle": (
+        ["search_conducted", "vehicle_number"],
+        ["Vehicles were most frequently searched"],
+    ),
+    "idx_search_country": (
+        ["search_conducted", "country_name"],
+        ["Country has the most stops with search conducted"],
+    ),
+    "idx_age_race_violation": (
+        ["driver_age", "driver_race", "violation", "is_arrested"],
+        ["Driver age group with highest arrest rate", "Driver violation trends by age and race"],
+    ),
+    "idx_age_violation": (
+        ["driver_age", "violation"],
+        ["Most common violations for young drivers < 25"],
+    ),
+    "idx_country_gender_race": (
+        ["country_name", "driver_gender", "driver_race", "driver_age"],
+        [
+            "Gender distribution of drivers stopped in each country",
+            "Driver demographics by country (Age, Gender and Race)",
+        ],
+    ),
+    "idx_race_gender_search": (
+        ["driver_race", "driver_gender", "search_conducted"],
+        ["Race and gender combination with highest search rate"],
+    ),
+    "idx_hour_arrest": (
+        ["stop_hour", "is_arrested"],
+        ["Time of day with most traffic stops", "Night Stops More Likely to Lead to Arrests"],
+    ),
+    "idx_violation_flags": (
+        ["violation", "is_arrested", "search_conducted", "stop_duration"],
+        [
+            "Average Stop Duration for different Violations",
+            "Violations which most associated with searches or arrests",
+            "Violation that rarely resulting in search or arrest",
+            "Violations with high search & arrest rates",
+            "Top 5 violations with highest arrest rates",
+        ],
+    ),
+    "idx_country_violation_flags": (
+        ["country_name", "violation", "is_arrested", "drugs_related_stop"],
+        [
+            "Countries that report with highest drug-related stop rates",
+            "Arrest rate by country and violation",
+        ],
+    ),
+    "idx_year_country_arrest": (
+        ["stop_year", "country_name", "is_arrested"],
+        ["Yearly breakdown of stops and arrests by country"],
+    ),
+    "idx_year_month_hour": (
+        ["stop_year", "stop_month", "stop_hour"],
+        ["Time period analysis of stops, no of stops by yr, month, hr of the day"],
+    ),
+    "idx_stop_date": (["stop_date"], ["Police Logs Overview date filter"]),
+    "idx_vehicle_number": (["vehicle_number"], ["Police Logs Overview vehicle filter"]),
+    "idx_plate_norm": (["plate_norm"], ["Vehicle Search stop history"]),
+}
+
+
+def _existing_columns(cur, dialect, table):
+    if dialect == "sqlite":
+        cur.execute(f"PRAGMA table_xinfo({table})")
+        return {row["name"] if isinstance(row, dict) else row[1] for row in cur.fetchall()}
+    cur.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row["COLUMN_NAME"] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
+
+
+def _existing_indexes(cur, dialect, table):
+    if dialect == "sqlite":
+        cur.execute(f"PRAGMA index_list({table})")
+        return {row["name"] if isinstance(row, dict) else row[1] for row in cur.fetchall()}
+    cur.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row["INDEX_NAME"] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
+
+
+# SQLite index names are per database, so each per-year table gets its own prefix
+def _index_name(name, table):
+    return name if table == "police_post_logs" else f"{table}_{name}"
+
+
+# Expression behind a generated column, e.g. "YEAR(stop_date)" for stop_year
+def generated_expression(dialect, name):
+    return re.search(r"AS \((.*)\) VIRTUAL", GENERATED_COLUMNS[dialect][name]).group(1)
+
+
+def migrate(connection, log=print):
+    """Add the generated columns and catalog indexes that are missing. Safe to re-run.
+
+    With the SQLite partition emulation every per-year table is migrated.
+    """
+    dialect = db.dialect(connection)
+    with connection.cursor() as cur:
+        for table in db.log_tables(connection):
+            columns = _existing_columns(cur, dialect, table)
+            for name, definition in GENERATED_COLUMNS[dialect].items():
+                if name not in columns:
+                    log(f"Adding column {name} to {table}")
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+            indexes = _existing_indexes(cur, dialect, table)
+            for name, (index_columns, _) in INDEXES.items():
+                index = _index_name(name, table)
+                if index not in indexes:
+                    log(f"Creating index {index} ({', '.join(index_columns)})")
+                    cur.execute(f"CREATE INDEX {index} ON {table} ({', '.join(index_columns)})")
+
+
+# Whether catalog index ``index`` on ``table`` holds every column ``query`` mentions.
+# SQLite reads generated columns from such an index without labelling it covering.
+def _covers(index, table, query):
+    name = index if table == "police_post_logs" else index[len(table) + 1:]
+    if name not in INDEXES:
+        return False
+    # SELECT * (or t.*) reads every column; COUNT(*) reads none
+    if re.search(r"\bselect\s+(?:distinct\s+)?\*|\w\.\*|,\s*\*", query, re.IGNORECASE):
+        return False
+    known = {c.lower() for c in db.LOG_COLUMNS + list(GENERATED_COLUMNS["sqlite"]) + ["id"]}
+    mentioned = set(re.findall(r"\w+", query.lower())) & known
+    return mentioned <= {c.lower() for c in INDEXES[name][0]}
+
+
+# Query plan lines for one query, as (plan text, is full scan of the rows)
+def explain(connection, query):
+    if db.dialect(connection) == "sqlite":
+        # Scans of a view (the partition emulation's UNION ALL) read its tables' plans
+        tables = set(db.log_tables(connection))
+    with connection.cursor() as cur:
+        if db.dialect(connection) == "sqlite":
+            cur.execute("EXPLAIN QUERY PLAN " + query)
+            plan = []
+            for row in cur.fetchall():
+                detail = row["detail"] if isinstance(row, dict) else row[3]
+                scanned = re.match(r"SCAN (\w+)(?: USING (COVERING )?INDEX (\w+))?", detail)
+                # A scan through a non-covering index still reads every row, plus a lookup per entry
+                full_scan = bool(scanned) and scanned.group(1) in tables and not (
+                    scanned.group(2) or (scanned.group(3) and _covers(scanned.group(3), scanned.group(1), query))
+                )
+                plan.append((detail, full_scan))
+            return plan
+
+        cur.execute("EXPLAIN " + query)
+        plan = []
+        for row in cur.fetchall():
+            detail = "table={table} partitions={partitions} type={type} key={key} rows={rows} extra={Extra}".format(
+                **{"partitions": None, **row}
+            )
+            # type=index is a full index scan; only a covering one ("Using index") skips the rows
+            full_scan = row["type"] == "ALL" or (row["type"] == "index" and "Using index" not in (row["Extra"] or ""))
+            plan.append((detail, row["table"] == "police_post_logs" and full_scan))
+        return plan
+
+
+# EXPLAIN every catalog query; returns the questions that still read every row
+def check_catalog(connection, log=print):
+    flagged = []
+    for question, query in {**query_map, **query_map_1}.items():
+        plan = explain(connection, query)
+        full_scan = any(scan for _, scan in plan)
+        log(("FULL SCAN  " if full_scan else "ok         ") + question)
+        for detail, _ in plan:
+            log("    " + detail)
+        if full_scan:
+            flagged.append(question)
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index advisor for the police_post_logs query catalog")
+    parser.add_argument("--migrate", action="store_true", help="add the generated columns and indexes")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        if args.migrate:
+            migrate(connection)
+        flagged = check_catalog(connection)
+    finally:
+        connection.close()
+    if flagged:
+        print(f"{len(flagged)} catalog queries still scan the whole table")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
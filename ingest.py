@@ -0,0 +1,202 @@
+"""Bulk CSV ingestion for police_post_logs.
+
+Streams the traffic stops CSV in chunks, applies the same cleaning as the
+SecureCheck notebook and inserts each chunk with a batched ``executemany``
+and one commit per batch. Progress is checkpointed in the database inside
+the same transaction as the rows, so a crashed load resumes exactly where
+it stopped without duplicating or skipping rows.
+
+Usage::
+
+    python ingest.py "traffic_stops - traffic_stops_with_vehicle_number.csv"
+    python ingest.py stops.csv --sqlite ledger.db --batch-size 20000
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import db
+import index_advisor
+import partitions
+import rollups
+import sketches
+import watchlist
+
+BATCH_SIZE = 10000
+
+INSERT_SQL = "INSERT INTO police_post_logs ({}) VALUES ({})".format(
+    ", ".join(db.LOG_COLUMNS), ", ".join(["%s"] * len(db.LOG_COLUMNS))
+)
+
+CREATE_CHECKPOINT_SQL = """CREATE TABLE IF NOT EXISTS ingest_checkpoints(
+source VARCHAR(255) PRIMARY KEY,
+rows_done BIGINT NOT NULL)"""
+
+BOOL_COLUMNS = ["search_conducted", "is_arrested", "drugs_related_stop"]
+INT_COLUMNS = ["driver_age_raw", "driver_age"]
+
+# Hooks called as hook(cursor, rows) inside each batch transaction,
+# after the rows are inserted and before the batch is committed
+BATCH_HOOKS = [rollups.apply_batch, watchlist.apply_batch, sketches.apply_batch]
+
+
+# Reformat dates / times; values that do not parse become NULL and are counted
+def _parse(series, fmt):
+    parsed = pd.to_datetime(series, format=fmt, errors="coerce")
+    return parsed.dt.strftime(fmt), int((parsed.isna() & series.notna()).sum())
+
+
+# Apply the notebook's cleaning to one chunk of the CSV; returns (chunk, unparseable dates and times)
+def clean_chunk(chunk):
+    # Columns missing from the table (the all-null ones in the source CSV) are dropped
+    chunk = chunk.reindex(columns=db.LOG_COLUMNS)
+
+    # Replace NAN values
+    chunk["search_type"] = chunk["search_type"].fillna("none")
+
+    # Converting date and time from object to date & time
+    chunk["stop_date"], bad_dates = _parse(chunk["stop_date"], "%Y-%m-%d")
+    chunk["stop_time"], bad_times = _parse(chunk["stop_time"], "%H:%M:%S")
+    return chunk, bad_dates + bad_times
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+# Convert a cleaned chunk into plain Python tuples for executemany
+def chunk_rows(chunk):
+    columns = []
+    for name in db.LOG_COLUMNS:
+        series = chunk[name]
+        if name in BOOL_COLUMNS:
+            values = [None if pd.isna(v) else _to_bool(v) for v in series]
+        elif name in INT_COLUMNS:
+            values = [None if pd.isna(v) else int(v) for v in series]
+        else:
+            values = [None if pd.isna(v) else v for v in series]
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _checkpoint_key(path):
+    return os.path.abspath(path)
+
+
+# Number of CSV rows of ``path`` already committed
+def load_checkpoint(connection, path):
+    with connection.cursor() as cur:
+        cur.execute(CREATE_CHECKPOINT_SQL)
+        cur.execute("SELECT rows_done FROM ingest_checkpoints WHERE source = %s", (_checkpoint_key(path),))
+        row = cur.fetchone()
+    if row is None:
+        return 0
+    return row["rows_done"] if isinstance(row, dict) else row[0]
+
+
+def _save_checkpoint(cur, path, rows_done):
+    key = _checkpoint_key(path)
+    cur.execute("UPDATE ingest_checkpoints SET rows_done = %s WHERE source = %s", (rows_done, key))
+    if cur.rowcount == 0:
+        cur.execute("INSERT INTO ingest_checkpoints (source, rows_done) VALUES (%s, %s)", (key, rows_done))
+
+
+# Insert one batch and advance the checkpoint in a single transaction
+def insert_batch(connection, rows, path, rows_done):
+    connection.begin()
+    try:
+        with connection.cursor() as cur:
+            cur.executemany(INSERT_SQL, rows)
+            for hook in BATCH_HOOKS:
+                hook(cur, rows)
+            _save_checkpoint(cur, path, rows_done)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def ingest_csv(path, connection, batch_size=BATCH_SIZE, log=print):
+    """Load ``path`` into police_post_logs, resuming from the last checkpoint.
+
+    Returns a dict with the rows inserted by this run, the total rows
+    committed for the file, the dates and times stored as NULL because they
+    did not parse, elapsed seconds and rows/sec.
+    """
+    db.create_schema(connection)
+    index_advisor.migrate(connection, log=log)
+    rollups.create_tables(connection)
+    watchlist.create_tables(connection)
+    sketches.sync(connection)
+    start_row = load_checkpoint(connection, path)
+    if start_row:
+        log(f"Resuming {path} after {start_row} rows")
+
+    rows_done = start_row
+    invalid = 0
+    started = time.perf_counter()
+    reader = pd.read_csv(
+        path,
+        chunksize=batch_size,
+        # A callable, not a range: pandas turns a range into a set of every skipped row
+        skiprows=lambda i: 0 < i <= start_row,
+        dtype={"vehicle_number": str, "stop_date": str, "stop_time": str},
+    )
+    for chunk in reader:
+        if chunk.empty:
+            continue
+        cleaned, bad = clean_chunk(chunk)
+        if bad:
+            log(f"{bad} unparseable stop_date / stop_time values after row {rows_done} stored as NULL")
+            invalid += bad
+        rows = chunk_rows(cleaned)
+        rows_done += len(rows)
+        insert_batch(connection, rows, path, rows_done)
+        db.bump_data_version()
+        sketches.checkpoint()
+
+        elapsed = time.perf_counter() - started
+        inserted = rows_done - start_row
+        log(f"{rows_done} rows committed ({inserted / elapsed:,.0f} rows/sec)")
+
+    # Years past the last partition land in pmax until they get their own
+    partitions.maintain(connection, log=log)
+    sketches.checkpoint(force=True)
+
+    elapsed = time.perf_counter() - started
+    inserted = rows_done - start_row
+    return {
+        "rows_inserted": inserted,
+        "rows_total": rows_done,
+        "invalid_values": invalid,
+        "seconds": elapsed,
+        "rows_per_sec": inserted / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load traffic stops CSV into police_post_logs")
+    parser.add_argument("csv", help="traffic stops CSV file")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per insert batch and commit")
+    parser.add_argument("--sqlite", help="load into this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        summary = ingest_csv(args.csv, connection, batch_size=args.batch_size)
+    finally:
+        connection.close()
+    print(
+        f"Inserted {summary['rows_inserted']} rows in {summary['seconds']:.1f}s "
+        f"({summary['rows_per_sec']:,.0f} rows/sec), {summary['rows_total']} total"
+    )
+    if summary["invalid_values"]:
+        print(f"{summary['invalid_values']} unparseable dates / times stored as NULL")
+
+
+if __name__ == "__main__":
+    main()
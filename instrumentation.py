@@ -0,0 +1,89 @@
+"""In-process performance records for queries and page renders.
+
+Every record goes to a bounded ring buffer (read by the dashboard's
+Performance page) and, as one JSON line, to a size-rotated log file so
+regressions can be found in production without attaching a profiler.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+RING_SIZE = 2000
+LOG_FILE = os.environ.get(
+    "SECURECHECK_PERF_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".perf_log.jsonl"),
+)
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_records = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+_logger = None
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("securecheck.perf")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers and LOG_FILE:
+            try:
+                handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            except OSError:
+                handler = logging.NullHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def record(kind, **fields):
+    """Store one record of ``kind`` ("query" or "page") with its timing fields."""
+    entry = {"ts": round(time.time(), 3), "kind": kind, **fields}
+    with _lock:
+        _records.append(entry)
+    _get_logger().info(json.dumps(entry, default=str))
+    return entry
+
+
+def records(kind=None):
+    with _lock:
+        items = list(_records)
+    return [r for r in items if kind is None or r["kind"] == kind]
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+class Timer:
+    """Collects named phase durations: ``timer.mark("execute")`` closes a phase."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase + "_ms"] = round((now - self._last) * 1000, 3)
+        self._last = now
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+
+# Short label for a query: its catalog key when given, else the collapsed SQL text
+def query_label(query, label=None):
+    return label or " ".join(query.split())[:200]
+
+
+# Records a page render; call at the end of a Streamlit run
+def record_page(page, started):
+    return record("page", page=page, render_ms=round((time.perf_counter() - started) * 1000, 3))
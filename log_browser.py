@@ -0,0 +1,121 @@
+"""Server-side paging and filtering for the Police Logs Overview page.
+
+Pages are read with keyset pagination on ``id`` (``WHERE id > last_id
+ORDER BY id LIMIT n``), so every page costs one index range read no matter
+how deep the user pages. Filters are pushed into parameterized SQL and only
+one page of rows ever leaves the database. Archived years (see
+``partitions.py``) are only listed when the date filter reaches back to them.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import partitions
+import rollups
+
+PAGE_SIZE = 100
+
+# Filters answered exactly from stop_rollup when counting rows
+ROLLUP_FILTERS = {"date_from", "date_to", "country_name", "violation", "stop_outcome"}
+
+_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="log-prefetch")
+
+
+# WHERE clause and parameters for the given filters; empty values are ignored
+def build_where(filters):
+    clauses, params = [], []
+    if filters.get("date_from"):
+        clauses.append("stop_date >= %s")
+        params.append(str(filters["date_from"]))
+    if filters.get("date_to"):
+        clauses.append("stop_date <= %s")
+        params.append(str(filters["date_to"]))
+    for column in ("country_name", "violation", "stop_outcome"):
+        if filters.get(column):
+            clauses.append(f"{column} = %s")
+            params.append(filters[column])
+    if filters.get("vehicle_number"):
+        # Prefix match keeps the predicate sargable on an index over vehicle_number
+        clauses.append("vehicle_number LIKE %s ESCAPE '!'")
+        params.append(_like_prefix(filters["vehicle_number"]))
+    return clauses, params
+
+
+def _like_prefix(value):
+    for char in "!%_":
+        value = value.replace(char, "!" + char)
+    return value + "%"
+
+
+def _source(filters):
+    return partitions.source(filters["date_from"]) if filters.get("date_from") else "police_post_logs"
+
+
+# SQL and params for the page of rows that comes after ``after_id``
+def page_query(filters, after_id=0, page_size=PAGE_SIZE):
+    clauses, params = build_where(filters)
+    clauses.append("id > %s")
+    params.append(after_id)
+    sql = "SELECT * FROM {} WHERE {} ORDER BY id LIMIT %s".format(_source(filters), " AND ".join(clauses))
+    return sql, tuple(params) + (page_size,)
+
+
+def fetch_page(filters, after_id=0, page_size=PAGE_SIZE, prefetch=True):
+    """Return one page of rows and warm the cache with the page after it."""
+    sql, params = page_query(filters, after_id, page_size)
+    page = db.fetch_data(sql, params, label="log_browser.page")
+    if prefetch and len(page) == page_size:
+        next_sql, next_params = page_query(filters, int(page["id"].iloc[-1]), page_size)
+        _prefetcher.submit(db.fetch_data, next_sql, next_params, label="log_browser.prefetch")
+    return page
+
+
+def estimate_count(filters):
+    """Approximate number of rows matching ``filters``.
+
+    Unfiltered counts come from table statistics, filters on date, country,
+    violation and outcome are summed from stop_rollup, and a vehicle number
+    filter falls back to COUNT(*) over its (index-backed) prefix range.
+    Counts cover the same rows as the pages: archived years are left out
+    unless the date filter reaches back to them.
+    """
+    active = {k for k, v in filters.items() if v}
+    # First hot stop_date when the pages skip archived years, else None
+    boundary = partitions.archive_boundary() if _source(filters) == "police_post_logs" else None
+    if not active:
+        if db.SQLITE_PATH:
+            # Top id by ORDER BY/LIMIT stays one index probe on the partition view too
+            sql = "SELECT id AS n FROM police_post_logs ORDER BY id DESC LIMIT 1"
+            if boundary:
+                # Archived rows keep their ids, so they are taken off the top id
+                sql = f"SELECT ({sql}) - (SELECT SUM(row_count) FROM log_archive) AS n"
+        else:
+            sql = ("SELECT TABLE_ROWS AS n FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'police_post_logs'")
+        result = db.fetch_data(sql, label="log_browser.count")
+    elif active <= ROLLUP_FILTERS:
+        clauses, params = build_where(filters)
+        if boundary:
+            # Undated stops stay in the hot table under the rollup's placeholder date
+            clauses.append("(stop_date >= %s OR stop_date = %s)")
+            params += [boundary, rollups.UNKNOWN_DATE]
+        result = db.fetch_data(
+            "SELECT SUM(stops) AS n FROM stop_rollup WHERE " + " AND ".join(clauses), params, label="log_browser.count"
+        )
+    else:
+        clauses, params = build_where(filters)
+        result = db.fetch_data(
+            f"SELECT COUNT(*) AS n FROM {_source(filters)} WHERE " + " AND ".join(clauses), params, label="log_browser.count"
+        )
+    if result.empty or result["n"].iloc[0] is None:
+        return 0
+    return int(result["n"].iloc[0])
+
+
+# Distinct values for a filter dropdown, read from the rollup instead of the log table
+def filter_options(column):
+    result = db.fetch_data(
+        f"SELECT DISTINCT {column} FROM stop_rollup WHERE {column} <> %s ORDER BY {column}",
+        (rollups.UNKNOWN,),
+        label=f"log_browser.options.{column}",
+    )
+    return result[column].tolist() if not result.empty else []
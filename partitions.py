@@ -0,0 +1,431 @@
+"""Yearly partitions of police_post_logs, cold-partition archival and date scoping.
+
+On MySQL police_post_logs is RANGE COLUMNS partitioned by stop_date, one
+partition per year plus a ``pmax`` catch-all, so a stop_date range only
+reads the partitions it overlaps. Partitioning needs stop_date in the
+primary key, which becomes ``(id, stop_date)``; rows without a date are
+stored under the rollups' unknown date (1000-01-01).
+
+``archive`` moves every partition that ends on or before a cutoff into its
+own ARCHIVE-engine (zlib compressed) table and drops it from the hot table.
+Archived stops stay queryable through the ``police_post_logs_history``
+view, the UNION ALL of the hot table and every archive table. ``scope``
+points a catalog query at a stop_date range of the hot table, or at the
+history view when the range reaches into archived years.
+
+The SQLite stand-in emulates the layout so it can be tried locally: one
+table per year (``police_post_logs_p2020`` ...) behind a
+``police_post_logs`` UNION ALL view, with an INSTEAD OF INSERT trigger
+routing new rows by stop_date and numbering them from ``log_id_sequence``.
+SQLite pushes a stop_date range into each table's idx_stop_date, so years
+outside the range cost one index probe. Aggregates over the view cannot
+use covering indexes, so time the catalog on an unpartitioned file. Archive
+tables are plain tables without indexes (SQLite has no compressed engine).
+
+Usage::
+
+    python partitions.py partition            # partition, or split pmax into new years
+    python partitions.py archive --before 2022-01-01
+    python partitions.py list --sqlite ledger.db
+"""
+import argparse
+import datetime
+import re
+import time
+
+import db
+import index_advisor
+
+HISTORY_VIEW = "police_post_logs_history"
+
+# Same sentinel as rollups.UNKNOWN_DATE, for rows without a stop_date (MySQL only)
+UNKNOWN_DATE = "1000-01-01"
+
+CREATE_ARCHIVE_LOG_SQL = """CREATE TABLE IF NOT EXISTS log_archive(
+table_name VARCHAR(64) PRIMARY KEY,
+date_to DATE NOT NULL,
+row_count BIGINT NOT NULL,
+archived_at VARCHAR(19) NOT NULL)"""
+
+COLUMNS = ["id"] + db.LOG_COLUMNS
+GENERATED = list(index_advisor.GENERATED_COLUMNS["mysql"])
+
+
+def _iso(value):
+    return datetime.date.fromisoformat(str(value)[:10]).isoformat()
+
+
+def _next_year(year):
+    return f"{year + 1}-01-01"
+
+
+def _first(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def _rows(cur):
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cur.fetchall()]
+
+
+def _table(name):
+    return f"police_post_logs_{name}"
+
+
+def is_partitioned(connection):
+    return bool(partitions(connection))
+
+
+def partitions(connection):
+    """(partition name, exclusive upper stop_date or None for pmax), oldest first."""
+    if db.dialect(connection) == "sqlite":
+        tables = db.log_tables(connection)
+        if tables == ["police_post_logs"]:
+            return []
+        years = sorted(int(table[len("police_post_logs_p"):]) for table in tables if table != _table("pmax"))
+        return [(f"p{year}", _next_year(year)) for year in years] + [("pmax", None)]
+
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'police_post_logs' "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+        )
+        return [
+            (name, None if bound == "MAXVALUE" else bound.strip("'"))
+            for name, bound in _rows(cur)
+        ]
+
+
+def _years(cur, table, where=""):
+    cur.execute(f"SELECT DISTINCT stop_year FROM {table} WHERE stop_year IS NOT NULL {where}")
+    return sorted(int(_first(row)) for row in cur.fetchall() if _first(row) is not None)
+
+
+# Contiguous yearly ranges, so a year without stops never widens a neighbour
+def _year_span(years):
+    return list(range(years[0], years[-1] + 1)) if years else []
+
+
+def partition(connection, log=print):
+    """Partition police_post_logs by year, or split new years out of pmax. Safe to re-run."""
+    db.create_schema(connection)
+    index_advisor.migrate(connection, log=log)
+    with connection.cursor() as cur:
+        cur.execute(CREATE_ARCHIVE_LOG_SQL)
+    if is_partitioned(connection):
+        maintain(connection, log=log)
+    elif db.dialect(connection) == "sqlite":
+        _partition_sqlite(connection, log)
+    else:
+        _partition_mysql(connection, log)
+    rebuild_history_view(connection)
+    db.bump_data_version()
+
+
+def _mysql_ranges(years):
+    ranges = [f"PARTITION p{year} VALUES LESS THAN ('{_next_year(year)}')" for year in years]
+    return ", ".join(ranges + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+
+
+def _partition_mysql(connection, log):
+    with connection.cursor() as cur:
+        years = _year_span(_years(cur, "police_post_logs", f"AND stop_date > '{UNKNOWN_DATE}'"))
+        log(f"Partitioning police_post_logs by year ({len(years)} years + pmax)")
+        cur.execute(f"UPDATE police_post_logs SET stop_date = '{UNKNOWN_DATE}' WHERE stop_date IS NULL")
+        # NOT NULL is checked after BEFORE INSERT triggers, so undated rows still load
+        cur.execute("DROP TRIGGER IF EXISTS police_post_logs_unknown_date")
+        cur.execute(
+            "CREATE TRIGGER police_post_logs_unknown_date BEFORE INSERT ON police_post_logs FOR EACH ROW "
+            f"SET NEW.stop_date = COALESCE(NEW.stop_date, '{UNKNOWN_DATE}')"
+        )
+        cur.execute(
+            "ALTER TABLE police_post_logs MODIFY stop_date DATE NOT NULL, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, stop_date)"
+        )
+        cur.execute(f"ALTER TABLE police_post_logs PARTITION BY RANGE COLUMNS(stop_date) ({_mysql_ranges(years)})")
+
+
+def _range_condition(column, lower, upper):
+    if upper is None:  # pmax also keeps undated rows
+        return f"({column} >= '{lower}' OR {column} IS NULL)" if lower else "1 = 1"
+    if lower is None:
+        return f"{column} < '{upper}'"
+    return f"{column} >= '{lower}' AND {column} < '{upper}'"
+
+
+# (table, condition on ``column``) for each partition; the oldest one has no lower bound
+def _routes(parts, column):
+    routes = []
+    lower = None
+    for name, upper in parts:
+        routes.append((_table(name), _range_condition(column, lower, upper)))
+        lower = upper
+    return routes
+
+
+def _create_partition_table(cur, name):
+    cur.execute(db.CREATE_TABLE_SQL.format(table=_table(name), id_column="id INTEGER PRIMARY KEY"))
+
+
+# Recreate the police_post_logs view and its insert routing over the per-year tables
+def _route_sqlite(cur, parts):
+    cur.execute("DROP TRIGGER IF EXISTS police_post_logs_insert")
+    cur.execute("DROP VIEW IF EXISTS police_post_logs")
+    cur.execute("CREATE VIEW police_post_logs AS " + " UNION ALL ".join(
+        f"SELECT * FROM {_table(name)}" for name, _ in parts
+    ))
+    values = ", ".join(f"NEW.{column}" for column in db.LOG_COLUMNS)
+    inserts = "".join(
+        f"INSERT INTO {table} ({', '.join(COLUMNS)}) SELECT next_id, {values} "
+        f"FROM log_id_sequence WHERE {condition};\n"
+        for table, condition in _routes(parts, "NEW.stop_date")
+    )
+    cur.execute(
+        "CREATE TRIGGER police_post_logs_insert INSTEAD OF INSERT ON police_post_logs BEGIN\n"
+        "UPDATE log_id_sequence SET next_id = next_id + 1;\n" + inserts + "END"
+    )
+
+
+def _partition_sqlite(connection, log):
+    columns = ", ".join(COLUMNS)
+    connection.begin()
+    try:
+        with connection.cursor() as cur:
+            years = _year_span(_years(cur, "police_post_logs"))
+            log(f"Splitting police_post_logs into {len(years)} yearly tables + pmax")
+            parts = [(f"p{year}", _next_year(year)) for year in years] + [("pmax", None)]
+            for (name, _), (table, condition) in zip(parts, _routes(parts, "stop_date")):
+                _create_partition_table(cur, name)
+                cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM police_post_logs WHERE {condition}")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS log_id_sequence(next_id INTEGER NOT NULL)")
+            cur.execute("DELETE FROM log_id_sequence")
+            cur.execute(
+                "INSERT INTO log_id_sequence SELECT MAX(COALESCE((SELECT MAX(id) FROM police_post_logs), 0), "
+                "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'police_post_logs'), 0))"
+            )
+            cur.execute("DROP TABLE police_post_logs")
+            _route_sqlite(cur, parts)
+        index_advisor.migrate(connection, log=log)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    _analyze(connection)
+
+
+# Index statistics let SQLite pick idx_stop_date for date ranges, i.e. prune years
+def _analyze(connection):
+    with connection.cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+def maintain(connection, log=print):
+    """Move rows that landed in pmax into new yearly partitions."""
+    parts = partitions(connection)
+    if not parts:
+        return []
+    with connection.cursor() as cur:
+        if db.dialect(connection) == "sqlite":
+            new_years = _year_span(_years(cur, _table("pmax")))
+        else:
+            new_years = _year_span(
+                _years(cur, "police_post_logs PARTITION (pmax)", f"AND stop_date > '{UNKNOWN_DATE}'")
+            )
+    if not new_years:
+        return []
+
+    log(f"Adding partitions for {new_years[0]}-{new_years[-1]}")
+    if db.dialect(connection) != "sqlite":
+        with connection.cursor() as cur:
+            cur.execute(f"ALTER TABLE police_post_logs REORGANIZE PARTITION pmax INTO ({_mysql_ranges(new_years)})")
+        db.bump_data_version()
+        return new_years
+
+    columns = ", ".join(COLUMNS)
+    connection.begin()
+    try:
+        with connection.cursor() as cur:
+            lower = parts[-2][1] if len(parts) > 1 else None
+            for year in new_years:
+                name = f"p{year}"
+                _create_partition_table(cur, name)
+                condition = _range_condition("stop_date", lower, _next_year(year))
+                cur.execute(f"INSERT INTO {_table(name)} ({columns}) SELECT {columns} FROM {_table('pmax')} WHERE {condition}")
+                cur.execute(f"DELETE FROM {_table('pmax')} WHERE {condition}")
+                lower = _next_year(year)
+            _route_sqlite(cur, parts[:-1] + [(f"p{year}", _next_year(year)) for year in new_years] + [("pmax", None)])
+        index_advisor.migrate(connection, log=log)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    _analyze(connection)
+    rebuild_history_view(connection)
+    db.bump_data_version()
+    return new_years
+
+
+def _archive_table(name):
+    return f"police_post_logs_archive_{name}"
+
+
+def archived(connection):
+    """(archive table, exclusive upper stop_date, rows) for every archived partition."""
+    with connection.cursor() as cur:
+        cur.execute(CREATE_ARCHIVE_LOG_SQL)
+        cur.execute("SELECT table_name, date_to, row_count FROM log_archive ORDER BY date_to")
+        return [(table, _iso(date_to), rows) for table, date_to, rows in _rows(cur)]
+
+
+def archive(connection, before, log=print):
+    """Move every partition ending on or before ``before`` to compressed archive tables."""
+    before = _iso(before)
+    dialect = db.dialect(connection)
+    columns = ", ".join(COLUMNS)
+    moved = []
+    with connection.cursor() as cur:
+        cur.execute(CREATE_ARCHIVE_LOG_SQL)
+    for name, upper in partitions(connection):
+        if upper is None or upper > before:
+            break
+        table = _archive_table(name)
+        source = _table(name) if dialect == "sqlite" else f"police_post_logs PARTITION ({name})"
+        connection.begin()
+        try:
+            with connection.cursor() as cur:
+                # A partition still present means any earlier copy is incomplete
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                if dialect == "sqlite":
+                    cur.execute(db.CREATE_TABLE_SQL.format(table=table, id_column="id INTEGER PRIMARY KEY"))
+                else:
+                    cur.execute(db.CREATE_TABLE_SQL.format(table=table, id_column="id INT NOT NULL") + " ENGINE=ARCHIVE")
+                cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {source}")
+                cur.execute(f"SELECT COUNT(*) FROM {source}")
+                expected = int(_first(cur.fetchone()))
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                copied = int(_first(cur.fetchone()))
+                if copied != expected:
+                    raise RuntimeError(f"archiving {name}: copied {copied} of {expected} rows")
+
+                # Recorded before the drop: MySQL DDL commits, and a rerun redoes a kept partition
+                cur.execute("DELETE FROM log_archive WHERE table_name = %s", (table,))
+                cur.execute(
+                    "INSERT INTO log_archive (table_name, date_to, row_count, archived_at) VALUES (%s, %s, %s, %s)",
+                    (table, upper, copied, time.strftime("%Y-%m-%d %H:%M:%S")),
+                )
+                if dialect == "sqlite":
+                    cur.execute(f"DROP TABLE {_table(name)}")
+                    _route_sqlite(cur, partitions(connection))
+                else:
+                    cur.execute(f"ALTER TABLE police_post_logs DROP PARTITION {name}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        log(f"Archived {name}: {copied} rows to {table}")
+        moved.append(name)
+    if moved:
+        rebuild_history_view(connection)
+        db.bump_data_version()
+    return moved
+
+
+def rebuild_history_view(connection):
+    """(Re)create police_post_logs_history: the hot table plus every archive table."""
+    dialect = db.dialect(connection)
+    names = ", ".join(COLUMNS + GENERATED)
+    computed = ", ".join(
+        COLUMNS + [f"{index_advisor.generated_expression(dialect, name)} AS {name}" for name in GENERATED]
+    )
+    selects = [f"SELECT {names} FROM police_post_logs"]
+    selects += [f"SELECT {computed} FROM {table}" for table, _, _ in archived(connection)]
+    with connection.cursor() as cur:
+        if dialect == "sqlite":
+            cur.execute(f"DROP VIEW IF EXISTS {HISTORY_VIEW}")
+            cur.execute(f"CREATE VIEW {HISTORY_VIEW} AS " + " UNION ALL ".join(selects))
+        else:
+            cur.execute(f"CREATE OR REPLACE VIEW {HISTORY_VIEW} AS " + " UNION ALL ".join(selects))
+
+
+def archive_boundary(connection=None):
+    """First stop_date still in the hot table, or None when nothing is archived."""
+    if connection is not None:
+        sqlite = db.dialect(connection) == "sqlite"
+    else:
+        sqlite = bool(db.SQLITE_PATH)
+    if sqlite:
+        exists_sql = "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = 'log_archive'"
+    else:
+        exists_sql = ("SELECT COUNT(*) AS n FROM information_schema.TABLES "
+                      "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'log_archive'")
+    boundary_sql = "SELECT MAX(date_to) AS boundary FROM log_archive"
+
+    if connection is not None:
+        with connection.cursor() as cur:
+            cur.execute(exists_sql)
+            if not int(_first(cur.fetchone())):
+                return None
+            cur.execute(boundary_sql)
+            boundary = _first(cur.fetchone())
+    else:
+        if not int(db.fetch_data(exists_sql, label="partitions.archive_exists")["n"].iloc[0]):
+            return None
+        boundary = db.fetch_data(boundary_sql, label="partitions.archive_boundary")["boundary"].dropna()
+        boundary = boundary.iloc[0] if len(boundary) else None
+    return _iso(boundary) if boundary is not None else None
+
+
+def source(date_from=None, connection=None):
+    """Table to read for stops from ``date_from`` on: the hot table, or the history view."""
+    boundary = archive_boundary(connection)
+    if boundary and (not date_from or _iso(date_from) < boundary):
+        return HISTORY_VIEW
+    return "police_post_logs"
+
+
+def scope(query, date_from=None, date_to=None, connection=None):
+    """``query`` restricted to stop_date between ``date_from`` and ``date_to`` (inclusive).
+
+    Reads of police_post_logs become a derived table over the hot table (so
+    MySQL prunes partitions outside the range) or over the history view when
+    the range reaches archived years. Unchanged when there is nothing to do.
+    """
+    table = source(date_from, connection)
+    clauses = []
+    if date_from:
+        clauses.append(f"stop_date >= '{_iso(date_from)}'")
+    if date_to:
+        clauses.append(f"stop_date <= '{_iso(date_to)}'")
+    if table == "police_post_logs" and not clauses:
+        return query
+    derived = f"(SELECT * FROM {table}{' WHERE ' + ' AND '.join(clauses) if clauses else ''}) AS police_post_logs"
+    return re.sub(r"\bFROM\s+police_post_logs\b", lambda _: "FROM " + derived, query)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Yearly partitions and archival for police_post_logs")
+    parser.add_argument("command", choices=["partition", "archive", "list"])
+    parser.add_argument("--before", help="archive partitions ending on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+    if args.command == "archive" and not args.before:
+        parser.error("archive needs --before")
+
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        if args.command == "partition":
+            partition(connection)
+        elif args.command == "archive":
+            moved = archive(connection, args.before)
+            print(f"Archived {len(moved)} partitions")
+        for name, upper in partitions(connection):
+            print(f"hot      {name:<8} < {upper or 'MAXVALUE'}")
+        for table, upper, rows in archived(connection):
+            print(f"archived {table} < {upper} ({rows} rows)")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
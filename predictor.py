@@ -0,0 +1,198 @@
+"""Lookup index behind the Predict Outcome page.
+
+The index maps (driver_gender, driver_age, search_conducted, stop_duration,
+drugs_related_stop) to the most common stop_outcome and violation for that
+combination. When an exact combination has never been seen, the lookup
+backs off to coarser keys (age band, then no age, then only the search and
+drug flags, then the whole ledger). It is built once per data version from
+a single GROUP BY, saved to disk so the app starts warm, and every
+prediction is a handful of dict lookups.
+"""
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+
+import db
+import partitions
+
+INDEX_FILE = os.environ.get(
+    "SECURECHECK_PREDICT_INDEX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".predict_index.json"),
+)
+
+# Fallback when the ledger is empty
+DEFAULT_PREDICTION = ("Warning", "Speeding")
+
+COMBINATIONS_SQL = """SELECT driver_gender, driver_age, search_conducted, stop_duration,
+drugs_related_stop, stop_outcome, violation, COUNT(*) AS stops
+FROM police_post_logs
+GROUP BY driver_gender, driver_age, search_conducted, stop_duration,
+drugs_related_stop, stop_outcome, violation"""
+
+LEVELS = ["exact", "age_band", "no_age", "flags", "all"]
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def age_band(age):
+    if age is None:
+        return None
+    # Kept apart so 16 / 17-year-olds (the form allows 16) are not matched against the 60+ band
+    if age < 18:
+        return "<18"
+    if 18 <= age <= 25:
+        return "18-25"
+    if 26 <= age <= 35:
+        return "26-35"
+    if 36 <= age <= 45:
+        return "36-45"
+    if 46 <= age <= 60:
+        return "46-60"
+    return "60+"
+
+
+def _gender(value):
+    # Ledger stores "M"/"F", the form offers "Male"/"Female"
+    return None if _missing(value) or not value else str(value).strip()[:1].upper()
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().upper() in ("YES", "TRUE", "1")
+    return None if _missing(value) else bool(value)
+
+
+# Backoff keys for one combination, from most to least specific
+def level_keys(gender, age, search_conducted, stop_duration, drugs_related_stop):
+    gender = _gender(gender)
+    age = None if _missing(age) else int(age)
+    stop_duration = None if _missing(stop_duration) else stop_duration
+    search_conducted = _flag(search_conducted)
+    drugs_related_stop = _flag(drugs_related_stop)
+    return [
+        (gender, age, search_conducted, stop_duration, drugs_related_stop),
+        (gender, age_band(age), search_conducted, stop_duration, drugs_related_stop),
+        (gender, search_conducted, stop_duration, drugs_related_stop),
+        (search_conducted, drugs_related_stop),
+        (),
+    ]
+
+
+# Most common value; ties go to the smallest value, like pandas' mode()[0]
+def _modal(counter):
+    return min(counter.items(), key=lambda item: (-item[1], item[0]))[0]
+
+
+class PredictionIndex:
+    def __init__(self, tables, durations, version=""):
+        # tables[level] is {key tuple: (modal outcome, modal violation)}
+        self.tables = tables
+        self.durations = durations
+        self.version = version
+
+    @classmethod
+    def from_rows(cls, rows, version=""):
+        """Build from (gender, age, search, duration, drugs, outcome, violation, count) rows."""
+        outcomes = [defaultdict(Counter) for _ in LEVELS]
+        violations = [defaultdict(Counter) for _ in LEVELS]
+        durations = set()
+        for gender, age, search, duration, drugs, outcome, violation, count in rows:
+            if not _missing(duration):
+                durations.add(duration)
+            for level, key in enumerate(level_keys(gender, age, search, duration, drugs)):
+                if not _missing(outcome):
+                    outcomes[level][key][outcome] += int(count)
+                if not _missing(violation):
+                    violations[level][key][violation] += int(count)
+
+        tables = []
+        for level in range(len(LEVELS)):
+            table = {}
+            for key in set(outcomes[level]) | set(violations[level]):
+                outcome = _modal(outcomes[level][key]) if outcomes[level][key] else None
+                violation = _modal(violations[level][key]) if violations[level][key] else None
+                table[key] = (outcome, violation)
+            tables.append(table)
+        return cls(tables, sorted(durations), version)
+
+    def predict(self, gender, age, search_conducted, stop_duration, drugs_related_stop):
+        """Return (stop_outcome, violation, level name) for the first key with data."""
+        keys = level_keys(gender, age, search_conducted, stop_duration, drugs_related_stop)
+        outcome = violation = None
+        matched = None
+        for level, key in enumerate(keys):
+            found = self.tables[level].get(key)
+            if found is None:
+                continue
+            outcome = outcome or found[0]
+            violation = violation or found[1]
+            matched = matched or LEVELS[level]
+            if outcome and violation:
+                break
+        return (outcome or DEFAULT_PREDICTION[0], violation or DEFAULT_PREDICTION[1], matched or "default")
+
+    def save(self, path=None):
+        path = path or INDEX_FILE
+        payload = {
+            "version": self.version,
+            "durations": self.durations,
+            "tables": [[[list(key), value[0], value[1]] for key, value in table.items()] for table in self.tables],
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or INDEX_FILE
+        with open(path) as fh:
+            payload = json.load(fh)
+        tables = [{tuple(key): (outcome, violation) for key, outcome, violation in table} for table in payload["tables"]]
+        return cls(tables, payload["durations"], payload["version"])
+
+
+def build_index(fetch=None):
+    version = db.data_version()
+    # Archived years still count, so read them back through the history view
+    query = partitions.scope(COMBINATIONS_SQL)
+    if fetch:
+        frame = fetch(query)
+    else:
+        frame = db.fetch_data(query, label="predictor.combinations")
+    rows = frame.itertuples(index=False, name=None) if not frame.empty else []
+    return PredictionIndex.from_rows(rows, version)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(path=None):
+    """Prediction index for the current data version.
+
+    Loaded from ``path`` (default INDEX_FILE) when the saved copy matches
+    the data version, otherwise rebuilt from the ledger and saved back.
+    """
+    global _index
+    path = path or INDEX_FILE
+    version = db.data_version()
+    if _index is not None and _index.version == version:
+        return _index
+    with _index_lock:
+        if _index is not None and _index.version == version:
+            return _index
+        index = None
+        if os.path.exists(path):
+            try:
+                index = PredictionIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+        if index is None or index.version != version:
+            index = build_index()
+            index.save(path)
+        _index = index
+    return _index
@@ -0,0 +1,167 @@
+"""Canned analysis queries for the Medium and Complex level analysis pages.
+
+Time-based questions read the stop_year, stop_month and stop_hour generated
+columns added by ``index_advisor.migrate`` instead of wrapping stop_date or
+stop_time in functions, so they can be answered from an index. Ranges are
+bounded on both sides (``driver_age >= 0 AND driver_age < 25``): SQLite's
+planner guesses a one-sided range matches most rows and would scan a
+GROUP BY index instead of seeking the age index.
+"""
+
+# Medium level analysis
+query_map = {
+    "Top 10 vehicle number involed in drug related stops" : """SELECT vehicle_number, COUNT(*) AS drugs_related_stop
+                                                    FROM police_post_logs WHERE drugs_related_stop = TRUE 
+                                                    GROUP BY vehicle_number
+                                                    ORDER BY drugs_related_stop DESC LIMIT 10""",
+    
+    "Vehicles were most frequently searched" : """SELECT vehicle_number, COUNT(*) AS search_count 
+                                                FROM police_post_logs WHERE search_conducted = TRUE 
+                                                GROUP BY vehicle_number, search_conducted 
+                                                ORDER BY search_count DESC LIMIT 15 """,
+    
+    "Driver age group with highest arrest rate" :"""SELECT CASE
+                                                WHEN driver_age BETWEEN 18 AND 25 THEN '18-25'
+                                                WHEN driver_age BETWEEN 26 AND 35 THEN '26-35'
+                                                WHEN driver_age BETWEEN 36 AND 45 THEN '36-45'
+                                                WHEN driver_age BETWEEN 46 AND 60 THEN '46-60'
+                                                ELSE '60+'
+                                                END AS age_group,
+                                                COUNT(*) AS total_driver,
+                                                SUM(is_arrested) AS total_arrests,
+                                                ROUND(SUM(is_arrested)*100.0/COUNT(*), 2) AS arrest_rate_percent
+                                                FROM police_post_logs
+                                                GROUP BY age_group
+                                                ORDER BY arrest_rate_percent DESC
+                                                LIMIT 1""",
+ 
+    "Gender distribution of drivers stopped in each country" :"""SELECT country_name, driver_gender, COUNT(*) AS total_gender,
+                                                           ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY country_name), 2) AS gender_percent
+                                                            FROM police_post_logs
+                                                            GROUP BY country_name, driver_gender
+                                                            ORDER BY country_name, driver_gender""",     
+
+    "Race and gender combination with highest search rate" :"""SELECT driver_race, driver_gender, COUNT(*) AS total_stops,
+                                                        SUM(CASE WHEN search_conducted  = 1 THEN 1 ELSE 0 END) AS total_searches,
+                                                        ROUND(SUM(CASE WHEN search_conducted  = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS search_percent_rate
+                                                        FROM police_post_logs
+                                                        WHERE driver_race IS NOT NULL AND driver_gender IS NOT NULL
+                                                        GROUP BY driver_race, driver_gender
+                                                        ORDER BY search_percent_rate DESC LIMIT 1""",
+
+                                            
+    "Time of day with most traffic stops" :"""SELECT stop_hour, COUNT(*) AS total_stops
+                                            FROM police_post_logs
+                                            WHERE stop_hour BETWEEN 0 AND 23
+                                            GROUP BY stop_hour 
+                                            ORDER BY total_stops DESC LIMIT 1""",
+
+    "Average Stop Duration for different Violations" : """SELECT violation,
+                                                        AVG(stop_duration) AS average_stop_duration
+                                                        FROM police_post_logs
+                                                        WHERE stop_duration IS NOT NULL 
+                                                        GROUP BY violation ORDER BY Average_stop_duration DESC""",
+
+    "Night Stops More Likely to Lead to Arrests" : """SELECT CASE
+                                                WHEN stop_hour BETWEEN 20 AND 23 OR stop_hour BETWEEN 0 AND 5 THEN 'Night'
+                                                ELSE 'Day' END AS time_of_day,COUNT(*) AS total_stops,
+                                                SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests,
+                                                ROUND(SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS arrest_rate_percent
+                                                FROM police_post_logs
+                                                WHERE stop_hour BETWEEN 0 AND 23
+                                                GROUP BY time_of_day
+                                                ORDER BY arrest_rate_percent DESC""",
+
+    "Violations which most associated with searches or arrests" :"""SELECT violation,COUNT(*) AS total_stops,
+                                                             SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests, 
+                                                             SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) AS total_searches, 
+                                                             SUM(CASE WHEN is_arrested = 1 OR search_conducted = TRUE THEN 1 ELSE 0 END) AS search_or_arrest_total
+                                                             FROM police_post_logs
+                                                             GROUP BY violation
+                                                             ORDER BY search_or_arrest_total DESC LIMIT 10""",                                                    
+
+    "Most common violations for young drivers < 25" :"""SELECT violation,COUNT(*) AS total_stops
+                                                    FROM police_post_logs
+                                                    WHERE driver_age >= 0 AND driver_age < 25
+                                                    GROUP BY violation
+                                                    ORDER BY total_stops DESC LIMIT 10""",
+
+    "Violation that rarely resulting in search or arrest" :"""SELECT violation,COUNT(*) AS total_stops,
+                                                        SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests
+                                                        FROM police_post_logs
+                                                        GROUP BY violation
+                                                        ORDER BY total_arrests ASC LIMIT 1""",
+
+    "Countries that report with highest drug-related stop rates" :"""SELECT country_name,COUNT(*) AS total_stops,
+                                                               SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END) AS drug_related_stops,
+                                                               ROUND(SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS drug_stop_rate_percent
+                                                               FROM police_post_logs
+                                                               GROUP BY country_name
+                                                               ORDER BY drug_stop_rate_percent DESC""",
+
+    "Arrest rate by country and violation" :"""SELECT country_name,COUNT(*) AS total_stops,violation,
+                                           SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS total_arrests,
+                                           ROUND(100.0 * SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) / COUNT(*), 2) AS total_arrest_percent
+                                           FROM police_post_logs
+                                           GROUP BY country_name, violation
+                                           ORDER BY country_name""",
+ 
+    "Country has the most stops with search conducted" :"""select country_name, count(*) as search_count
+                                                          FROM police_post_logs WHERE search_conducted = TRUE 
+                                                          GROUP BY  country_name
+                                                          ORDER BY search_count
+                                                          DESC LIMIT 1"""
+}
+
+
+# Complex level analysis
+query_map_1 = {
+    "Yearly breakdown of stops and arrests by country" : """SELECT country_name, 
+                                                            stop_year, COUNT(*) AS total_stops, 
+                                                            SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS total_arrests, 
+                                                            ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Arrest_rate_percent, 
+                                                            RANK() OVER (PARTITION BY stop_year ORDER BY SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) DESC) AS Arrest_rank 
+                                                            FROM police_post_logs 
+                                                            GROUP BY Country_name, stop_year 
+                                                            ORDER BY stop_year, Arrest_rank""",
+
+    "Driver violation trends by age and race" : """WITH Age_race_summary AS (SELECT Driver_age, Driver_race, Violation, COUNT(*) AS Violation_count 
+                                                    FROM police_post_logs GROUP BY driver_age, driver_race, violation)
+                                                    SELECT ars.driver_age, ars.driver_race, ars.violation, ars.violation_count 
+                                                    FROM Age_race_summary ars 
+                                                    JOIN (SELECT driver_age, driver_race, MAX(violation_count) AS Max_count 
+                                                    FROM age_race_summary GROUP BY driver_age, driver_race)
+                                                    top_violations ON ars.driver_age = top_violations.driver_age 
+                                                    AND ars.driver_race = top_violations.driver_race 
+                                                    AND ars.violation_count = top_violations.max_count 
+                                                    ORDER BY ars.driver_race, ars.driver_age""",
+
+    "Time period analysis of stops, no of stops by yr, month, hr of the day" : """SELECT stop_year AS Year, 
+                                                                                stop_month AS Month, 
+                                                                                stop_hour AS Hour, COUNT(*) AS stop_count 
+                                                                                FROM police_post_logs 
+                                                                                GROUP BY stop_year, stop_month, stop_hour ORDER BY Year, Month, Hour""",
+  
+    "Violations with high search & arrest rates" : """SELECT violation, COUNT(*) AS Total_stops, 
+                                                        SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) AS Total_searches, 
+                                                        SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS Total_arrests, 
+                                                        ROUND(SUM(CASE WHEN search_conducted = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Search_rate, 
+                                                        ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS arrest_rate, 
+                                                        RANK() OVER (ORDER BY SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) DESC) AS Arrest_rank
+                                                        FROM police_post_logs
+                                                        GROUP BY violation 
+                                                        ORDER BY Arrest_rank LIMIT 10""",
+
+    "Driver demographics by country (Age, Gender and Race)" : """SELECT country_name, AVG(driver_age) AS Avg_age, Driver_gender, Driver_race, COUNT(*) AS Stop_count
+                                                                    FROM police_post_logs 
+                                                                    GROUP BY Country_name, Driver_gender, Driver_race 
+                                                                    ORDER BY Country_name, Stop_count DESC""",
+
+    "Top 5 violations with highest arrest rates" : """SELECT violation, COUNT(*) AS Total_stops, 
+                                                        SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) AS Total_arrests, 
+                                                        ROUND(SUM(CASE WHEN is_arrested = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS Arrest_rate_percent 
+                                                        FROM police_post_logs 
+                                                        GROUP BY Violation 
+                                                        ORDER BY Arrest_rate_percent DESC LIMIT 5"""
+
+}
@@ -0,0 +1,217 @@
+"""Full analysis report: every canned question, run concurrently.
+
+Questions run on a bounded thread pool (half the pooled database
+connections by default, so the dashboard sharing the pool keeps the
+rest), and each result is written to the report the
+moment it finishes, so a nightly run takes about as long as the slowest
+query rather than the sum of all of them. Per-query timings are recorded
+in the report.
+
+Formats: ``.html`` (no extra dependencies), ``.xlsx`` (needs openpyxl) and
+a Parquet bundle directory (needs pyarrow).
+
+Usage::
+
+    python report.py nightly.html
+    python report.py nightly.xlsx --workers 8
+    python report.py nightly_parquet/ --format parquet
+"""
+import argparse
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import columnar
+import db
+import partitions
+from queries import query_map, query_map_1
+
+SECTIONS = [("Medium level analysis", query_map), ("Complex level analysis", query_map_1)]
+
+
+def catalog():
+    """(section, question, query) for every canned question, in menu order."""
+    return [(section, question, query) for section, queries in SECTIONS for question, query in queries.items()]
+
+
+class HtmlReport:
+    def __init__(self, target):
+        self._own = isinstance(target, (str, os.PathLike))
+        self._fh = open(target, "w", encoding="utf-8") if self._own else target
+        self._fh.write(
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            "<title>SecureCheck analysis report</title></head><body>"
+            f"<h1>SecureCheck analysis report</h1><p>Generated {html.escape(time.strftime('%Y-%m-%d %H:%M:%S'))}</p>"
+        )
+
+    def add(self, section, question, frame):
+        self._fh.write(f"<h2>{html.escape(question)}</h2><p><i>{html.escape(section)}</i></p>")
+        self._fh.write(frame.to_html(index=False, na_rep="") if not frame.empty else "<p>No result was found</p>")
+        self._fh.flush()
+
+    def close(self, timings):
+        self._fh.write("<h2>Query timings</h2>" + timings.to_html(index=False) + "</body></html>")
+        if self._own:
+            self._fh.close()
+
+
+class ExcelReport:
+    # A write-only workbook streams rows to disk instead of keeping every cell in memory
+    def __init__(self, target):
+        try:
+            import openpyxl
+        except ImportError as exp:
+            raise RuntimeError("Excel reports need openpyxl (pip install openpyxl)") from exp
+        self._target = target
+        self._book = openpyxl.Workbook(write_only=True)
+        self._names = set()
+
+    def _sheet_name(self, question):
+        # Excel sheet names: max 31 chars, no []:*?/\
+        base = re.sub(r"[\[\]:*?/\\]", "", question)[:31]
+        name, n = base, 1
+        while name in self._names:
+            n += 1
+            name = f"{base[:28]}~{n}"
+        self._names.add(name)
+        return name
+
+    def _write_sheet(self, name, frame):
+        sheet = self._book.create_sheet(name)
+        sheet.append([str(column) for column in frame.columns])
+        for row in frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+
+    def add(self, section, question, frame):
+        self._write_sheet(self._sheet_name(question), frame)
+
+    def close(self, timings):
+        self._write_sheet("Query timings", timings)
+        self._book.save(self._target)
+
+
+class ParquetReport:
+    def __init__(self, target):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exp:
+            raise RuntimeError("Parquet reports need pyarrow (pip install pyarrow)") from exp
+        self._dir = target
+        os.makedirs(target, exist_ok=True)
+        self._files = {}
+
+    def add(self, section, question, frame):
+        name = re.sub(r"[^A-Za-z0-9]+", "_", question).strip("_").lower() + ".parquet"
+        frame.to_parquet(os.path.join(self._dir, name), index=False)
+        self._files[question] = name
+
+    def close(self, timings):
+        timings.to_parquet(os.path.join(self._dir, "query_timings.parquet"), index=False)
+        with open(os.path.join(self._dir, "manifest.json"), "w") as fh:
+            json.dump(self._files, fh, indent=2)
+
+
+WRITERS = {"html": HtmlReport, "xlsx": ExcelReport, "parquet": ParquetReport}
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("html", "htm"):
+        return "html"
+    if extension == "xlsx":
+        return "xlsx"
+    return "parquet"
+
+
+def _run_one(question, query, backend):
+    started = time.perf_counter()
+    if backend == "columnar":
+        frame = columnar.answer(question)
+    else:
+        frame = db.fetch_data(partitions.scope(query), label=question)
+    return frame, time.perf_counter() - started
+
+
+def default_workers():
+    """Concurrent queries for a report: half the connection pool, at least one."""
+    return max(1, db.POOL_SIZE // 2)
+
+
+def run_report(writer, backend=None, workers=None, on_result=None):
+    """Run the whole catalog concurrently, writing each result as it finishes.
+
+    ``on_result(question, seconds, rows, error)`` is called after each
+    question (for progress display). Returns the timings DataFrame.
+    """
+    backend = backend or columnar.BACKEND
+    workers = workers or default_workers()
+    started = time.perf_counter()
+    timings = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report") as pool:
+        futures = {
+            pool.submit(_run_one, question, query, backend): (section, question)
+            for section, question, query in catalog()
+        }
+        for future in as_completed(futures):
+            section, question = futures[future]
+            error = None
+            try:
+                frame, seconds = future.result()
+                rows = len(frame)
+                writer.add(section, question, frame)
+            except Exception as exp:
+                seconds, rows, error = None, None, str(exp)
+            timings.append({
+                "question": question,
+                "section": section,
+                "seconds": round(seconds, 3) if seconds is not None else None,
+                "rows": rows,
+                "finished_at": round(time.perf_counter() - started, 3),
+                "error": error,
+            })
+            if on_result:
+                on_result(question, seconds, rows, error)
+    timings = pd.DataFrame(timings)
+    writer.close(timings)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every canned analysis and export one report")
+    parser.add_argument("output", help="report file (.html / .xlsx) or Parquet bundle directory")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="defaults to the output extension")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="concurrent queries (default: half the connection pool)")
+    parser.add_argument("--backend", choices=["sql", "columnar"], default=columnar.BACKEND)
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+    if args.workers > db.POOL_SIZE:
+        db.set_pool_size(args.workers)
+
+    try:
+        writer = WRITERS[args.format or guess_format(args.output)](args.output)
+    except RuntimeError as exp:
+        parser.error(str(exp))
+    started = time.perf_counter()
+    timings = run_report(
+        writer,
+        backend=args.backend,
+        workers=args.workers,
+        on_result=lambda q, s, r, e: print(f"{'FAILED' if e else f'{s:8.2f}s'}  {q}" + (f": {e}" if e else "")),
+    )
+    total = time.perf_counter() - started
+    slowest = timings["seconds"].max()
+    print(f"Report written to {args.output} in {total:.2f}s (slowest query {slowest:.2f}s, "
+          f"sum of queries {timings['seconds'].sum():.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Summary tables kept up to date as stops are ingested.
+
+``stop_rollup`` holds counts per (stop_date, country_name, violation,
+stop_outcome) and ``outcome_rollup`` holds counts per stop_outcome. Both
+are updated inside each ingest batch transaction with upserts, so reading
+them costs the same no matter how large police_post_logs grows.
+
+Rebuild them from an existing table (e.g. one loaded by the notebook)::
+
+    python rollups.py --rebuild
+"""
+import argparse
+from collections import defaultdict
+
+import db
+import partitions
+
+# Key values can't be NULL in a primary key; missing values are stored as these
+UNKNOWN_DATE = "1000-01-01"
+UNKNOWN = ""
+
+COUNT_COLUMNS = ["stops", "arrests", "searches", "drug_stops"]
+
+CREATE_STOP_ROLLUP_SQL = """CREATE TABLE IF NOT EXISTS stop_rollup(
+stop_date DATE NOT NULL,
+country_name VARCHAR(50) NOT NULL,
+violation VARCHAR(100) NOT NULL,
+stop_outcome VARCHAR(100) NOT NULL,
+stops BIGINT NOT NULL,
+arrests BIGINT NOT NULL,
+searches BIGINT NOT NULL,
+drug_stops BIGINT NOT NULL,
+PRIMARY KEY (stop_date, country_name, violation, stop_outcome))"""
+
+CREATE_OUTCOME_ROLLUP_SQL = """CREATE TABLE IF NOT EXISTS outcome_rollup(
+stop_outcome VARCHAR(100) NOT NULL PRIMARY KEY,
+stops BIGINT NOT NULL,
+arrests BIGINT NOT NULL,
+searches BIGINT NOT NULL,
+drug_stops BIGINT NOT NULL)"""
+
+# Metrics page: one row per stop outcome
+OUTCOME_TOTALS_SQL = "SELECT stop_outcome, stops, arrests, searches, drug_stops FROM outcome_rollup"
+
+_IDX = {name: i for i, name in enumerate(db.LOG_COLUMNS)}
+
+
+# INSERT of keys + COUNT_COLUMNS that adds the counts to an existing row
+def upsert_sql(connection_or_cursor, table, keys):
+    columns = keys + COUNT_COLUMNS
+    insert = "INSERT INTO {} ({}) VALUES ({})".format(
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    if db.dialect(connection_or_cursor) == "sqlite":
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in COUNT_COLUMNS)
+        return f"{insert} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+    updates = ", ".join(f"{c} = {c} + VALUES({c})" for c in COUNT_COLUMNS)
+    return f"{insert} ON DUPLICATE KEY UPDATE {updates}"
+
+
+def create_tables(connection):
+    with connection.cursor() as cur:
+        cur.execute(CREATE_STOP_ROLLUP_SQL)
+        cur.execute(CREATE_OUTCOME_ROLLUP_SQL)
+
+
+# Aggregate a batch of inserted rows (tuples in db.LOG_COLUMNS order)
+def summarize(rows):
+    stop_counts = defaultdict(lambda: [0, 0, 0, 0])
+    outcome_counts = defaultdict(lambda: [0, 0, 0, 0])
+    for row in rows:
+        outcome = row[_IDX["stop_outcome"]] or UNKNOWN
+        key = (
+            row[_IDX["stop_date"]] or UNKNOWN_DATE,
+            row[_IDX["country_name"]] or UNKNOWN,
+            row[_IDX["violation"]] or UNKNOWN,
+            outcome,
+        )
+        flags = (
+            1,
+            1 if row[_IDX["is_arrested"]] else 0,
+            1 if row[_IDX["search_conducted"]] else 0,
+            1 if row[_IDX["drugs_related_stop"]] else 0,
+        )
+        for counts in (stop_counts[key], outcome_counts[(outcome,)]):
+            for i, flag in enumerate(flags):
+                counts[i] += flag
+    return stop_counts, outcome_counts
+
+
+# Ingest hook: fold a batch into the rollups inside the batch transaction
+def apply_batch(cur, rows):
+    stop_counts, outcome_counts = summarize(rows)
+    cur.executemany(
+        upsert_sql(cur, "stop_rollup", ["stop_date", "country_name", "violation", "stop_outcome"]),
+        [key + tuple(counts) for key, counts in stop_counts.items()],
+    )
+    cur.executemany(
+        upsert_sql(cur, "outcome_rollup", ["stop_outcome"]),
+        [key + tuple(counts) for key, counts in outcome_counts.items()],
+    )
+
+
+# Recompute both rollups from police_post_logs in one transaction
+def rebuild(connection):
+    create_tables(connection)
+    # Archived stops still count, so read them back through the history view
+    source = partitions.source(connection=connection)
+    sums = """COUNT(*),
+SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END),
+SUM(CASE WHEN search_conducted = 1 THEN 1 ELSE 0 END),
+SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END)"""
+    connection.begin()
+    try:
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM stop_rollup")
+            cur.execute("DELETE FROM outcome_rollup")
+            cur.execute(f"""INSERT INTO stop_rollup
+SELECT COALESCE(stop_date, '{UNKNOWN_DATE}') AS d, COALESCE(country_name, '') AS c,
+COALESCE(violation, '') AS v, COALESCE(stop_outcome, '') AS o, {sums}
+FROM {source} GROUP BY d, c, v, o""")
+            cur.execute(f"""INSERT INTO outcome_rollup
+SELECT stop_outcome, SUM(stops), SUM(arrests), SUM(searches), SUM(drug_stops)
+FROM stop_rollup GROUP BY stop_outcome""")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    db.bump_data_version()
+
+
+# KPIs for the Metrics page from the outcome totals frame
+def metrics(outcome_totals):
+    if outcome_totals.empty:
+        return {"stops": 0, "arrests": 0, "warnings": 0, "drug_stops": 0}
+    outcome = outcome_totals["stop_outcome"].str.lower()
+    return {
+        "stops": int(outcome_totals["stops"].sum()),
+        "arrests": int(outcome_totals.loc[outcome.str.contains("arrest"), "stops"].sum()),
+        "warnings": int(outcome_totals.loc[outcome.str.contains("warning"), "stops"].sum()),
+        "drug_stops": int(outcome_totals["drug_stops"].sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the police_post_logs rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from police_post_logs")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        if args.rebuild:
+            rebuild(connection)
+        else:
+            create_tables(connection)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
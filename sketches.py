@@ -0,0 +1,584 @@
+"""Approximate answers for the heavy analyses, from sketches kept during ingestion.
+
+Three kinds of sketch are updated by an ingest batch hook:
+
+* Space-Saving summaries of the most frequent vehicles in drug-related
+  stops, the most searched vehicles and the violations of drivers under 25.
+  Each tracked item's count overestimates the true count by at most its
+  recorded error, so top-N lists come with a per-row bound.
+* A HyperLogLog of distinct vehicle numbers (about 0.8% standard error).
+* Reservoir samples of ``SAMPLE_SIZE`` stops per country. Country and
+  violation breakdowns are stratified estimates from them, reported with
+  95% confidence half-widths (the ``*_error`` columns).
+
+The state covers every stop up to ``last_id`` (archived years included,
+like the rollups) and is saved to ``SKETCH_FILE``. Loading it reads any
+newer stops from police_post_logs, so a crashed load or rows written some
+other way are picked up without double counting.
+
+Usage::
+
+    python sketches.py rebuild          # recompute from police_post_logs (or --sqlite ledger.db)
+    python sketches.py show
+"""
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import db
+import instrumentation
+import partitions
+
+SKETCH_FILE = os.environ.get(
+    "SECURECHECK_SKETCHES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sketches.json"),
+)
+TOP_CAPACITY = 2000      # items tracked per Space-Saving summary
+HLL_PRECISION = 14       # 2**14 registers
+SAMPLE_SIZE = 20000      # sampled stops kept per country
+SAVE_INTERVAL = 60       # seconds between saves while ingesting
+CATCH_UP_CHUNK = 50000
+Z95 = 1.96
+
+# Columns the sketches read, in the order records are passed to update()
+COLUMNS = ["vehicle_number", "country_name", "violation", "driver_gender", "driver_race",
+           "driver_age", "search_conducted", "is_arrested", "drugs_related_stop"]
+SAMPLE_COLUMNS = COLUMNS[1:]
+
+_IDX = [db.LOG_COLUMNS.index(name) for name in COLUMNS]
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary: item -> [count, error] for at most ``capacity`` items."""
+
+    def __init__(self, capacity=TOP_CAPACITY, items=()):
+        self.capacity = capacity
+        self.counts = {item: [count, error] for item, count, error in items}
+        self._order = itertools.count()
+        self._heap = []
+        self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(count, next(self._order), item) for item, (count, _) in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    # Tracked item with the smallest count; heap entries go stale as counts grow
+    def _pop_min(self):
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            entry = self.counts.get(item)
+            if entry is not None and entry[0] == count:
+                return item
+
+    def update(self, counter):
+        """Add ``counter`` (item -> occurrences)."""
+        for item, n in counter.items():
+            entry = self.counts.get(item)
+            if entry is not None:
+                entry[0] += n
+            elif len(self.counts) < self.capacity:
+                entry = self.counts[item] = [n, 0]
+            else:
+                floor = self.counts.pop(self._pop_min())[0]
+                entry = self.counts[item] = [floor + n, floor]
+            heapq.heappush(self._heap, (entry[0], next(self._order), item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def top(self, n):
+        """[(item, count, max overcount)] for the ``n`` largest counts."""
+        ranked = sorted(self.counts.items(), key=lambda kv: -kv[1][0])[:n]
+        return [(item, count, error) for item, (count, error) in ranked]
+
+    def to_json(self):
+        return [[item, count, error] for item, (count, error) in self.counts.items()]
+
+
+class HyperLogLog:
+    """Distinct count estimate from 2**precision one-byte registers."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+        bucket = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[bucket]:
+            self.registers[bucket] = rank
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def error(self):
+        """95% half-width of count()."""
+        return Z95 * 1.04 / math.sqrt(len(self.registers)) * self.count()
+
+
+class StratifiedSample:
+    """Uniform reservoir sample of up to ``size`` records per country."""
+
+    def __init__(self, size=SAMPLE_SIZE, strata=()):
+        self.size = size
+        # country -> [stops seen, sampled records]
+        self.strata = {country: [seen, [tuple(r) for r in rows]] for country, seen, rows in strata}
+        self._random = random.Random()
+        self._frame = None
+
+    def update(self, records):
+        self._frame = None
+        for record in records:
+            stratum = self.strata.setdefault(record[0], [0, []])
+            stratum[0] += 1
+            rows = stratum[1]
+            if len(rows) < self.size:
+                rows.append(record)
+            else:
+                slot = self._random.randrange(stratum[0])
+                if slot < self.size:
+                    rows[slot] = record
+
+    def frame(self):
+        """Sampled records with each stratum's population (_N) and sample size (_n)."""
+        if self._frame is None:
+            self._frame = self._build_frame()
+        return self._frame.copy()
+
+    def _build_frame(self):
+        parts = []
+        for seen, rows in self.strata.values():
+            part = pd.DataFrame(rows, columns=SAMPLE_COLUMNS)
+            part["_N"], part["_n"] = seen, len(rows)
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=SAMPLE_COLUMNS + ["_N", "_n"])
+        return pd.concat(parts, ignore_index=True)
+
+    def to_json(self):
+        return [[country, seen, rows] for country, (seen, rows) in self.strata.items()]
+
+
+def _flag(value):
+    return 1 if value else 0
+
+
+class Sketches:
+    """All sketches, covering police_post_logs up to ``last_id``."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.last_id = state.get("last_id", 0)
+        self.stops = state.get("stops", 0)
+        top = state.get("top", {})
+        self.drug_vehicles = SpaceSaving(items=top.get("drug_vehicles", ()))
+        self.searched_vehicles = SpaceSaving(items=top.get("searched_vehicles", ()))
+        self.young_violations = SpaceSaving(items=top.get("young_violations", ()))
+        registers = state.get("plates")
+        self.plates = HyperLogLog(registers=bytes.fromhex(registers) if registers else None)
+        self.sample = StratifiedSample(strata=state.get("sample", ()))
+        self.version = None
+
+    def update(self, records):
+        """Fold in stops given as tuples in COLUMNS order."""
+        drugs, searched, young = {}, {}, {}
+        sample = []
+        for plate, country, violation, gender, race, age, search, arrest, drug in records:
+            search, arrest, drug = _flag(search), _flag(arrest), _flag(drug)
+            if drug:
+                drugs[plate] = drugs.get(plate, 0) + 1
+            if search:
+                searched[plate] = searched.get(plate, 0) + 1
+            if age is not None and 0 <= age < 25:
+                young[violation] = young.get(violation, 0) + 1
+            if isinstance(plate, str):
+                self.plates.add(plate)
+            sample.append((country, violation, gender, race, None if age is None else int(age), search, arrest, drug))
+        self.drug_vehicles.update(drugs)
+        self.searched_vehicles.update(searched)
+        self.young_violations.update(young)
+        self.sample.update(sample)
+        self.stops += len(sample)
+
+    def catch_up(self, read, table="police_post_logs"):
+        """Add stops with id > last_id; ``read(query, params)`` returns row tuples."""
+        query = "SELECT id, {} FROM {} WHERE id > %s ORDER BY id LIMIT %s".format(", ".join(COLUMNS), table)
+        while True:
+            rows = read(query, (self.last_id, CATCH_UP_CHUNK))
+            if not rows:
+                return
+            self.update([row[1:] for row in rows])
+            self.last_id = int(rows[-1][0])
+
+    def to_json(self):
+        return {
+            "last_id": self.last_id,
+            "stops": self.stops,
+            "top": {
+                "drug_vehicles": self.drug_vehicles.to_json(),
+                "searched_vehicles": self.searched_vehicles.to_json(),
+                "young_violations": self.young_violations.to_json(),
+            },
+            "plates": self.plates.registers.hex(),
+            "sample": self.sample.to_json(),
+        }
+
+    def save(self, path=None):
+        path = path or SKETCH_FILE
+        # Written aside and renamed, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(self.to_json(), fh, separators=(",", ":"))
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or SKETCH_FILE
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as fh:
+            return cls(json.load(fh))
+
+
+def _reader(connection):
+    if connection is None:
+        def fetch(query, params):
+            frame = db.fetch_data(query, params, use_cache=False, label="sketches.catch_up")
+            # NULLs come back from pandas as NaN / NA; the sketches expect None
+            return [tuple(None if pd.isna(v) else v for v in row) for row in frame.itertuples(index=False, name=None)]
+        return fetch
+
+    def read(query, params):
+        with connection.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        return [tuple(row[c] for c in ["id"] + COLUMNS) for row in rows]
+    return read
+
+
+def _catch_up(state, connection=None):
+    # From scratch, archived years are read back through the history view
+    table = partitions.source(connection=connection) if state.last_id == 0 else "police_post_logs"
+    state.catch_up(_reader(connection), table)
+
+
+# Sketches updated by apply_batch in this process, and when they were last saved
+_ingesting = None
+_saved_at = 0.0
+# (records, top id) of the batch in flight; folded in by checkpoint() once it commits
+_pending = None
+
+
+def sync(connection):
+    """Load the saved sketches and catch them up, for ingestion into ``connection``."""
+    global _ingesting, _saved_at, _pending
+    state = Sketches.load()
+    _catch_up(state, connection)
+    state.save()
+    _ingesting, _saved_at, _pending = state, time.monotonic(), None
+    return state
+
+
+# Ingest hook: stage a batch for the sketches (rows are tuples in db.LOG_COLUMNS order).
+# Nothing is applied here: a batch that rolls back is replaced by the next one's staging.
+def apply_batch(cur, rows):
+    global _pending
+    if _ingesting is None:
+        return  # not synced: the next load catches these rows up from the table
+    cur.execute("SELECT id FROM police_post_logs ORDER BY id DESC LIMIT 1")
+    top = int(cur.fetchone()["id"])
+    if top - _ingesting.last_id == len(rows):
+        _pending = ([tuple(row[i] for i in _IDX) for row in rows], top)
+        return
+    # Other writers or id gaps: read exactly the ids this state is missing
+    cur.execute(
+        "SELECT id, {} FROM police_post_logs WHERE id > %s AND id <= %s".format(", ".join(COLUMNS)),
+        (_ingesting.last_id, top),
+    )
+    _pending = ([tuple(row[c] for c in COLUMNS) for row in cur.fetchall()], top)
+
+
+def checkpoint(force=False):
+    """Fold in the batch that just committed and save the ingest sketches every SAVE_INTERVAL.
+
+    Call after each batch commits, never after a rollback.
+    """
+    global _saved_at, _pending
+    if _ingesting is None:
+        return
+    if _pending is not None:
+        records, top = _pending
+        _ingesting.update(records)
+        _ingesting.last_id = top
+        _pending = None
+    if force or time.monotonic() - _saved_at >= SAVE_INTERVAL:
+        _ingesting.save()
+        _saved_at = time.monotonic()
+
+
+_sketches = None
+_sketches_lock = threading.Lock()
+
+
+def get_sketches():
+    """Saved sketches caught up to the current data version (read-only for the dashboard).
+
+    A refresh catches up a fresh copy and swaps it in, so callers still
+    holding the previous sketches never see them change.
+    """
+    global _sketches
+    version = db.data_version()
+    current = _sketches
+    if current is not None and current.version == version:
+        return current
+    with _sketches_lock:
+        if _sketches is None or _sketches.version != version:
+            state = Sketches.load()
+            if _sketches is not None and _sketches.last_id > state.last_id:
+                state = Sketches(_sketches.to_json())
+            _catch_up(state)
+            state.version = version
+            _sketches = state
+        return _sketches
+
+
+def rebuild(connection):
+    """Recompute the sketches from every stop, archived years included."""
+    global _ingesting, _pending
+    _ingesting = _pending = None
+    state = Sketches()
+    _catch_up(state, connection)
+    state.save()
+    return state
+
+
+# Stratified estimators over the country samples
+
+def _estimate(sample, keys, flag=None):
+    """Estimated stops, flagged stops and flag rate (%) per group of ``keys``, each with a 95% half-width."""
+    strata = ["country_name"] + [k for k in keys if k != "country_name"]
+    frame = sample.assign(_flag=sample[flag] if flag else 1)
+    parts = frame.groupby(strata, dropna=False, sort=False).agg(
+        b=("_flag", "size"), a=("_flag", "sum"), N=("_N", "first"), n=("_n", "first")).reset_index()
+    # Var of an estimated total: N^2 (1 - n/N) s^2 / n, with s^2 of a 0/1 indicator
+    factor = np.where(parts["n"] > 1, parts["N"] ** 2 * (1 - parts["n"] / parts["N"])
+                      / (parts["n"] * np.maximum(parts["n"] - 1, 1)), 0.0)
+    weight = parts["N"] / parts["n"]
+    parts["stops"], parts["flagged"] = weight * parts["b"], weight * parts["a"]
+    parts["stops_var"] = factor * (parts["b"] - parts["b"] ** 2 / parts["n"])
+    parts["flagged_var"] = factor * (parts["a"] - parts["a"] ** 2 / parts["n"])
+    totals = parts.groupby(keys, dropna=False, sort=False)[["stops", "flagged", "stops_var", "flagged_var"]].sum().reset_index()
+    totals["rate"] = totals["flagged"] / totals["stops"]
+
+    # Ratio estimator: linearized residuals z = a - R b per stratum
+    parts = parts.merge(totals[keys + ["rate"]], on=keys, how="left")
+    r = parts["rate"]
+    sum_z, sum_z2 = parts["a"] - r * parts["b"], parts["a"] * (1 - 2 * r) + r * r * parts["b"]
+    parts["rate_var"] = factor * (sum_z2 - sum_z ** 2 / parts["n"])
+    totals = totals.merge(parts.groupby(keys, dropna=False, sort=False)["rate_var"].sum().reset_index(), on=keys)
+
+    return pd.DataFrame({
+        **{k: totals[k] for k in keys},
+        "stops": totals["stops"].round().astype("int64"),
+        "stops_error": (Z95 * np.sqrt(totals["stops_var"])).round().astype("int64"),
+        "flagged": totals["flagged"].round().astype("int64"),
+        "flagged_error": (Z95 * np.sqrt(totals["flagged_var"])).round().astype("int64"),
+        "rate": (100 * totals["rate"]).round(2),
+        "rate_error": (100 * Z95 * np.sqrt(np.maximum(totals["rate_var"], 0)) / totals["stops"]).round(2),
+    })
+
+
+def _rename(frame, names):
+    return frame.rename(columns=names)[list(names.values())]
+
+
+def _top(summary, n, key, count):
+    rows = summary.top(n)
+    return pd.DataFrame(rows, columns=[key, count, f"{count}_error"])
+
+
+# Analyses, one per question that has an approximate answer
+
+def top_drug_vehicles(s):
+    return _top(s.drug_vehicles, 10, "vehicle_number", "drugs_related_stop")
+
+
+def most_searched_vehicles(s):
+    return _top(s.searched_vehicles, 15, "vehicle_number", "search_count")
+
+
+def young_driver_violations(s):
+    return _top(s.young_violations, 10, "violation", "total_stops")
+
+
+def age_group_arrest_rate(s):
+    sample = s.sample.frame()
+    age = sample["driver_age"].astype("float64")
+    sample["age_group"] = np.select(
+        [(age >= 18) & (age <= 25), (age >= 26) & (age <= 35), (age >= 36) & (age <= 45), (age >= 46) & (age <= 60)],
+        ["18-25", "26-35", "36-45", "46-60"],
+        "60+",
+    )
+    r = _estimate(sample, ["age_group"], "is_arrested").sort_values("rate", ascending=False).head(1)
+    return _rename(r, {"age_group": "age_group", "stops": "total_driver", "stops_error": "total_driver_error",
+                       "flagged": "total_arrests", "flagged_error": "total_arrests_error",
+                       "rate": "arrest_rate_percent", "rate_error": "arrest_rate_percent_error"})
+
+
+def gender_by_country(s):
+    r = _estimate(s.sample.frame(), ["country_name", "driver_gender"])
+    # Within one country the stop total is exact, so the share's bound is the count's
+    country_totals = r.groupby("country_name", dropna=False)["stops"].transform("sum")
+    r["gender_percent"] = (100 * r["stops"] / country_totals).round(2)
+    r["gender_percent_error"] = (100 * r["stops_error"] / country_totals).round(2)
+    r = r.sort_values(["country_name", "driver_gender"])
+    return _rename(r, {"country_name": "country_name", "driver_gender": "driver_gender", "stops": "total_gender",
+                       "stops_error": "total_gender_error", "gender_percent": "gender_percent",
+                       "gender_percent_error": "gender_percent_error"})
+
+
+def race_gender_search_rate(s):
+    sample = s.sample.frame()
+    sample = sample[sample["driver_race"].notna() & sample["driver_gender"].notna()]
+    r = _estimate(sample, ["driver_race", "driver_gender"], "search_conducted")
+    r = r.sort_values("rate", ascending=False).head(1)
+    return _rename(r, {"driver_race": "driver_race", "driver_gender": "driver_gender", "stops": "total_stops",
+                       "flagged": "total_searches", "flagged_error": "total_searches_error",
+                       "rate": "search_percent_rate", "rate_error": "search_percent_rate_error"})
+
+
+def violations_with_search_or_arrest(s):
+    sample = s.sample.frame()
+    sample["search_or_arrest"] = sample["is_arrested"] | sample["search_conducted"]
+    r = _estimate(sample, ["violation"], "is_arrested")
+    r = r.rename(columns={"flagged": "total_arrests", "flagged_error": "total_arrests_error"})
+    for flag, name in [("search_conducted", "total_searches"), ("search_or_arrest", "search_or_arrest_total")]:
+        other = _estimate(sample, ["violation"], flag)[["violation", "flagged", "flagged_error"]]
+        r = r.merge(other.rename(columns={"flagged": name, "flagged_error": f"{name}_error"}), on="violation")
+    r = r.sort_values("search_or_arrest_total", ascending=False).head(10)
+    return r[["violation", "stops", "stops_error", "total_arrests", "total_arrests_error", "total_searches",
+              "total_searches_error", "search_or_arrest_total", "search_or_arrest_total_error"]].rename(
+        columns={"stops": "total_stops", "stops_error": "total_stops_error"})
+
+
+def drug_stop_rate_by_country(s):
+    r = _estimate(s.sample.frame(), ["country_name"], "drugs_related_stop").sort_values("rate", ascending=False)
+    return _rename(r, {"country_name": "country_name", "stops": "total_stops", "flagged": "drug_related_stops",
+                       "flagged_error": "drug_related_stops_error", "rate": "drug_stop_rate_percent",
+                       "rate_error": "drug_stop_rate_percent_error"})
+
+
+def arrest_rate_by_country_violation(s):
+    r = _estimate(s.sample.frame(), ["country_name", "violation"], "is_arrested").sort_values(["country_name", "violation"])
+    return _rename(r, {"country_name": "country_name", "stops": "total_stops", "stops_error": "total_stops_error",
+                       "violation": "violation", "flagged": "total_arrests", "flagged_error": "total_arrests_error",
+                       "rate": "total_arrest_percent", "rate_error": "total_arrest_percent_error"})
+
+
+def most_searched_country(s):
+    r = _estimate(s.sample.frame(), ["country_name"], "search_conducted").sort_values("flagged", ascending=False).head(1)
+    return _rename(r, {"country_name": "country_name", "flagged": "search_count", "flagged_error": "search_count_error"})
+
+
+def violations_search_arrest_rates(s):
+    sample = s.sample.frame()
+    r = _estimate(sample, ["violation"], "is_arrested")
+    searches = _estimate(sample, ["violation"], "search_conducted")[["violation", "flagged", "rate", "rate_error"]]
+    r = r.merge(searches.rename(columns={"flagged": "Total_searches", "rate": "Search_rate",
+                                         "rate_error": "Search_rate_error"}), on="violation")
+    r["Arrest_rank"] = r["flagged"].rank(method="min", ascending=False).astype("int64")
+    r = r.sort_values("Arrest_rank").head(10)
+    return _rename(r, {"violation": "violation", "stops": "Total_stops", "Total_searches": "Total_searches",
+                       "flagged": "Total_arrests", "flagged_error": "Total_arrests_error", "Search_rate": "Search_rate",
+                       "Search_rate_error": "Search_rate_error", "rate": "arrest_rate", "rate_error": "arrest_rate_error",
+                       "Arrest_rank": "Arrest_rank"})
+
+
+def top_arrest_rate_violations(s):
+    r = _estimate(s.sample.frame(), ["violation"], "is_arrested").sort_values("rate", ascending=False).head(5)
+    return _rename(r, {"violation": "violation", "stops": "Total_stops", "flagged": "Total_arrests",
+                       "flagged_error": "Total_arrests_error", "rate": "Arrest_rate_percent",
+                       "rate_error": "Arrest_rate_percent_error"})
+
+
+ANALYSES = {
+    "Top 10 vehicle number involed in drug related stops": top_drug_vehicles,
+    "Vehicles were most frequently searched": most_searched_vehicles,
+    "Driver age group with highest arrest rate": age_group_arrest_rate,
+    "Gender distribution of drivers stopped in each country": gender_by_country,
+    "Race and gender combination with highest search rate": race_gender_search_rate,
+    "Violations which most associated with searches or arrests": violations_with_search_or_arrest,
+    "Most common violations for young drivers < 25": young_driver_violations,
+    "Countries that report with highest drug-related stop rates": drug_stop_rate_by_country,
+    "Arrest rate by country and violation": arrest_rate_by_country_violation,
+    "Country has the most stops with search conducted": most_searched_country,
+    "Violations with high search & arrest rates": violations_search_arrest_rates,
+    "Top 5 violations with highest arrest rates": top_arrest_rate_violations,
+}
+
+
+def answer(question, sketches=None):
+    """Approximate result of a canned question, with ``*_error`` bound columns."""
+    timer = instrumentation.Timer()
+    sketches = sketches or get_sketches()
+    timer.mark("load")
+    frame = ANALYSES[question](sketches).reset_index(drop=True)
+    timer.mark("compute")
+    instrumentation.record("query", query=question, backend="sketches", total_ms=timer.total_ms(),
+                           rows=len(frame), result_bytes=db.result_bytes(frame), **timer.phases)
+    return frame
+
+
+def summary(sketches=None):
+    """Headline figures: stops covered, distinct vehicles (with 95% half-width), sampled stops."""
+    sketches = sketches or get_sketches()
+    return {
+        "stops": sketches.stops,
+        "last_id": sketches.last_id,
+        "distinct_vehicles": round(sketches.plates.count()),
+        "distinct_vehicles_error": round(sketches.plates.error()),
+        "sampled_stops": sum(len(rows) for _, rows in sketches.sample.strata.values()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the approximate analytics sketches")
+    parser.add_argument("command", choices=["rebuild", "show"])
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+    if args.command == "rebuild":
+        connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+        try:
+            state = rebuild(connection)
+        finally:
+            connection.close()
+        print(f"Sketches cover {state.stops} stops up to id {state.last_id}; saved to {SKETCH_FILE}")
+    else:
+        for name, value in summary().items():
+            print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Synthetic police_post_logs data at any scale.
+
+Writes a CSV with the same 16 columns as
+``traffic_stops - traffic_stops_with_vehicle_number.csv``, so the output can
+be fed straight to ``ingest.py``. The notebook only records the null counts
+and a preview of the source file: search_type is empty for 21720 of 65538
+rows, and the raw and cleaned columns (driver_age_raw / driver_age,
+violation_raw / violation, stop_outcome / is_arrested) do not agree row by
+row, so each is drawn on its own. Categories the notebook shows no counts
+for stay evenly weighted; adjust them if the real distribution drifts.
+
+Usage::
+
+    python synth.py stops_1m.csv --rows 1000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+CSV_COLUMNS = [
+    "stop_date", "stop_time", "country_name", "driver_gender",
+    "driver_age_raw", "driver_age", "driver_race", "violation_raw", "violation",
+    "search_conducted", "search_type", "stop_outcome", "is_arrested",
+    "stop_duration", "drugs_related_stop", "vehicle_number",
+]
+
+COUNTRIES = (["Canada", "India", "USA"], [0.33, 0.34, 0.33])
+GENDERS = (["M", "F"], [0.5, 0.5])
+RACES = (["Asian", "Black", "Hispanic", "Other", "White"], [0.2, 0.2, 0.2, 0.2, 0.2])
+VIOLATIONS = (["Speeding", "Signal", "Seatbelt", "DUI", "Other"], [0.2, 0.2, 0.2, 0.2, 0.2])
+RAW_VIOLATIONS = (
+    ["Speeding", "Signal Violation", "Seatbelt", "Drunk Driving", "Other"], [0.2, 0.2, 0.2, 0.2, 0.2]
+)
+OUTCOMES = (["Warning", "Citation", "Ticket", "Arrest"], [0.25, 0.25, 0.25, 0.25])
+DURATIONS = (["0-15 Min", "16-30 Min", "30+ Min"], [0.34, 0.33, 0.33])
+SEARCH_TYPES = (["Vehicle Search", "Frisk"], [0.5, 0.5])
+
+SEARCH_RATE = 0.5
+SEARCH_TYPE_RATE = 43818 / 65538  # non-null search_type in the source file
+ARREST_RATE = 0.5
+DRUG_RATE = 0.5
+AGE_RANGE = (18, 80)  # inclusive
+START_DATE = "2020-01-01"
+DAYS = 5 * 365
+
+STATE_CODES = ["KA", "MH", "TN", "DL", "UP", "KL", "GJ", "RJ", "AP", "WB"]
+
+
+def _choice(rng, values_weights, size):
+    values, weights = values_weights
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+
+def plate_pool(size, seed=0):
+    """Plates like "KA12AB1234"; stops draw from this pool so plates repeat."""
+    rng = np.random.default_rng(seed)
+    states = np.asarray(STATE_CODES)[rng.integers(0, len(STATE_CODES), size)]
+    districts = rng.integers(1, 100, size)
+    series = rng.integers(0, 26 * 26, size)
+    numbers = np.arange(size) % 10000
+    letters = np.array([chr(65 + i // 26) + chr(65 + i % 26) for i in range(26 * 26)])
+    return np.char.add(
+        np.char.add(np.char.add(states, np.char.zfill(districts.astype(str), 2)), letters[series]),
+        np.char.zfill(numbers.astype(str), 4),
+    ).astype(object)
+
+
+def generate_frame(rows, seed=0, plates=None):
+    """Return ``rows`` synthetic stops as a DataFrame in CSV column order."""
+    rng = np.random.default_rng(seed)
+    if plates is None:
+        plates = plate_pool(max(rows // 4, 1), seed)
+
+    dates = pd.Timestamp(START_DATE) + pd.to_timedelta(rng.integers(0, DAYS, rows), unit="D")
+    seconds = rng.integers(0, 24 * 3600, rows)
+    times = pd.to_datetime(seconds, unit="s").strftime("%H:%M:%S")
+    # search_type is filled independently of search_conducted in the source file
+    search_types = np.where(
+        rng.random(rows) < SEARCH_TYPE_RATE, _choice(rng, SEARCH_TYPES, rows), None
+    )
+    # Most stops pick a plate uniformly; the rest go to a few repeat offenders
+    repeat = np.minimum(rng.zipf(1.3, rows) - 1, len(plates) - 1)
+    plate_idx = np.where(rng.random(rows) < 0.3, repeat, rng.integers(0, len(plates), rows))
+
+    return pd.DataFrame({
+        "stop_date": dates.strftime("%Y-%m-%d"),
+        "stop_time": times,
+        "country_name": _choice(rng, COUNTRIES, rows),
+        "driver_gender": _choice(rng, GENDERS, rows),
+        "driver_age_raw": rng.integers(AGE_RANGE[0], AGE_RANGE[1], rows, endpoint=True),
+        "driver_age": rng.integers(AGE_RANGE[0], AGE_RANGE[1], rows, endpoint=True),
+        "driver_race": _choice(rng, RACES, rows),
+        "violation_raw": _choice(rng, RAW_VIOLATIONS, rows),
+        "violation": _choice(rng, VIOLATIONS, rows),
+        "search_conducted": rng.random(rows) < SEARCH_RATE,
+        "search_type": search_types,
+        "stop_outcome": _choice(rng, OUTCOMES, rows),
+        "is_arrested": rng.random(rows) < ARREST_RATE,
+        "stop_duration": _choice(rng, DURATIONS, rows),
+        "drugs_related_stop": rng.random(rows) < DRUG_RATE,
+        "vehicle_number": plates[plate_idx],
+    }, columns=CSV_COLUMNS)
+
+
+def write_csv(path, rows, seed=0, chunk_size=500000):
+    """Write ``rows`` synthetic stops to ``path`` in chunks of bounded memory."""
+    plates = plate_pool(max(rows // 4, 1), seed)
+    written = 0
+    chunk_seed = seed
+    while written < rows:
+        n = min(chunk_size, rows - written)
+        frame = generate_frame(n, chunk_seed, plates)
+        frame.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += n
+        chunk_seed += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic traffic stops CSV")
+    parser.add_argument("csv", help="output CSV file")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csv(args.csv, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
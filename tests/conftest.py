@@ -0,0 +1,93 @@
+"""Shared fixtures: a small synthetic ledger in a temporary SQLite file.
+
+The ledger is generated and ingested once per session; every test gets its
+own copy, its own data version / watchlist / sketch / prediction index
+files, and fresh process-wide caches.
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SECURECHECK_PERF_LOG"] = ""  # no query log from test runs
+
+import db  # noqa: E402
+import ingest  # noqa: E402
+import predictor  # noqa: E402
+import sketches  # noqa: E402
+import synth  # noqa: E402
+import vehicle_search  # noqa: E402
+import watchlist  # noqa: E402
+
+ROWS = 20000
+BATCH_SIZE = 5000
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def _isolate(monkeypatch, directory):
+    monkeypatch.setattr(db, "DATA_VERSION_FILE", str(directory / "data_version"))
+    monkeypatch.setattr(watchlist, "ENTRIES_VERSION_FILE", str(directory / "watchlist_version"))
+    monkeypatch.setattr(sketches, "SKETCH_FILE", str(directory / "sketches.json"))
+    monkeypatch.setattr(predictor, "INDEX_FILE", str(directory / "predict_index.json"))
+    monkeypatch.setattr(sketches, "_ingesting", None)
+    monkeypatch.setattr(sketches, "_pending", None)
+    monkeypatch.setattr(sketches, "_sketches", None)
+    monkeypatch.setattr(vehicle_search, "_index", None)
+    monkeypatch.setattr(watchlist, "_watchlist", None)
+    monkeypatch.setattr(predictor, "_index", None)
+
+
+@pytest.fixture(scope="session")
+def base_ledger(tmp_path_factory):
+    """(ledger file, sketch file, CSV) ingested once for the whole session."""
+    directory = tmp_path_factory.mktemp("base")
+    csv_path = str(directory / "stops.csv")
+    synth.write_csv(csv_path, ROWS, seed=7)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        _isolate(monkeypatch, directory)
+        path = str(directory / "ledger.db")
+        db.use_sqlite(path)
+        connection = db.connect_sqlite(path)
+        try:
+            ingest.ingest_csv(csv_path, connection, batch_size=BATCH_SIZE, log=_quiet)
+        finally:
+            connection.close()
+    return path, str(directory / "sketches.json"), csv_path
+
+
+@pytest.fixture
+def ledger(base_ledger, tmp_path, monkeypatch):
+    """Path of a private copy of the session ledger, selected with db.use_sqlite."""
+    path, sketch_file, _ = base_ledger
+    _isolate(monkeypatch, tmp_path)
+    copy = str(tmp_path / "ledger.db")
+    shutil.copyfile(path, copy)
+    shutil.copyfile(sketch_file, sketches.SKETCH_FILE)
+    db.use_sqlite(copy)
+    db.bump_data_version()
+    yield copy
+    db.use_sqlite(None)
+
+
+@pytest.fixture
+def connection(ledger):
+    connection = db.connect_sqlite(ledger)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def empty_ledger(tmp_path, monkeypatch):
+    """Path of a new, empty SQLite ledger file, selected with db.use_sqlite."""
+    _isolate(monkeypatch, tmp_path)
+    path = str(tmp_path / "empty.db")
+    db.use_sqlite(path)
+    db.bump_data_version()
+    yield path
+    db.use_sqlite(None)
+
@@ -0,0 +1,30 @@
+import columnar
+import partitions
+from queries import query_map, query_map_1
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def test_snapshot_matches_sql(connection, tmp_path):
+    path = str(tmp_path / "snapshot")
+    rows = columnar.export(connection, path, chunk_size=7000, log=_quiet)
+    assert rows == 20000
+    assert columnar.verify(connection, columnar.Snapshot(path), log=_quiet) == []
+
+
+def test_snapshot_matches_sql_after_archive(connection, tmp_path):
+    partitions.partition(connection, log=_quiet)
+    partitions.archive(connection, "2022-01-01", log=_quiet)
+    path = str(tmp_path / "snapshot")
+    # Archived years stay in the snapshot, like they stay in the history view
+    assert columnar.export(connection, path, log=_quiet) == 20000
+    snapshot = columnar.Snapshot(path)
+    assert columnar.verify(connection, snapshot, log=_quiet) == []
+    years = columnar.answer("Yearly breakdown of stops and arrests by country", snapshot)
+    assert {2020, 2021} <= set(years["stop_year"].astype(int))
+
+
+def test_every_catalog_question_has_an_analysis():
+    assert set(columnar.ANALYSES) == set(query_map) | set(query_map_1)
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import db
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _counting_pool(size):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+    return db.ConnectionPool(connect=connect, size=size), opened
+
+
+def test_pool_reuses_connections():
+    pool, opened = _counting_pool(2)
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn is opened[0]
+    assert len(opened) == 1
+
+
+def test_pool_discards_a_connection_that_raised():
+    pool, opened = _counting_pool(2)
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError("query failed")
+    assert opened[0].closed
+    with pool.connection() as conn:
+        assert conn is opened[1]
+
+
+def test_pool_blocks_callers_beyond_its_size():
+    pool, opened = _counting_pool(2)
+    inside, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with pool.connection():
+            with lock:
+                inside[0] += 1
+                peak[0] = max(peak[0], inside[0])
+            time.sleep(0.02)
+            with lock:
+                inside[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert len(opened) == 2
+
+
+def test_cache_hits_until_data_version_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATA_VERSION_FILE", str(tmp_path / "data_version"))
+    cache = db.QueryCache()
+    cache.put(("SELECT 1", ()), "result")
+    assert cache.get(("SELECT 1", ())) == "result"
+
+    # Another process (an ingest run) bumps the version file
+    (tmp_path / "data_version").write_text("2")
+    assert cache.get(("SELECT 1", ())) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_bump_data_version_clears_the_shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATA_VERSION_FILE", str(tmp_path / "data_version"))
+    db._cache.put(("SELECT 2", ()), "result")
+    db.bump_data_version()
+    assert db._cache.get(("SELECT 2", ())) is None
+
+
+def test_cache_expires_and_evicts_least_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATA_VERSION_FILE", str(tmp_path / "data_version"))
+    expired = db.QueryCache(ttl=-1)
+    expired.put("a", 1)
+    assert expired.get("a") is None
+
+    cache = db.QueryCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_streamed_fetch_matches_buffered_in_smaller_dtypes(ledger, monkeypatch):
+    monkeypatch.setattr(db, "STREAM_CHUNK", 3000)  # several chunks to merge
+    query = "SELECT id, country_name, driver_age, search_conducted, vehicle_number FROM police_post_logs ORDER BY id"
+    buffered = db.fetch_data(query, use_cache=False)
+    streamed = db.fetch_data(query, use_cache=False, stream=True)
+
+    assert isinstance(streamed["country_name"].dtype, pd.CategoricalDtype)
+    assert streamed["search_conducted"].dtype == bool
+    assert str(streamed["id"].dtype) == "int16"
+    assert str(streamed["driver_age"].dtype) in ("int8", "Int8")
+    assert db.result_bytes(streamed) < db.result_bytes(buffered)
+    for column in buffered.columns:
+        assert streamed[column].astype(object).tolist() == buffered[column].astype(object).tolist(), column
+
+
+def test_compact_column_downcasts_and_keeps_text():
+    ages = db.compact_column("driver_age", pd.Series([25, None, 61], dtype=object))
+    assert str(ages.dtype) == "Int8" and ages.isna().tolist() == [False, True, False]
+    flags = db.compact_column("is_arrested", pd.Series([1, 0, None]))
+    assert str(flags.dtype) == "boolean"
+    # Text that looks numeric stays text unless the column is declared numeric
+    codes = db.compact_column("vehicle_number", pd.Series(["0012", "0340"]))
+    assert codes.tolist() == ["0012", "0340"]
+    assert db.compact_column("n", pd.Series(["12", "340"]), numeric=True).tolist() == [12, 340]
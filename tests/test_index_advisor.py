@@ -0,0 +1,27 @@
+import index_advisor
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def _full_scan(connection, query):
+    return any(scan for _, scan in index_advisor.explain(connection, query))
+
+
+def test_no_catalog_query_scans_the_table(connection):
+    assert index_advisor.check_catalog(connection, log=_quiet) == []
+
+
+def test_explain_flags_full_scans(connection):
+    assert _full_scan(connection, "SELECT COUNT(*) FROM police_post_logs WHERE search_type = 'Vehicle Search'")
+    assert not _full_scan(connection, "SELECT COUNT(*) FROM police_post_logs WHERE stop_date >= '2021-01-01'")
+    # Walking an index in order still reads every row when it lacks columns the query needs
+    assert _full_scan(connection, "SELECT * FROM police_post_logs ORDER BY driver_race")
+    assert not _full_scan(connection, "SELECT driver_race, COUNT(*) FROM police_post_logs GROUP BY driver_race")
+
+
+def test_migrate_is_idempotent(connection):
+    messages = []
+    index_advisor.migrate(connection, log=messages.append)
+    assert messages == []
@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+import db
+import ingest
+import rollups
+import sketches
+import synth
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def _fail_on_call(number):
+    calls = []
+
+    def hook(cur, rows):
+        calls.append(len(rows))
+        if len(calls) == number:
+            raise RuntimeError("batch failed")
+    return hook
+
+
+def test_resume_after_failed_batch(empty_ledger, tmp_path):
+    csv_path = str(tmp_path / "stops.csv")
+    synth.write_csv(csv_path, 3000, seed=1)
+    connection = db.connect_sqlite(empty_ledger)
+
+    with pytest.MonkeyPatch.context() as failing:
+        failing.setattr(ingest, "BATCH_HOOKS", ingest.BATCH_HOOKS + [_fail_on_call(2)])
+        with pytest.raises(RuntimeError):
+            ingest.ingest_csv(csv_path, connection, batch_size=1000, log=_quiet)
+    assert ingest.load_checkpoint(connection, csv_path) == 1000
+
+    result = ingest.ingest_csv(csv_path, connection, batch_size=1000, log=_quiet)
+    assert result["rows_inserted"] == 2000
+    assert result["rows_total"] == 3000
+
+    # Every CSV row exactly once, in file order
+    logged = db.fetch_data(
+        "SELECT stop_date, stop_time, vehicle_number FROM police_post_logs ORDER BY id", use_cache=False
+    )
+    expected, _ = ingest.clean_chunk(pd.read_csv(csv_path, dtype={"vehicle_number": str}))
+    assert logged["vehicle_number"].tolist() == expected["vehicle_number"].tolist()
+    assert logged["stop_date"].tolist() == expected["stop_date"].tolist()
+    assert logged["stop_time"].tolist() == expected["stop_time"].tolist()
+
+    # The failed batch left nothing behind in the hooks' tables either
+    stops = db.fetch_data("SELECT SUM(stops) AS n FROM stop_rollup", use_cache=False)["n"].iloc[0]
+    assert int(stops) == 3000
+    flagged = db.fetch_data("SELECT SUM(stops) AS n FROM vehicle_flags", use_cache=False)["n"].iloc[0]
+    assert int(flagged) == 3000
+    state = sketches.Sketches.load()
+    assert (state.stops, state.last_id) == (3000, 3000)
+    connection.close()
+
+
+def test_rerun_of_finished_file_inserts_nothing(empty_ledger, tmp_path):
+    csv_path = str(tmp_path / "stops.csv")
+    synth.write_csv(csv_path, 1500, seed=2)
+    connection = db.connect_sqlite(empty_ledger)
+    ingest.ingest_csv(csv_path, connection, batch_size=1000, log=_quiet)
+    result = ingest.ingest_csv(csv_path, connection, batch_size=1000, log=_quiet)
+    assert result["rows_inserted"] == 0
+    assert int(db.fetch_data("SELECT COUNT(*) AS n FROM police_post_logs", use_cache=False)["n"].iloc[0]) == 1500
+    outcome = db.fetch_data(rollups.OUTCOME_TOTALS_SQL, use_cache=False)
+    assert int(outcome["stops"].sum()) == 1500
+    connection.close()
+
+
+def test_unparseable_dates_are_stored_as_null(empty_ledger, tmp_path):
+    frame = synth.generate_frame(4, seed=5)
+    frame["stop_date"] = ["2021-03-04", "2021-02-30", "yesterday", None]
+    frame["stop_time"] = ["10:15:00", "25:00:00", "08:00:00", "09:30:00"]
+    csv_path = str(tmp_path / "stops.csv")
+    frame.to_csv(csv_path, index=False)
+    connection = db.connect_sqlite(empty_ledger)
+    messages = []
+    result = ingest.ingest_csv(csv_path, connection, log=messages.append)
+    # Three bad values; the missing date was already NULL
+    assert (result["rows_inserted"], result["invalid_values"]) == (4, 3)
+    assert any("3 unparseable" in message for message in messages)
+    logged = db.fetch_data("SELECT stop_date, stop_time FROM police_post_logs ORDER BY id", use_cache=False)
+    assert logged.astype(object).where(logged.notna(), None).values.tolist() == [
+        ["2021-03-04", "10:15:00"], [None, None], [None, "08:00:00"], [None, "09:30:00"]
+    ]
+    connection.close()
+
+
+def test_resume_skips_rows_with_a_callable(empty_ledger, tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "stops.csv")
+    synth.write_csv(csv_path, 1200, seed=6)
+    connection = db.connect_sqlite(empty_ledger)
+    with connection.cursor() as cur:
+        cur.execute(ingest.CREATE_CHECKPOINT_SQL)
+        cur.execute("INSERT INTO ingest_checkpoints (source, rows_done) VALUES (%s, %s)",
+                    (ingest._checkpoint_key(csv_path), 1000))
+    connection.commit()
+
+    read_csv = pd.read_csv
+    seen = {}
+
+    def spy(*args, **kwargs):
+        seen["skiprows"] = kwargs["skiprows"]
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, "read_csv", spy)
+    result = ingest.ingest_csv(csv_path, connection, batch_size=500, log=_quiet)
+    assert callable(seen["skiprows"])
+    assert (result["rows_inserted"], result["rows_total"]) == (200, 1200)
+    logged = db.fetch_data("SELECT vehicle_number FROM police_post_logs ORDER BY id", use_cache=False)
+    assert logged["vehicle_number"].tolist() == read_csv(csv_path, dtype=str)["vehicle_number"].tolist()[1000:]
+    connection.close()
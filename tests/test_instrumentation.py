@@ -0,0 +1,60 @@
+import json
+import logging
+from collections import deque
+
+import pytest
+
+import db
+import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def _fresh_records():
+    instrumentation.clear()
+    yield
+    instrumentation.clear()
+
+
+def test_timer_phases():
+    timer = instrumentation.Timer()
+    timer.mark("connect")
+    timer.mark("execute")
+    assert list(timer.phases) == ["connect_ms", "execute_ms"]
+    assert timer.total_ms() >= sum(timer.phases.values())
+
+
+def test_ring_buffer_is_bounded(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_records", deque(maxlen=3))
+    for i in range(5):
+        instrumentation.record("query", query=f"q{i}")
+    instrumentation.record_page("Home", 0.0)
+    assert [r["query"] for r in instrumentation.records("query")] == ["q3", "q4"]
+    assert [r["page"] for r in instrumentation.records("page")] == ["Home"]
+
+
+def test_fetch_data_records_misses_hits_and_errors(ledger):
+    query = "SELECT country_name, COUNT(*) AS n FROM police_post_logs GROUP BY country_name"
+    db.fetch_data(query, label="countries")
+    db.fetch_data(query, label="countries")
+    with pytest.raises(Exception):
+        db.fetch_data("SELECT * FROM no_such_table")
+
+    miss, hit, error = instrumentation.records("query")
+    assert (miss["query"], miss["cache"], hit["cache"]) == ("countries", "miss", "hit")
+    assert miss["rows"] == hit["rows"] > 0 and miss["result_bytes"] > 0
+    assert {"connect_ms", "execute_ms", "fetch_ms", "frame_ms"} <= set(miss)
+    assert error["cache"] == "error" and "no_such_table" in error["error"]
+    assert error["query"] == "SELECT * FROM no_such_table"
+
+
+def test_records_go_to_the_log_file(tmp_path, monkeypatch):
+    path = tmp_path / "perf.jsonl"
+    logger = logging.getLogger("securecheck.perf")
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(instrumentation, "LOG_FILE", str(path))
+    monkeypatch.setattr(instrumentation, "_logger", None)
+    instrumentation.record("page", page="Metrics", render_ms=12.5)
+    for handler in logger.handlers:
+        handler.close()
+    (line,) = path.read_text().splitlines()
+    assert json.loads(line)["page"] == "Metrics"
@@ -0,0 +1,54 @@
+import db
+import log_browser
+
+
+def _all_pages(filters, page_size):
+    pages, after = [], 0
+    while True:
+        page = log_browser.fetch_page(filters, after, page_size, prefetch=False)
+        if page.empty:
+            return pages
+        pages.append(page)
+        after = int(page["id"].iloc[-1])
+
+
+def _ids(filters):
+    clauses, params = log_browser.build_where(filters)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return db.fetch_data(f"SELECT id FROM police_post_logs{where} ORDER BY id", params, use_cache=False)["id"].tolist()
+
+
+def test_pages_cover_every_row_once(ledger):
+    pages = _all_pages({}, 997)
+    assert all(len(page) == 997 for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= 997
+    ids = [i for page in pages for i in page["id"]]
+    assert ids == sorted(set(ids))
+    assert ids == _ids({})
+
+
+def test_filtered_pages_cover_every_match_once(ledger):
+    filters = {"country_name": "India", "date_from": "2021-03-01", "date_to": "2022-06-30", "vehicle_number": "K"}
+    pages = _all_pages(filters, 50)
+    ids = [i for page in pages for i in page["id"]]
+    assert ids == _ids(filters)
+    rows = [row for page in pages for row in page.itertuples()]
+    assert all(row.country_name == "India" and row.vehicle_number.startswith("K") for row in rows)
+    assert all("2021-03-01" <= str(row.stop_date) <= "2022-06-30" for row in rows)
+
+
+def test_page_after_last_row_is_empty(ledger):
+    top = db.last_log_id()
+    assert log_browser.fetch_page({}, top, 100, prefetch=False).empty
+    assert log_browser.fetch_page({}, top - 1, 100, prefetch=False)["id"].tolist() == [top]
+
+
+def test_like_prefix_is_escaped(ledger):
+    assert log_browser.fetch_page({"vehicle_number": "%"}, 0, 10, prefetch=False).empty
+    assert log_browser.fetch_page({"vehicle_number": "_A"}, 0, 10, prefetch=False).empty
+
+
+def test_estimate_count_matches_pages(ledger):
+    for filters in ({}, {"country_name": "USA"}, {"violation": "DUI", "date_from": "2023-01-01"},
+                    {"vehicle_number": "MH"}):
+        assert log_browser.estimate_count(filters) == len(_ids(filters))
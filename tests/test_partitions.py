@@ -0,0 +1,79 @@
+import pytest
+
+import db
+import partitions
+
+COUNT_SQL = "SELECT COUNT(*) AS n FROM police_post_logs"
+RANGES = [
+    (None, None),
+    ("2020-01-01", "2020-12-31"),
+    ("2021-06-15", "2021-06-15"),
+    ("2021-07-01", "2023-02-28"),
+    ("2023-01-01", None),
+    (None, "2021-12-31"),
+]
+
+
+def _count(sql, params=None):
+    return int(db.fetch_data(sql, params, use_cache=False)["n"].iloc[0])
+
+
+def _expected(date_from, date_to):
+    clauses, params = [], []
+    if date_from:
+        clauses.append("stop_date >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("stop_date <= %s")
+        params.append(date_to)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return _count(COUNT_SQL + where, params)
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+@pytest.fixture
+def archived(ledger, connection):
+    """The ledger partitioned by year with 2020 and 2021 archived; yields the counts per range before."""
+    before = {bounds: _expected(*bounds) for bounds in RANGES}
+    partitions.partition(connection, log=_quiet)
+    partitions.archive(connection, "2022-01-01", log=_quiet)
+    return before
+
+
+def test_scope_without_archive(ledger):
+    assert partitions.source() == "police_post_logs"
+    assert partitions.scope(COUNT_SQL) == COUNT_SQL
+    for date_from, date_to in RANGES:
+        assert _count(partitions.scope(COUNT_SQL, date_from, date_to)) == _expected(date_from, date_to)
+
+
+def test_archive_moves_old_years(archived, connection):
+    assert [table for table, _, _ in partitions.archived(connection)] == [
+        "police_post_logs_archive_p2020", "police_post_logs_archive_p2021"
+    ]
+    assert partitions.archive_boundary() == "2022-01-01"
+    assert _count("SELECT COUNT(*) AS n FROM police_post_logs WHERE stop_date < '2022-01-01'") == 0
+    assert _count(f"SELECT COUNT(*) AS n FROM {partitions.HISTORY_VIEW}") == archived[(None, None)]
+
+
+def test_source_reads_history_only_when_needed(archived):
+    assert partitions.source() == partitions.HISTORY_VIEW
+    assert partitions.source("2021-12-31") == partitions.HISTORY_VIEW
+    assert partitions.source("2022-01-01") == "police_post_logs"
+    assert partitions.source("2023-05-01") == "police_post_logs"
+
+
+def test_scope_over_date_ranges_after_archive(archived):
+    for (date_from, date_to), expected in archived.items():
+        assert _count(partitions.scope(COUNT_SQL, date_from, date_to)) == expected, (date_from, date_to)
+
+
+def test_scope_keeps_hot_ranges_on_hot_table(archived):
+    scoped = partitions.scope(COUNT_SQL, "2023-01-01", "2023-12-31")
+    assert partitions.HISTORY_VIEW not in scoped
+    assert "stop_date >= '2023-01-01'" in scoped and "stop_date <= '2023-12-31'" in scoped
+    assert partitions.HISTORY_VIEW in partitions.scope(COUNT_SQL, "2021-01-01", "2023-12-31")
+
@@ -0,0 +1,85 @@
+import db
+import predictor
+
+# (gender, age, search, duration, drugs, outcome, violation, count)
+ROWS = [
+    ("M", 22, 1, "0-15 Min", 0, "Ticket", "Speeding", 5),
+    ("M", 22, 1, "0-15 Min", 0, "Warning", "Signal", 2),
+    ("M", 24, 1, "0-15 Min", 0, "Arrest", "DUI", 9),
+    ("F", 40, 0, "30+ Min", 1, "Citation", "Seatbelt", 4),
+    ("F", 70, 0, "16-30 Min", 1, "Warning", "Other", 1),
+]
+
+
+def _index():
+    return predictor.PredictionIndex.from_rows(ROWS)
+
+
+def test_exact_combination():
+    assert _index().predict("Male", 22, "Yes", "0-15 Min", "No") == ("Ticket", "Speeding", "exact")
+
+
+def test_backs_off_to_age_band():
+    # Age 19 was never seen; 18-25 holds ages 22 and 24, where Arrest / DUI lead 9 to 5
+    assert _index().predict("Male", 19, "Yes", "0-15 Min", "No") == ("Arrest", "DUI", "age_band")
+
+
+def test_under_18_has_its_own_band():
+    assert predictor.age_band(16) == predictor.age_band(17) == "<18"
+    # No under-18 stops: backs off past the age band instead of taking the 70-year-old's
+    assert _index().predict("Female", 16, "No", "16-30 Min", "Yes") == ("Warning", "Other", "no_age")
+
+
+def test_backs_off_to_no_age():
+    assert _index().predict("Male", 50, "Yes", "0-15 Min", "No") == ("Arrest", "DUI", "no_age")
+
+
+def test_backs_off_to_flags():
+    assert _index().predict("Female", 30, "No", "0-15 Min", "Yes") == ("Citation", "Seatbelt", "flags")
+
+
+def test_backs_off_to_whole_ledger():
+    assert _index().predict("Female", 30, "Yes", "30+ Min", "Yes") == ("Arrest", "DUI", "all")
+
+
+def test_empty_index_uses_default():
+    empty = predictor.PredictionIndex.from_rows([])
+    assert empty.predict("Male", 30, "No", "0-15 Min", "No") == predictor.DEFAULT_PREDICTION + ("default",)
+
+
+def test_ties_go_to_smallest_value():
+    rows = [("M", 30, 0, "0-15 Min", 0, "Warning", "Speeding", 3), ("M", 30, 0, "0-15 Min", 0, "Citation", "DUI", 3)]
+    index = predictor.PredictionIndex.from_rows(rows)
+    assert index.predict("M", 30, False, "0-15 Min", False) == ("Citation", "DUI", "exact")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = _index()
+    index.save(path)
+    loaded = predictor.PredictionIndex.load(path)
+    assert loaded.tables == index.tables
+    assert loaded.durations == ["0-15 Min", "16-30 Min", "30+ Min"]
+
+
+def test_ledger_index_predicts_seen_combinations_exactly(ledger):
+    top = db.fetch_data(
+        "SELECT driver_gender, driver_age, search_conducted, stop_duration, drugs_related_stop, COUNT(*) AS n "
+        "FROM police_post_logs GROUP BY 1, 2, 3, 4, 5 ORDER BY n DESC LIMIT 1",
+        use_cache=False,
+    ).iloc[0]
+    combination = (top["driver_gender"], int(top["driver_age"]), bool(top["search_conducted"]),
+                   top["stop_duration"], bool(top["drugs_related_stop"]))
+    outcomes = db.fetch_data(
+        "SELECT stop_outcome, COUNT(*) AS n FROM police_post_logs WHERE driver_gender = %s AND driver_age = %s "
+        "AND search_conducted = %s AND stop_duration = %s AND drugs_related_stop = %s "
+        "GROUP BY stop_outcome ORDER BY n DESC, stop_outcome LIMIT 1",
+        combination,
+        use_cache=False,
+    )
+
+    index = predictor.get_index()
+    outcome, _, level = index.predict(*combination)
+    assert level == "exact"
+    assert outcome == outcomes["stop_outcome"].iloc[0]
+    assert predictor.get_index() is index
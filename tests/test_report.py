@@ -0,0 +1,63 @@
+import threading
+
+import db
+import report
+
+
+class Collect:
+    """Report writer that keeps every frame in memory."""
+
+    def __init__(self):
+        self.frames = {}
+        self.timings = None
+
+    def add(self, section, question, frame):
+        self.frames[question] = frame
+
+    def close(self, timings):
+        self.timings = timings
+
+
+def test_run_report_answers_the_whole_catalog(ledger):
+    writer = Collect()
+    progress = []
+    timings = report.run_report(writer, backend="sql", workers=3, on_result=lambda *args: progress.append(args))
+
+    questions = [question for _, question, _ in report.catalog()]
+    assert sorted(writer.frames) == sorted(questions)
+    assert timings["error"].isna().all()
+    assert len(progress) == len(questions)
+    for _, question, query in report.catalog():
+        expected = db.fetch_data(query, use_cache=False)
+        assert writer.frames[question].astype(object).values.tolist() == expected.astype(object).values.tolist()
+
+
+def test_run_report_records_failures_and_keeps_going(ledger, monkeypatch):
+    sections = [("Broken", {"Missing table": "SELECT * FROM no_such_table", "Fine": "SELECT 1 AS one"})]
+    monkeypatch.setattr(report, "SECTIONS", sections)
+    writer = Collect()
+    timings = report.run_report(writer, backend="sql").set_index("question")
+    assert list(writer.frames) == ["Fine"]
+    assert "no_such_table" in timings.loc["Missing table", "error"]
+    assert writer.timings is not None
+
+
+def test_report_leaves_half_the_pool_free(ledger, monkeypatch):
+    workers = set()
+
+    def run_one(question, query, backend):
+        workers.add(threading.current_thread().name)
+        return db.fetch_data("SELECT 1 AS one", use_cache=False), 0.0
+    monkeypatch.setattr(report, "_run_one", run_one)
+    report.run_report(Collect(), backend="sql")
+    assert report.default_workers() == db.POOL_SIZE // 2
+    assert 1 <= len(workers) <= report.default_workers()
+
+
+def test_html_report_lists_every_question(ledger, tmp_path):
+    path = tmp_path / "report.html"
+    report.run_report(report.HtmlReport(str(path)), backend="sql")
+    text = path.read_text(encoding="utf-8")
+    assert text.endswith("</body></html>")
+    for _, question, _ in report.catalog():
+        assert question.replace("&", "&amp;").replace("<", "&lt;") in text
@@ -0,0 +1,64 @@
+import db
+import ingest
+import rollups
+import synth
+
+GROUPED_SQL = """SELECT stop_date, country_name, violation, stop_outcome, COUNT(*) AS stops,
+SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END) AS arrests,
+SUM(CASE WHEN search_conducted = 1 THEN 1 ELSE 0 END) AS searches,
+SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END) AS drug_stops
+FROM police_post_logs GROUP BY stop_date, country_name, violation, stop_outcome"""
+
+KEYS = ["stop_date", "country_name", "violation", "stop_outcome"]
+
+
+def _rollup():
+    frame = db.fetch_data("SELECT * FROM stop_rollup", use_cache=False)
+    return frame.astype({"stop_date": str}).sort_values(KEYS).reset_index(drop=True)
+
+
+def _expected():
+    frame = db.fetch_data(GROUPED_SQL, use_cache=False)
+    return frame.astype({"stop_date": str}).sort_values(KEYS).reset_index(drop=True)
+
+
+def _assert_matches_log():
+    rollup, expected = _rollup(), _expected()
+    assert len(rollup) == len(expected)
+    for column in KEYS + rollups.COUNT_COLUMNS:
+        assert rollup[column].astype(str).tolist() == expected[column].astype(str).tolist(), column
+
+    outcomes = db.fetch_data(rollups.OUTCOME_TOTALS_SQL, use_cache=False).set_index("stop_outcome")
+    by_outcome = expected.groupby("stop_outcome")[rollups.COUNT_COLUMNS].sum()
+    for column in rollups.COUNT_COLUMNS:
+        assert outcomes[column].astype(int).to_dict() == by_outcome[column].astype(int).to_dict()
+
+
+def test_ingest_upserts_match_count(ledger):
+    _assert_matches_log()
+
+
+def test_second_file_adds_to_existing_groups(ledger, connection, tmp_path):
+    csv_path = str(tmp_path / "more.csv")
+    synth.write_csv(csv_path, 4000, seed=11)
+    before = int(_rollup()["stops"].sum())
+    ingest.ingest_csv(csv_path, connection, batch_size=1500, log=lambda *args: None)
+    assert int(_rollup()["stops"].sum()) == before + 4000
+    _assert_matches_log()
+
+
+def test_rebuild_reproduces_ingest_totals(ledger, connection):
+    ingested = _rollup()
+    rollups.rebuild(connection)
+    rebuilt = _rollup()
+    assert rebuilt.equals(ingested)
+
+
+def test_metrics_from_outcome_totals(ledger):
+    kpis = rollups.metrics(db.fetch_data(rollups.OUTCOME_TOTALS_SQL, use_cache=False))
+    total = int(db.fetch_data("SELECT COUNT(*) AS n FROM police_post_logs", use_cache=False)["n"].iloc[0])
+    arrests = int(db.fetch_data(
+        "SELECT COUNT(*) AS n FROM police_post_logs WHERE stop_outcome = 'Arrest'", use_cache=False
+    )["n"].iloc[0])
+    assert kpis["stops"] == total
+    assert kpis["arrests"] == arrests
@@ -0,0 +1,120 @@
+import random
+from collections import Counter
+
+import db
+import ingest
+import sketches
+import synth
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def test_space_saving_bounds_under_eviction():
+    rng = random.Random(9)
+    stream = [f"P{min(int(rng.paretovariate(1.1)), 5000)}" for _ in range(50000)]
+    summary = sketches.SpaceSaving(capacity=100)
+    for start in range(0, len(stream), 1000):
+        summary.update(Counter(stream[start:start + 1000]))
+    truth = Counter(stream)
+    for item, count, error in summary.top(10):
+        assert count - error <= truth[item] <= count
+    # Items above n / capacity are always tracked
+    heavy = {item for item, n in truth.items() if n > len(stream) / 100}
+    assert heavy <= set(summary.counts)
+
+
+def test_hyperloglog_within_its_bound():
+    plates = sketches.HyperLogLog()
+    for i in range(30000):
+        plates.add(f"KA{i:06d}")
+        plates.add(f"KA{i:06d}")  # duplicates do not count
+    assert abs(plates.count() - 30000) <= plates.error()
+
+
+def test_ledger_top_lists_bracket_true_counts(ledger):
+    state = sketches.get_sketches()
+    assert state.stops == 20000
+    top = sketches.answer("Top 10 vehicle number involed in drug related stops", state)
+    truth = db.fetch_data(
+        "SELECT vehicle_number, SUM(drugs_related_stop) AS n FROM police_post_logs GROUP BY vehicle_number",
+        use_cache=False,
+    ).set_index("vehicle_number")["n"]
+    for plate, count, error in top.itertuples(index=False, name=None):
+        assert count - error <= truth[plate] <= count
+
+    distinct = int(db.fetch_data(
+        "SELECT COUNT(DISTINCT vehicle_number) AS n FROM police_post_logs", use_cache=False
+    )["n"].iloc[0])
+    assert abs(state.plates.count() - distinct) <= state.plates.error()
+
+
+def test_stratified_estimates_within_bounds(ledger, connection):
+    # A sample smaller than every country, so the estimates are not exact
+    state = sketches.Sketches()
+    state.sample = sketches.StratifiedSample(size=1500)
+    state.sample._random.seed(4)
+    sketches._catch_up(state, connection)
+
+    estimate = sketches.answer("Arrest rate by country and violation", state)
+    truth = db.fetch_data(
+        "SELECT country_name, violation, COUNT(*) AS stops, SUM(is_arrested) AS arrests "
+        "FROM police_post_logs GROUP BY country_name, violation",
+        use_cache=False,
+    ).set_index(["country_name", "violation"])
+    assert len(estimate) == len(truth)
+    within = []
+    for row in estimate.itertuples(index=False):
+        actual = truth.loc[(row.country_name, row.violation)]
+        assert row.total_stops_error > 0
+        within.append(abs(row.total_stops - actual["stops"]) <= row.total_stops_error)
+        within.append(abs(row.total_arrests - actual["arrests"]) <= row.total_arrests_error)
+        rate = 100 * actual["arrests"] / actual["stops"]
+        within.append(abs(row.total_arrest_percent - rate) <= row.total_arrest_percent_error)
+    # 95% intervals: allow a few misses, not a systematic bias
+    assert sum(within) / len(within) >= 0.85
+
+    # Country totals are known exactly, so their estimates carry no error
+    by_country = sketches.answer("Countries that report with highest drug-related stop rates", state)
+    counts = truth.groupby("country_name")["stops"].sum()
+    assert dict(zip(by_country["country_name"], by_country["total_stops"])) == counts.to_dict()
+
+
+def test_saved_sketches_round_trip(ledger, tmp_path):
+    state = sketches.get_sketches()
+    path = str(tmp_path / "copy.json")
+    state.save(path)
+    loaded = sketches.Sketches.load(path)
+    assert loaded.to_json() == state.to_json()
+
+
+def test_refresh_publishes_a_new_object(ledger, connection, tmp_path):
+    before = sketches.get_sketches()
+    path = str(tmp_path / "more.csv")
+    synth.write_csv(path, 500, seed=21)
+    ingest.ingest_csv(path, connection, batch_size=200, log=_quiet)
+    after = sketches.get_sketches()
+    assert after is not before
+    assert (before.stops, after.stops) == (20000, 20500)
+
+
+def test_catch_up_reads_null_ages_and_plates(ledger, connection):
+    before = sketches.get_sketches()
+    columns = ", ".join(db.LOG_COLUMNS)
+    with connection.cursor() as cur:
+        cur.execute(f"INSERT INTO police_post_logs ({columns}) SELECT {columns} FROM police_post_logs ORDER BY id LIMIT 3")
+        cur.execute("SELECT id FROM police_post_logs ORDER BY id DESC LIMIT 3")
+        young, unknown, no_plate = sorted(row["id"] for row in cur.fetchall())
+        cur.execute("UPDATE police_post_logs SET driver_age = 20, vehicle_number = 'ZZ00ZZ0000' WHERE id = %s", (young,))
+        cur.execute("UPDATE police_post_logs SET driver_age = NULL WHERE id = %s", (unknown,))
+        cur.execute("UPDATE police_post_logs SET vehicle_number = NULL WHERE id = %s", (no_plate,))
+    connection.commit()
+    db.bump_data_version()
+
+    # Read through fetch_data, where a mixed batch turns NULL into NaN
+    after = sketches.get_sketches()
+    assert after.stops == before.stops + 3
+    assert after.plates.count() >= before.plates.count()
+    assert not sketches.answer("Top 10 vehicle number involed in drug related stops", after).empty
+    assert sketches.summary(after)["stops"] == before.stops + 3
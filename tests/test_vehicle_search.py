@@ -0,0 +1,122 @@
+import random
+
+import db
+import ingest
+import partitions
+import synth
+import vehicle_search
+
+PLATES = ["KA01AB1234", "KA01AB1235", "KA02CD0001", "MH12AB1234", "TN09XY4321", "DL01AB1234"]
+
+
+def _index(plates=PLATES):
+    index = vehicle_search.PlateIndex()
+    index.build(plate.encode() for plate in plates)
+    return index
+
+
+def test_prefix():
+    index = _index()
+    assert index.prefix("KA01") == (["KA01AB1234", "KA01AB1235"], 2)
+    assert index.prefix("ka0", limit=1) == (["KA01AB1234"], 3)
+    assert index.prefix("ZZ") == ([], 0)
+
+
+def test_contains():
+    index = _index()
+    assert index.contains("AB1234") == (["DL01AB1234", "KA01AB1234", "MH12AB1234"], 3)
+    assert index.contains("4321") == (["TN09XY4321"], 1)
+    assert index.contains("BA12") == ([], 0)
+    # Shorter than a trigram: matched as a prefix
+    assert index.contains("TN") == (["TN09XY4321"], 1)
+
+
+def test_fuzzy():
+    index = _index()
+    # One substitution (l for 1), one transposition-like pair of edits
+    assert index.fuzzy("KA0lAB1234")[0] == ("KA01AB1234", 1)
+    assert ("MH12AB1234", 2) in index.fuzzy("MH21AB1234")
+    assert index.fuzzy("PB65QQ9090") == []
+
+
+def test_delta_plates_are_searchable():
+    index = _index()
+    index.add(b"KA01AB9999")
+    index.add(b"KA01AB1234")  # already indexed
+    assert len(index) == len(PLATES) + 1
+    assert index.prefix("KA01") == (["KA01AB1234", "KA01AB1235", "KA01AB9999"], 3)
+    assert index.contains("B999") == (["KA01AB9999"], 1)
+    assert index.fuzzy("KA01AB9998")[0] == ("KA01AB9999", 1)
+
+
+def _sql_matches(pattern):
+    frame = db.fetch_data(
+        "SELECT vehicle_number FROM vehicle_flags WHERE vehicle_number LIKE %s ORDER BY vehicle_number",
+        (pattern,), use_cache=False,
+    )
+    return frame["vehicle_number"].tolist()
+
+
+def test_ledger_search_matches_sql(ledger):
+    plates = db.fetch_data("SELECT vehicle_number FROM vehicle_flags", use_cache=False)["vehicle_number"].tolist()
+    index = vehicle_search.get_index()
+    assert len(index) == len(plates)
+    for plate in random.Random(5).sample(plates, 20):
+        prefix, middle = plate[:4], plate[3:7]
+        found, total = index.prefix(prefix, limit=10 ** 6)
+        assert found == _sql_matches(prefix + "%") and total == len(found)
+        found, total = index.contains(middle, limit=10 ** 6)
+        assert found == _sql_matches("%" + middle + "%") and total == len(found)
+        typo = plate[:-1] + ("0" if plate[-1] != "0" else "1")
+        assert (plate, 1) in index.fuzzy(typo)
+
+
+def test_search_counts_stops_and_catches_up(ledger, connection, tmp_path):
+    before = vehicle_search.get_index()
+    frame = synth.generate_frame(3, seed=3)
+    frame["vehicle_number"] = ["zz99zz0001", "ZZ99ZZ0001", "ZZ99ZZ0002"]
+    path = str(tmp_path / "new.csv")
+    frame.to_csv(path, index=False)
+    ingest.ingest_csv(path, connection, log=lambda *args: None)
+
+    result, total = vehicle_search.search("zz99", "prefix")
+    assert total == 2
+    assert result[["vehicle_number", "stops"]].values.tolist() == [["ZZ99ZZ0001", 2], ["ZZ99ZZ0002", 1]]
+    # The index handed out earlier is not changed by the refresh
+    assert vehicle_search.get_index() is not before
+    assert before.prefix("ZZ99") == ([], 0)
+
+
+def test_stop_history_reads_archive_only_on_request(ledger, connection):
+    plate = db.fetch_data(
+        "SELECT vehicle_number FROM vehicle_flags WHERE stops BETWEEN 5 AND 50 ORDER BY stops DESC LIMIT 1",
+        use_cache=False,
+    )["vehicle_number"].iloc[0]
+    everything = vehicle_search.stop_history(plate)
+    assert len(everything) == int(db.fetch_data(
+        "SELECT stops FROM vehicle_flags WHERE vehicle_number = %s", (plate,), use_cache=False
+    )["stops"].iloc[0])
+    assert everything["id"].is_monotonic_decreasing
+
+    partitions.partition(connection, log=lambda *args: None)
+    partitions.archive(connection, "2022-01-01", log=lambda *args: None)
+    hot = vehicle_search.stop_history(plate)
+    assert 0 < len(hot) < len(everything)
+    assert (hot["stop_date"].astype(str) >= "2022-01-01").all()
+    assert len(vehicle_search.stop_history(plate, include_archive=True)) == len(everything)
+    reaching_back = vehicle_search.stop_history(plate, date_from="2021-01-01")
+    assert len(reaching_back) == (everything["stop_date"].astype(str) >= "2021-01-01").sum()
+
+
+def test_stop_history_lists_every_spelling_of_a_plate(ledger, connection, tmp_path):
+    frame = synth.generate_frame(4, seed=4)
+    frame["vehicle_number"] = ["dl01aa0001", " DL01AA0001", "DL01AA0001", "ka02bb0002"]
+    path = str(tmp_path / "spellings.csv")
+    frame.to_csv(path, index=False)
+    ingest.ingest_csv(path, connection, log=lambda *args: None)
+
+    result, _ = vehicle_search.search("DL01AA0001", "prefix")
+    assert result["stops"].tolist() == [3]
+    assert len(vehicle_search.stop_history("DL01AA0001")) == 3
+    assert len(vehicle_search.stop_history(" dl01aa0001 ")) == 3
+    assert len(vehicle_search.stop_history("KA02BB0002")) == 1
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+import db
+import ingest
+import synth
+import watchlist
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = watchlist.BloomFilter(5000)
+    members = [f"KA{i:02d}XY{i:04d}" for i in range(5000)]
+    for plate in members:
+        bloom.add(plate)
+    assert all(plate in bloom for plate in members)
+    outsiders = [f"MH{i:02d}ZZ{i:04d}" for i in range(20000)]
+    false_positives = sum(plate in bloom for plate in outsiders)
+    # 1% target; allow sampling noise
+    assert false_positives / len(outsiders) < 2 * watchlist.BLOOM_ERROR
+
+
+def _flagged():
+    frame = db.fetch_data(
+        f"SELECT vehicle_number, searches, drug_stops FROM vehicle_flags WHERE {watchlist.FLAGGED}", use_cache=False
+    )
+    return {plate: (int(s), int(d)) for plate, s, d in frame.itertuples(index=False, name=None)}
+
+
+def _no_query(*args, **kwargs):
+    raise AssertionError("check() queried the database")
+
+
+@pytest.mark.parametrize("bloom, memory_limit", [(False, 10 ** 9), (True, 10 ** 9), (True, 0)])
+def test_check_agrees_with_vehicle_flags(ledger, bloom, memory_limit):
+    listed = watchlist.Watchlist(bloom=bloom, memory_limit=memory_limit)
+    listed.load()
+    flagged = _flagged()
+    assert flagged
+
+    # Checks are answered from memory, Bloom-only mode included
+    with pytest.MonkeyPatch.context() as offline:
+        offline.setattr(db, "fetch_data", _no_query)
+        for plate, (searches, drug_stops) in random.Random(3).sample(sorted(flagged.items()), 200):
+            assert listed.check(plate.lower()) == watchlist.reasons(searches, drug_stops)
+    clean = db.fetch_data(
+        f"SELECT vehicle_number FROM vehicle_flags WHERE NOT {watchlist.FLAGGED} LIMIT 200", use_cache=False
+    )
+    for plate in clean["vehicle_number"]:
+        assert listed.check(plate) == []
+
+
+def _stops(tmp_path, name, plates, drugs, searched):
+    frame = synth.generate_frame(len(plates), seed=len(plates))
+    frame["vehicle_number"] = plates
+    frame["drugs_related_stop"] = drugs
+    frame["search_conducted"] = searched
+    path = str(tmp_path / name)
+    frame.to_csv(path, index=False)
+    return path
+
+
+def _alerts():
+    frame = db.fetch_data("SELECT vehicle_number, reasons, source FROM watchlist_alerts ORDER BY id", use_cache=False)
+    return list(frame.itertuples(index=False, name=None))
+
+
+def test_ingest_alerts_on_prior_stops(empty_ledger, tmp_path):
+    connection = db.connect_sqlite(empty_ledger)
+    # Batches of two rows: the second stop of DL01 and both later stops of GJ05 follow flagged ones
+    path = _stops(
+        tmp_path, "stops.csv",
+        ["dl01aa0001", "GJ05BB0002", " DL01AA0001", "GJ05BB0002", "GJ05BB0002", "TN09CC0003"],
+        [True, False, False, False, False, False],
+        [False, True, False, True, False, False],
+    )
+    ingest.ingest_csv(path, connection, batch_size=2, log=_quiet)
+    assert _alerts() == [
+        ("DL01AA0001", "1 prior drug-related stop", "ingest"),
+        ("GJ05BB0002", "searched 2 times before", "ingest"),
+    ]
+    assert watchlist.get_watchlist().check("dl01aa0001") == ["1 prior drug-related stop"]
+    assert watchlist.get_watchlist().check("TN09CC0003") == []
+    connection.close()
+
+
+def test_manual_entry_alerts_on_ingest(empty_ledger, tmp_path):
+    connection = db.connect_sqlite(empty_ledger)
+    db.create_schema(connection)
+    version = db.data_version()
+    watchlist.add(connection, "up32zz9999", "stolen vehicle")
+    assert watchlist.get_watchlist().check("UP32ZZ9999") == ["stolen vehicle"]
+    # Only the watchlist reloads; the ledger's caches are kept
+    assert db.data_version() == version
+    path = _stops(tmp_path, "stops.csv", ["UP32ZZ9999", "KA01AB1234"], [False, False], [False, False])
+    ingest.ingest_csv(path, connection, log=_quiet)
+    assert _alerts() == [("UP32ZZ9999", "stolen vehicle", "ingest")]
+
+    watchlist.remove(connection, "UP32ZZ9999")
+    assert watchlist.get_watchlist().check("UP32ZZ9999") == []
+    connection.close()
+
+
+def test_catch_up_adds_newly_flagged_plates(ledger, connection, tmp_path):
+    listed = watchlist.get_watchlist()
+    assert listed.check("WB99QQ0001") == []
+    path = _stops(tmp_path, "more.csv", ["WB99QQ0001"], [True], [False])
+    ingest.ingest_csv(path, connection, log=_quiet)
+    assert watchlist.get_watchlist().check("WB99QQ0001") == ["1 prior drug-related stop"]
@@ -0,0 +1,365 @@
+"""Prefix, substring and fuzzy vehicle_number search, and a plate's stop history.
+
+Plates (one row per plate in ``vehicle_flags``, kept by the watchlist
+ingest hook) are held in memory as a sorted fixed-width bytes array, so a
+prefix lookup is two binary searches. Substring and fuzzy lookups use a
+trigram index: every plate, padded as "^PLATE$", is cut into 3-byte grams
+stored as CSR postings (sorted gram codes, offsets, plate ids) built with
+NumPy in one pass. A fuzzy query keeps the plates that share enough grams
+with it and ranks them by edit distance.
+
+Plates logged after the index was built are found from an id high-water
+mark and go to a small delta (a sorted list and a dict of postings); past
+``DELTA_LIMIT`` plates the index is rebuilt. A published index is never
+changed: a refresh catches up a copy and swaps it in. A plate's stop
+history is one range read on idx_plate_norm of the hot table, so stops
+logged as " ka01ab1234" and "KA01AB1234" are listed together; archived
+years are read only when asked for.
+
+Usage::
+
+    python vehicle_search.py KA01 --mode prefix
+    python vehicle_search.py KA0lAB1234 --mode fuzzy --history
+"""
+import argparse
+import bisect
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import db
+import partitions
+import watchlist
+
+MAX_RESULTS = 50         # plates returned per search
+HISTORY_LIMIT = 1000     # most recent stops shown for one plate
+DELTA_LIMIT = 100000     # plates added since the last build before rebuilding
+FUZZY_CANDIDATES = 500   # plates with the most shared grams that get an edit distance
+LOAD_CHUNK = 200000      # plates read per query when building
+
+MODES = ["prefix", "contains", "fuzzy"]
+
+
+def _encode(plate):
+    return watchlist.normalize(plate).encode("utf-8")
+
+
+def _code(gram):
+    return gram[0] << 16 | gram[1] << 8 | gram[2]
+
+
+# Gram codes of one byte string (queries and delta plates)
+def grams(value):
+    return {_code(value[i:i + 3]) for i in range(len(value) - 2)}
+
+
+# Gram codes of every plate in a zero-padded uint8 matrix, and which are real
+def _gram_matrix(matrix):
+    rows, width = matrix.shape
+    padded = np.zeros((rows, width + 2), dtype=np.uint32)
+    padded[:, 1:width + 1] = matrix
+    padded[:, 0] = ord("^")
+    padded[np.arange(rows), (matrix != 0).sum(axis=1) + 1] = ord("$")
+    codes = padded[:, :-2] << 16 | padded[:, 1:-1] << 8 | padded[:, 2:]
+    return codes, padded[:, 2:] != 0
+
+
+# np.unique without its extra copies: sort in place, drop repeats
+def _sorted_unique(values):
+    values.sort()
+    if len(values) < 2:
+        return values
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of ``a`` and ``b``, or ``limit + 1`` once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class PlateIndex:
+    """In-memory plate index; see the module docstring."""
+
+    def __init__(self):
+        self.version = None
+        self.last_id = 0
+        self._plates = np.array([], dtype="S1")       # sorted, unique
+        self._gram_codes = np.array([], dtype=np.uint32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.array([], dtype=np.uint32)
+        self._delta = []                                # sorted plates added since the build
+        self._delta_grams = {}                          # gram -> delta plate positions
+        self._delta_plates = []                         # delta plates by position
+
+    def __len__(self):
+        return len(self._plates) + len(self._delta)
+
+    def build(self, plates):
+        """Index ``plates`` (iterable of bytes), replacing everything."""
+        plates = _sorted_unique(np.asarray(list(plates), dtype=bytes))
+        if len(plates):
+            matrix = plates.view(np.uint8).reshape(len(plates), plates.dtype.itemsize)
+            codes, real = _gram_matrix(matrix)
+            ids = np.broadcast_to(np.arange(len(plates), dtype=np.uint64)[:, None], codes.shape)
+            # One key per (gram, plate), sorted, without grams repeated in a plate
+            keys = _sorted_unique(codes[real].astype(np.uint64) << np.uint64(32) | ids[real])
+            gram = (keys >> np.uint64(32)).astype(np.uint32)
+            starts = np.flatnonzero(np.r_[True, gram[1:] != gram[:-1]])
+            gram_codes = gram[starts]
+            postings = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+            offsets = np.append(starts, len(keys)).astype(np.int64)
+        else:
+            gram_codes, offsets, postings = self._gram_codes[:0], np.zeros(1, dtype=np.int64), self._postings[:0]
+        self._plates, self._gram_codes, self._offsets, self._postings = plates, gram_codes, offsets, postings
+        self._delta, self._delta_grams, self._delta_plates = [], {}, []
+
+    def load(self):
+        version = db.data_version()
+        last_id = db.last_log_id()
+        plates, after = [], ""
+        while True:
+            chunk = db.fetch_data(
+                "SELECT vehicle_number FROM vehicle_flags WHERE vehicle_number > %s ORDER BY vehicle_number LIMIT %s",
+                (after, LOAD_CHUNK),
+                use_cache=False,
+                label="vehicle_search.load",
+            )
+            if chunk.empty:
+                break
+            plates.extend(_encode(plate) for plate in chunk["vehicle_number"])
+            after = chunk["vehicle_number"].iloc[-1]
+        self.build(plates)
+        self.last_id, self.version = last_id, version
+
+    def __contains__(self, plate):
+        i = np.searchsorted(self._plates, plate)
+        if i < len(self._plates) and self._plates[i] == plate:
+            return True
+        j = bisect.bisect_left(self._delta, plate)
+        return j < len(self._delta) and self._delta[j] == plate
+
+    def add(self, plate):
+        if not plate or plate in self:
+            return
+        bisect.insort(self._delta, plate)
+        position = len(self._delta_plates)
+        self._delta_plates.append(plate)
+        for gram in grams(b"^" + plate + b"$"):
+            self._delta_grams.setdefault(gram, []).append(position)
+
+    def catch_up(self):
+        """Add plates from stops logged since the last build or catch-up."""
+        version = db.data_version()
+        top = db.last_log_id()
+        if top > self.last_id:
+            new = db.fetch_data(
+                "SELECT DISTINCT vehicle_number FROM police_post_logs "
+                "WHERE id > %s AND id <= %s AND vehicle_number IS NOT NULL",
+                (self.last_id, top),
+                use_cache=False,
+                label="vehicle_search.catch_up",
+            )
+            if len(self._delta) + len(new) > DELTA_LIMIT:
+                self.load()
+                return
+            for plate in new["vehicle_number"]:
+                self.add(_encode(plate))
+            self.last_id = top
+        self.version = version
+
+    def copy(self):
+        """Index sharing this one's (read-only) base arrays, with its own delta."""
+        index = PlateIndex()
+        index.version, index.last_id = self.version, self.last_id
+        index._plates, index._gram_codes = self._plates, self._gram_codes
+        index._offsets, index._postings = self._offsets, self._postings
+        index._delta, index._delta_plates = list(self._delta), list(self._delta_plates)
+        index._delta_grams = {gram: list(positions) for gram, positions in self._delta_grams.items()}
+        return index
+
+    def refreshed(self):
+        """This index if it is current, else a caught-up copy; ``self`` is left unchanged."""
+        if self.version == db.data_version():
+            return self
+        index = PlateIndex() if self.version is None else self.copy()
+        if self.version is None:
+            index.load()
+        else:
+            index.catch_up()
+        return index
+
+    def _base_postings(self, gram):
+        i = np.searchsorted(self._gram_codes, gram)
+        if i < len(self._gram_codes) and self._gram_codes[i] == gram:
+            return self._postings[self._offsets[i]:self._offsets[i + 1]]
+        return self._postings[:0]
+
+    def prefix(self, query, limit=MAX_RESULTS):
+        """(plates starting with ``query`` in sorted order, total number of matches)."""
+        query = _encode(query)
+        low = np.searchsorted(self._plates, query)
+        high = np.searchsorted(self._plates, query + b"\xff")
+        delta_low = bisect.bisect_left(self._delta, query)
+        delta_high = bisect.bisect_left(self._delta, query + b"\xff")
+        found = sorted(list(self._plates[low:min(high, low + limit)]) + self._delta[delta_low:delta_high])[:limit]
+        return [plate.decode() for plate in found], int(high - low) + delta_high - delta_low
+
+    def contains(self, query, limit=MAX_RESULTS):
+        """Plates containing ``query`` (3+ characters; shorter queries match as a prefix)."""
+        query = _encode(query)
+        if len(query) < 3:
+            return self.prefix(query.decode(), limit)
+        query_grams = grams(query)
+        # Shortest postings first, so each intersection is at most that long
+        base = None
+        for ids in sorted((self._base_postings(gram) for gram in query_grams), key=len):
+            base = ids if base is None else np.intersect1d(base, ids, assume_unique=True)
+            if not len(base):
+                break
+        # Plate ids follow sort order, so the matches come out sorted
+        candidates = self._plates[base]
+        matches = candidates[np.char.find(candidates, query) >= 0]
+        delta = set.intersection(*(set(self._delta_grams.get(gram, ())) for gram in query_grams))
+        delta_matches = sorted(self._delta_plates[i] for i in delta if query in self._delta_plates[i])
+        found = sorted(list(matches[:limit]) + delta_matches)[:limit]
+        return [plate.decode() for plate in found], len(matches) + len(delta_matches)
+
+    def fuzzy(self, query, limit=MAX_RESULTS, max_distance=None):
+        """(plate, edit distance) for plates within ``max_distance`` edits, closest first."""
+        text = watchlist.normalize(query)
+        if max_distance is None:
+            max_distance = 1 if len(text) <= 6 else 2
+        query_grams = grams(b"^" + text.encode("utf-8") + b"$")
+        # One edit changes at most three grams
+        needed = max(1, len(query_grams) - 3 * max_distance)
+
+        base = [self._base_postings(gram) for gram in query_grams]
+        ids, shared = np.unique(np.concatenate(base) if base else self._postings[:0], return_counts=True)
+        keep = shared >= needed
+        ids, shared = ids[keep], shared[keep]
+        if len(ids) > FUZZY_CANDIDATES:
+            top = np.argpartition(-shared, FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]
+            ids, shared = ids[top], shared[top]
+        candidates = {self._plates[i].decode(): int(n) for i, n in zip(ids, shared)}
+        delta_shared = Counter(i for gram in query_grams for i in self._delta_grams.get(gram, ()))
+        candidates.update(
+            (self._delta_plates[i].decode(), n) for i, n in delta_shared.items() if n >= needed
+        )
+
+        scored = []
+        for plate, n in candidates.items():
+            distance = edit_distance(text, plate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -n, plate))
+        scored.sort()
+        return [(plate, distance) for distance, _, plate in scored[:limit]]
+
+    def stats(self):
+        nbytes = self._plates.nbytes + self._gram_codes.nbytes + self._offsets.nbytes + self._postings.nbytes
+        return {"plates": len(self), "delta": len(self._delta), "index_mb": round(nbytes / 1024 ** 2, 1),
+                "last_id": self.last_id}
+
+
+_index = None
+_index_lock = threading.Lock()      # guards swapping _index
+_refresh_lock = threading.Lock()    # one refresh at a time
+
+
+def get_index():
+    """Process-wide plate index, caught up to the current data version.
+
+    The refresh runs outside ``_index_lock``; while one is running, other
+    callers keep searching the previous index instead of waiting for it.
+    """
+    global _index
+    with _index_lock:
+        current = _index
+    if current is not None and current.version == db.data_version():
+        return current
+    if not _refresh_lock.acquire(blocking=current is None):
+        return current
+    try:
+        with _index_lock:
+            current = _index
+        fresh = (current or PlateIndex()).refreshed()
+        with _index_lock:
+            _index = fresh
+        return fresh
+    finally:
+        _refresh_lock.release()
+
+
+def search(query, mode="prefix", limit=MAX_RESULTS):
+    """Matching plates with their stop counts, as a DataFrame, and the total number of matches."""
+    index = get_index()
+    if mode == "fuzzy":
+        matches = index.fuzzy(query, limit)
+        plates, distances, total = [plate for plate, _ in matches], [d for _, d in matches], len(matches)
+    else:
+        plates, total = (index.contains if mode == "contains" else index.prefix)(query, limit)
+        distances = None
+    if not plates:
+        return pd.DataFrame(columns=["vehicle_number", "stops"]), 0
+    counts = db.fetch_data(
+        "SELECT vehicle_number, stops, searches, drug_stops, arrests FROM vehicle_flags "
+        "WHERE vehicle_number IN ({})".format(", ".join(["%s"] * len(plates))),
+        tuple(plates),
+        label="vehicle_search.counts",
+    )
+    result = pd.DataFrame({"vehicle_number": plates})
+    if distances is not None:
+        result["edits"] = distances
+    return result.merge(counts, on="vehicle_number", how="left"), total
+
+
+def stop_history(plate, limit=HISTORY_LIMIT, date_from=None, include_archive=False):
+    """Most recent stops of one plate, from ``date_from`` on if given.
+
+    Reads the hot table; archived years (through the history view) only
+    with ``include_archive`` or a ``date_from`` that reaches back to them.
+    """
+    table = "police_post_logs"
+    if include_archive or date_from:
+        table = partitions.source(None if include_archive else date_from)
+    sql = f"SELECT * FROM {table} WHERE plate_norm = %s"
+    params = [watchlist.normalize(plate)]
+    if date_from:
+        sql += " AND stop_date >= %s"
+        params.append(str(date_from))
+    return db.fetch_data(sql + " ORDER BY id DESC LIMIT %s", tuple(params) + (limit,),
+                         label="vehicle_search.history")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search police_post_logs by vehicle number")
+    parser.add_argument("query")
+    parser.add_argument("--mode", choices=MODES, default="prefix")
+    parser.add_argument("--history", action="store_true", help="also print the best match's stops")
+    parser.add_argument("--archive", action="store_true", help="include archived years in the history")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+    result, total = search(args.query, args.mode)
+    print(f"{total} matching plates")
+    print(result.to_string(index=False))
+    if args.history and not result.empty:
+        history = stop_history(result["vehicle_number"].iloc[0], include_archive=args.archive)
+        print(history.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
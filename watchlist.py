@@ -0,0 +1,446 @@
+"""Vehicle watchlist: plates that raise an alert whenever they are stopped.
+
+A vehicle_number is on the watchlist when it has
+
+* a prior drug-related stop (``DRUG_STOPS`` or more), or
+* been searched ``REPEAT_SEARCHES`` or more times, or
+* been added by hand (``python watchlist.py add KA01AB1234 --reason "stolen"``).
+
+Per-plate counts live in ``vehicle_flags``, kept up to date by an ingest
+hook inside each batch transaction (like the rollups). The same hook checks
+every incoming stop against its plate's flags from *before* that stop and
+writes a ``watchlist_alerts`` row for each hit.
+
+The dashboard holds the list in memory: a dict of plate -> counts behind a
+Bloom filter, so a plate that is not listed (the common case) is rejected
+with a few bit tests. Above ``MEMORY_LIMIT`` plates the dict gives way to
+the Bloom filter (about 1.2 MB per million plates at 1% false positives)
+and sorted NumPy arrays of plates and counts (about 20 bytes a plate),
+which confirm its hits without a query. When the data version changes the
+list catches up from an id high-water mark, reading only the stops logged
+since. Hand-made entries have their own version (``ENTRIES_VERSION_FILE``),
+so adding or removing one reloads just the entries and leaves the ledger's
+caches alone.
+
+Usage::
+
+    python watchlist.py add KA01AB1234 --reason "reported stolen"
+    python watchlist.py check KA01AB1234
+    python watchlist.py rebuild          # recompute vehicle_flags from police_post_logs
+"""
+import argparse
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import db
+import partitions
+import rollups
+
+DRUG_STOPS = 1          # prior drug-related stops that put a plate on the list
+REPEAT_SEARCHES = 2     # prior searches that put a plate on the list
+MEMORY_LIMIT = 1000000  # plates kept in the in-memory dict; beyond this only the Bloom filter
+BLOOM_ERROR = 0.01      # Bloom filter false positive rate
+LOAD_CHUNK = 50000      # plates read per query when loading the list
+LOOKUP_CHUNK = 500      # plates per IN (...) lookup in the ingest hook
+
+# Changed by add() / remove(), which alter the list but no ledger rows
+ENTRIES_VERSION_FILE = os.environ.get(
+    "SECURECHECK_WATCHLIST_VERSION",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".watchlist_version"),
+)
+
+CREATE_FLAGS_SQL = """CREATE TABLE IF NOT EXISTS vehicle_flags(
+vehicle_number VARCHAR(50) NOT NULL PRIMARY KEY,
+stops BIGINT NOT NULL,
+arrests BIGINT NOT NULL,
+searches BIGINT NOT NULL,
+drug_stops BIGINT NOT NULL)"""
+
+CREATE_ENTRIES_SQL = """CREATE TABLE IF NOT EXISTS watchlist_entries(
+vehicle_number VARCHAR(50) NOT NULL PRIMARY KEY,
+reason VARCHAR(255) NOT NULL,
+added_at VARCHAR(19) NOT NULL)"""
+
+CREATE_ALERTS_SQL = """CREATE TABLE IF NOT EXISTS watchlist_alerts(
+{id_column},
+vehicle_number VARCHAR(50) NOT NULL,
+stop_date DATE,
+stop_time TIME,
+country_name VARCHAR(50),
+reasons VARCHAR(255) NOT NULL,
+source VARCHAR(20) NOT NULL,
+created_at VARCHAR(19) NOT NULL)"""
+
+INSERT_ALERT_SQL = """INSERT INTO watchlist_alerts
+(vehicle_number, stop_date, stop_time, country_name, reasons, source, created_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+
+FLAGGED = f"(drug_stops >= {DRUG_STOPS} OR searches >= {REPEAT_SEARCHES})"
+
+_IDX = {name: i for i, name in enumerate(db.LOG_COLUMNS)}
+
+
+def create_tables(connection):
+    with connection.cursor() as cur:
+        cur.execute(CREATE_FLAGS_SQL)
+        cur.execute(CREATE_ENTRIES_SQL)
+        cur.execute(CREATE_ALERTS_SQL.format(id_column=db.ID_COLUMN[db.dialect(connection)]))
+
+
+def _values(row):
+    return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+
+def _now():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def normalize(plate):
+    return str(plate).strip().upper() if plate is not None else ""
+
+
+# Why a plate with these prior counts (and optional manual reason) is listed
+def reasons(searches, drug_stops, manual=None):
+    found = []
+    if manual:
+        found.append(manual)
+    if drug_stops >= DRUG_STOPS:
+        found.append(f"{drug_stops} prior drug-related stop{'s' if drug_stops > 1 else ''}")
+    if searches >= REPEAT_SEARCHES:
+        found.append(f"searched {searches} times before")
+    return found
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: a bytearray of bits, blake2b hashing."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+class Watchlist:
+    """In-memory watchlist; ``check(plate)`` returns the reasons it is listed."""
+
+    def __init__(self, bloom=True, memory_limit=MEMORY_LIMIT):
+        self.use_bloom = bloom
+        self.memory_limit = memory_limit
+        self.version = None
+        self.entries_version = None
+        self.last_id = 0
+        self._flags = {}      # plate -> (searches, drug_stops); in Bloom-only mode, plates since the load
+        self._sorted = None   # Bloom-only mode: (sorted plates, their [searches, drug_stops])
+        self._manual = {}     # plate -> reason, for hand-added plates
+        self._bloom = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._bloom.count if self._sorted is not None else len(self._flags)
+
+    def check(self, plate):
+        plate = normalize(plate)
+        if not plate:
+            return []
+        manual = self._manual.get(plate)
+        if manual is None and self._bloom is not None and plate not in self._bloom:
+            return []
+        counts = self._flags.get(plate)
+        if counts is None and self._sorted is not None:
+            plates, sorted_counts = self._sorted
+            key = plate.encode("utf-8")
+            i = np.searchsorted(plates, key)
+            if i < len(plates) and plates[i] == key:
+                counts = tuple(int(n) for n in sorted_counts[i])
+        searches, drug_stops = counts or (0, 0)
+        return reasons(searches, drug_stops, manual)
+
+    @staticmethod
+    def _add(flags, bloom, frame):
+        for plate, searches, drug_stops in frame.itertuples(index=False, name=None):
+            plate = normalize(plate)
+            if bloom is not None and plate not in bloom:
+                bloom.add(plate)
+            flags[plate] = (int(searches), int(drug_stops))
+
+    def load(self):
+        """Read the whole list; plates are paged by key so no result set is large."""
+        version = db.data_version()
+        last_id = db.last_log_id()
+        total = int(db.fetch_data(f"SELECT COUNT(*) AS n FROM vehicle_flags WHERE {FLAGGED}", use_cache=False)["n"].iloc[0])
+        bloom_only = total > self.memory_limit
+        flags = {}
+        bloom = BloomFilter(max(total * 2, 1024)) if self.use_bloom or bloom_only else None
+        plates, counts = [], []
+        after = ""
+        while True:
+            chunk = db.fetch_data(
+                f"SELECT vehicle_number, searches, drug_stops FROM vehicle_flags "
+                f"WHERE vehicle_number > %s AND {FLAGGED} ORDER BY vehicle_number LIMIT %s",
+                (after, LOAD_CHUNK),
+                use_cache=False,
+                label="watchlist.load",
+            )
+            if chunk.empty:
+                break
+            if bloom_only:
+                for plate in chunk["vehicle_number"]:
+                    bloom.add(normalize(plate))
+                plates.extend(normalize(plate).encode("utf-8") for plate in chunk["vehicle_number"])
+                counts.append(chunk[["searches", "drug_stops"]].to_numpy(dtype=np.uint32))
+            else:
+                self._add(flags, bloom, chunk)
+            after = chunk["vehicle_number"].iloc[-1]
+        compact = None
+        if bloom_only:
+            plates = np.asarray(plates, dtype=bytes)
+            order = np.argsort(plates, kind="stable")
+            compact = (plates[order], np.concatenate(counts)[order] if counts else np.zeros((0, 2), np.uint32))
+        # Swapped in whole so concurrent checks never see a half-loaded list
+        self._flags, self._sorted, self._bloom, self.last_id = flags, compact, bloom, last_id
+        self._load_manual()
+        self.version = version
+
+    def _load_manual(self):
+        entries_version = db.read_version(ENTRIES_VERSION_FILE)
+        entries = db.fetch_data("SELECT vehicle_number, reason FROM watchlist_entries", use_cache=False)
+        self._manual = {normalize(plate): reason for plate, reason in entries.itertuples(index=False, name=None)}
+        self.entries_version = entries_version
+
+    def catch_up(self):
+        """Add plates flagged by stops logged since the last load or catch-up."""
+        version = db.data_version()
+        top = db.last_log_id()
+        if top > self.last_id:
+            changed = db.fetch_data(
+                f"SELECT vehicle_number, searches, drug_stops FROM vehicle_flags WHERE {FLAGGED} AND vehicle_number IN "
+                "(SELECT UPPER(TRIM(vehicle_number)) FROM police_post_logs WHERE id > %s AND id <= %s)",
+                (self.last_id, top),
+                use_cache=False,
+                label="watchlist.catch_up",
+            )
+            # A filter filled past its capacity loses accuracy, and a dict past the
+            # memory limit must give way to the Bloom filter: reload in either case
+            if (self._bloom is not None and self._bloom.count + len(changed) > self._bloom.capacity) or (
+                len(self._flags) + len(changed) > self.memory_limit
+            ):
+                self.load()
+                return
+            self._add(self._flags, self._bloom, changed)
+            self.last_id = top
+        self._load_manual()
+        self.version = version
+
+    def _current(self):
+        return self.version == db.data_version() and self.entries_version == db.read_version(ENTRIES_VERSION_FILE)
+
+    def refresh(self):
+        if self._current():
+            return self
+        with self._lock:
+            if self.version is None:
+                self.load()
+            elif self.version != db.data_version():
+                self.catch_up()
+            elif not self._current():
+                self._load_manual()
+        return self
+
+    def stats(self):
+        return {
+            "plates": len(self),
+            "manual": len(self._manual),
+            "mode": "bloom only" if self._sorted is not None else ("bloom + dict" if self._bloom else "dict"),
+            "bloom_bytes": self._bloom.nbytes if self._bloom else 0,
+            "last_id": self.last_id,
+        }
+
+
+_watchlist = None
+_watchlist_lock = threading.Lock()
+
+
+def get_watchlist():
+    """Process-wide watchlist, caught up to the current data and entries versions."""
+    global _watchlist
+    if _watchlist is None:
+        with _watchlist_lock:
+            if _watchlist is None:
+                _watchlist = Watchlist()
+    return _watchlist.refresh()
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# Ingest hook: alert on listed plates, then fold the batch into vehicle_flags.
+# Plates are normalized first, like watchlist entries and check().
+def apply_batch(cur, rows):
+    batch_plates = [normalize(row[_IDX["vehicle_number"]]) for row in rows]
+    plates = sorted(set(filter(None, batch_plates)))
+    if not plates:
+        return
+    prior = {}    # plate -> [stops, arrests, searches, drug_stops] before this row
+    manual = {}
+    for chunk in _chunks(plates, LOOKUP_CHUNK):
+        marks = ", ".join(["%s"] * len(chunk))
+        cur.execute(
+            f"SELECT vehicle_number, {', '.join(rollups.COUNT_COLUMNS)} FROM vehicle_flags "
+            f"WHERE vehicle_number IN ({marks})",
+            chunk,
+        )
+        for plate, *counts in map(_values, cur.fetchall()):
+            prior[plate] = [int(count) for count in counts]
+        cur.execute(f"SELECT vehicle_number, reason FROM watchlist_entries WHERE vehicle_number IN ({marks})", chunk)
+        manual.update(map(_values, cur.fetchall()))
+
+    alerts = []
+    added = defaultdict(lambda: [0, 0, 0, 0])
+    created_at = _now()
+    for row, plate in zip(rows, batch_plates):
+        if not plate:
+            continue
+        counts = prior.setdefault(plate, [0, 0, 0, 0])
+        found = reasons(counts[2], counts[3], manual.get(plate))
+        if found:
+            alerts.append((
+                plate, row[_IDX["stop_date"]], row[_IDX["stop_time"]], row[_IDX["country_name"]],
+                "; ".join(found)[:255], "ingest", created_at,
+            ))
+        flags = (
+            1,
+            1 if row[_IDX["is_arrested"]] else 0,
+            1 if row[_IDX["search_conducted"]] else 0,
+            1 if row[_IDX["drugs_related_stop"]] else 0,
+        )
+        for i, flag in enumerate(flags):
+            counts[i] += flag
+            added[plate][i] += flag
+
+    cur.executemany(
+        rollups.upsert_sql(cur, "vehicle_flags", ["vehicle_number"]),
+        [(plate,) + tuple(counts) for plate, counts in added.items()],
+    )
+    if alerts:
+        cur.executemany(INSERT_ALERT_SQL, alerts)
+
+
+# Alert for a stop entered in the dashboard (the Predict Outcome form)
+def record_alert(plate, stop_date, stop_time, country_name, found, source="form"):
+    with db.get_pool().connection() as connection:
+        with connection.cursor() as cur:
+            cur.execute(INSERT_ALERT_SQL, (
+                normalize(plate), str(stop_date), str(stop_time), country_name,
+                "; ".join(found)[:255], source, _now(),
+            ))
+
+
+def recent_alerts(limit=20):
+    return db.fetch_data(
+        "SELECT vehicle_number, stop_date, stop_time, country_name, reasons, source, created_at "
+        "FROM watchlist_alerts ORDER BY id DESC LIMIT %s",
+        (limit,),
+        use_cache=False,
+        label="watchlist.recent_alerts",
+    )
+
+
+# Recompute vehicle_flags from every stop, archived years included
+def rebuild(connection):
+    create_tables(connection)
+    source = partitions.source(connection=connection)
+    connection.begin()
+    try:
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM vehicle_flags")
+            cur.execute(f"""INSERT INTO vehicle_flags (vehicle_number, {', '.join(rollups.COUNT_COLUMNS)})
+SELECT UPPER(TRIM(vehicle_number)), COUNT(*),
+SUM(CASE WHEN is_arrested = 1 THEN 1 ELSE 0 END),
+SUM(CASE WHEN search_conducted = 1 THEN 1 ELSE 0 END),
+SUM(CASE WHEN drugs_related_stop = 1 THEN 1 ELSE 0 END)
+FROM {source} WHERE TRIM(vehicle_number) <> '' GROUP BY UPPER(TRIM(vehicle_number))""")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    db.bump_data_version()
+
+
+def add(connection, plate, reason):
+    create_tables(connection)
+    with connection.cursor() as cur:
+        cur.execute("DELETE FROM watchlist_entries WHERE vehicle_number = %s", (normalize(plate),))
+        cur.execute(
+            "INSERT INTO watchlist_entries (vehicle_number, reason, added_at) VALUES (%s, %s, %s)",
+            (normalize(plate), reason, _now()),
+        )
+    db.write_version(ENTRIES_VERSION_FILE)
+
+
+def remove(connection, plate):
+    create_tables(connection)
+    with connection.cursor() as cur:
+        cur.execute("DELETE FROM watchlist_entries WHERE vehicle_number = %s", (normalize(plate),))
+    db.write_version(ENTRIES_VERSION_FILE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vehicle watchlist for police_post_logs")
+    parser.add_argument("command", choices=["add", "remove", "check", "rebuild", "alerts"])
+    parser.add_argument("plate", nargs="?", help="vehicle number (add, remove, check)")
+    parser.add_argument("--reason", default="added by hand", help="why the plate is listed (add)")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of MySQL")
+    args = parser.parse_args(argv)
+    if args.command in ("add", "remove", "check") and not args.plate:
+        parser.error(f"{args.command} needs a plate")
+
+    if args.sqlite:
+        db.use_sqlite(args.sqlite)
+    connection = db.connect_sqlite(args.sqlite) if args.sqlite else db.create_connection()
+    try:
+        if args.command == "add":
+            add(connection, args.plate, args.reason)
+        elif args.command == "remove":
+            remove(connection, args.plate)
+        elif args.command == "rebuild":
+            rebuild(connection)
+        elif args.command == "check":
+            found = get_watchlist().check(args.plate)
+            print("; ".join(found) if found else f"{normalize(args.plate)} is not on the watchlist")
+        else:
+            print(recent_alerts(50).to_string(index=False))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()